@@ -11,7 +11,8 @@ set PYTHONUNBUFFERED=1
 :: Run the script using the local virtual environment Python
 echo Starting Teams Activity Keeper...
 echo.
-".venv\Scripts\python.exe" activity_keeper.py
+:: The supervisor restarts the keeper if it crashes
+".venv\Scripts\python.exe" activity_keeper.py supervise
 
-:: If the script crashes or closes unexpectedly, pause so you can see the error
+:: If the supervisor gives up (crash loop) or the keeper finishes, pause so you can see why
 pause
\ No newline at end of file
@@ -1,40 +1,53 @@
 import sys
 import time
-import random
 import argparse
 import json
 import os
 import signal
 import logging
-import msvcrt
 import ctypes
 import threading
+import importlib.util
 from typing import Optional, Tuple
 from datetime import datetime, timedelta
 
+import keeper_config
+import keeper_random
+from keeper_history import ActivityHistory
+from keeper_schedule import get_schedule, invalidate_schedule_cache
+from keeper_trace import traced
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None  # Console key controls are only available on Windows
+
 try:
     import winsound
     SOUND_AVAILABLE = True
 except ImportError:
     SOUND_AVAILABLE = False
 
-try:
-    from pystray import Icon, Menu, MenuItem
-    from PIL import Image, ImageDraw
-    TRAY_AVAILABLE = True
-except ImportError:
-    TRAY_AVAILABLE = False
+# pystray/Pillow are only imported when the tray is actually started
+TRAY_AVAILABLE = (
+    importlib.util.find_spec("pystray") is not None
+    and importlib.util.find_spec("PIL") is not None
+)
+
+pag = None  # pyautogui module, loaded on first use by load_pyautogui()
 
-try:
-    import pyautogui as pag
-except ImportError:
-    print("Error: pyautogui module not found!")
-    print("Please install it with: pip install pyautogui")
-    print("Or activate your virtual environment first.")
-    sys.exit(1)
 
-# Enable pyautogui failsafe
-pag.FAILSAFE = True
+def load_pyautogui():
+    """Import pyautogui on first use and enable its failsafe.
+
+    Raises ImportError if pyautogui is not installed.
+    """
+    global pag
+    if pag is None:
+        import pyautogui
+        pyautogui.FAILSAFE = True
+        pag = pyautogui
+    return pag
 
 # Windows API Constants for SetThreadExecutionState
 ES_CONTINUOUS = 0x80000000
@@ -59,6 +72,30 @@ def get_idle_time_seconds() -> float:
 EXIT_KEYS = [27, 81, 113]  # ESC, Q, q
 JITTER_PERCENTAGE = 0.1
 DASHBOARD_WIDTH = 48
+RELOADABLE_KEYS = [  # Config keys that take effect on hot-reload
+    'activity_interval',
+    'pattern_randomization_enabled',
+    'randomization_mouse_probability',
+    'inactivity_detection_enabled',
+    'inactivity_threshold_seconds',
+    'presence_timeout_seconds',
+    'adaptive_interval_margin_seconds',
+    'sound_enabled',
+    'sound_on_heartbeat',
+    'sound_frequency',
+    'sound_duration',
+    'schedule_enabled',
+    'work_hours_start',
+    'work_hours_end',
+    'work_days',
+    'schedule_windows',
+    'schedule_exceptions',
+    'holiday_calendars',
+    'schedule_timezone',
+    'schedule_warning_minutes',
+    'schedule_warning_sound',
+]
+RESTART_REQUIRED_KEYS = ['total_duration', 'method', 'keyboard_key', 'mouse_move_distance']
 VERBOSE = False  # Global verbose flag
 PAUSED = False  # Global pause state
 DETECT_INACTIVITY = False # Global inactivity detection flag
@@ -74,10 +111,30 @@ AUTO_RESTART = False  # Auto-restart on schedule flag
 PROFILE = "default"  # Current profile name
 VERSION = "2.4.0"
 LOG_FILE = "activity_keeper.log"
-logger = None  # Will be initialized in main()
+logger = logging.getLogger(__name__)  # Handlers are attached in main() via setup_logging()
 _RELOADED_CONFIG: Optional[dict] = None  # Last successfully reloaded config snapshot
-
-# Logger is now initialized in main() via setup_logging()
+CONSOLE_KEYS = True  # Read ESC/Q/P/R/C from the console (disabled for embedded sessions)
+OUTPUT_MODE = "tty"  # "tty": dashboard and countdown; "lines": one line per event for redirected output
+_LAST_EVENT_STATE: Optional[str] = None  # Last state written as an event line
+STOP_REQUESTED = False  # Set by KeeperSession.stop() to end the run loop
+STATUS = "STOPPED"  # RUNNING, WAITING or STOPPED
+TOTAL_JIGGLES = 0  # Heartbeats sent since the current run started
+NEXT_HEARTBEAT_AT: Optional[float] = None  # Unix time of the next scheduled heartbeat
+LAST_HEARTBEAT_AT: Optional[float] = None  # Unix time of the last heartbeat sent
+SCHEDULE_STATE = "disabled"  # disabled, active, ending or waiting
+WAITING_UNTIL: Optional[float] = None  # Unix time the schedule resumes while WAITING
+STATUS_PAGE = None  # keeper_status.StatusPage when a status file is published
+METRICS = None  # keeper_metrics.MetricsRegistry when metrics are exported
+CHECKPOINT = None  # keeper_checkpoint.CheckpointWriter when session checkpoints are enabled
+LOW_POWER = None  # keeper_lowpower.AdaptiveInterval when the adaptive interval is enabled
+STAY_AWAKE = False  # Whether prevent_sleep's power request is in effect
+INPUT_LOCK = threading.RLock()  # Serializes heartbeats and click-plan clicks
+SESSION_STARTED_AT: Optional[float] = None  # Unix time the current keep_active() session started
+SESSION_ENDS_AT: Optional[float] = None  # Unix time the current keep_active() session ends
+_WAKE = threading.Event()  # Set to cut short the current wait in the run loop
+_ASYNC_WAKE = None  # Thread-safe callable that wakes the AsyncEngine's event loop while it runs
+_ACTIVE_SESSION: Optional['KeeperSession'] = None  # Session currently inside run()
+_PROFILE_RUN_ACTIVE = False  # True while main() is running under --profile-run
 
 
 def setup_logging(log_file: str = 'activity_keeper.log') -> None:
@@ -107,6 +164,7 @@ def verbose_log(message: str) -> None:
         print(f"[VERBOSE {timestamp}] {message}")
 
 
+@traced
 def play_sound(frequency: int = 1000, duration: int = 200) -> None:
     """Play a beep sound if sound is enabled and available."""
     if SOUND_AVAILABLE:
@@ -124,13 +182,37 @@ def update_title(text: str) -> None:
         pass
 
 
+def read_key() -> Optional[int]:
+    """Return the next buffered console key code, or None if no key is waiting."""
+    if not CONSOLE_KEYS or msvcrt is None:
+        return None
+    if msvcrt.kbhit():
+        return ord(msvcrt.getch())
+    return None
+
+
+def idle_wait(seconds: float) -> None:
+    """Sleep for up to `seconds`, returning early if wake_keeper() is called."""
+    if _WAKE.wait(seconds):
+        _WAKE.clear()
+    count_metric("activity_keeper_loop_wakeups_total")
+
+
+def wake_keeper() -> None:
+    """Interrupt the run loop's current wait so it re-checks its state flags."""
+    _WAKE.set()
+    if _ASYNC_WAKE is not None:
+        _ASYNC_WAKE()
+
+
 def prevent_sleep() -> None:
     """Prevents Windows from going to sleep or turning off the screen."""
+    global STAY_AWAKE
     verbose_log("Setting Windows Stay Awake mode")
     try:
-        ctypes.windll.kernel32.SetThreadExecutionState(
+        STAY_AWAKE = bool(ctypes.windll.kernel32.SetThreadExecutionState(
             ES_CONTINUOUS | ES_SYSTEM_REQUIRED | ES_DISPLAY_REQUIRED
-        )
+        ))
         msg = "Windows 'Stay Awake' mode enabled."
         logger.info(msg)
         console_log(msg)
@@ -140,6 +222,8 @@ def prevent_sleep() -> None:
 
 def allow_sleep() -> None:
     """Allows Windows to sleep normally again."""
+    global STAY_AWAKE
+    STAY_AWAKE = False
     verbose_log("Disabling Windows Stay Awake mode")
     try:
         ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS)
@@ -150,6 +234,73 @@ def allow_sleep() -> None:
         logger.error(f"Failed to reset execution state: {e}")
 
 
+def heartbeat_interval(activity_interval: int) -> int:
+    """Seconds between heartbeats: activity_interval, stretched by the adaptive interval if enabled."""
+    if LOW_POWER is None:
+        return activity_interval
+    return LOW_POWER.interval(activity_interval)
+
+
+def count_metric(name: str, amount: float = 1, **labels: str) -> None:
+    """Increment a keeper counter if metrics are enabled."""
+    if METRICS is not None:
+        METRICS.inc(name, amount, **labels)
+
+
+def observe_metric(name: str, value: float) -> None:
+    """Record a histogram sample if metrics are enabled."""
+    if METRICS is not None:
+        METRICS.observe(name, value)
+
+
+def current_state() -> str:
+    """Return the keeper state as one of: running, paused, waiting, stopped."""
+    if STATUS == "RUNNING" and PAUSED:
+        return "paused"
+    return STATUS.lower()
+
+
+def publish_status() -> None:
+    """Mirror the current state into the status page, checkpoint journal and event lines.
+
+    Cheap to call from every loop iteration: all of them only record fields
+    that actually changed.
+    """
+    global _LAST_EVENT_STATE
+    if OUTPUT_MODE == "lines":
+        state = current_state()
+        if state == "paused" and AUTO_PAUSED:
+            state = "paused (auto)"
+        if state != _LAST_EVENT_STATE:
+            _LAST_EVENT_STATE = state
+            console_log(f"State: {state}")
+    if CHECKPOINT is not None:
+        CHECKPOINT.update({
+            "state": current_state(),
+            "paused": PAUSED,
+            "auto_paused": AUTO_PAUSED,
+            "schedule_state": SCHEDULE_STATE,
+            "total_jiggles": TOTAL_JIGGLES,
+            "program_start": _ACTIVE_SESSION.start_time if _ACTIVE_SESSION is not None else None,
+            "session_started_at": SESSION_STARTED_AT,
+            "session_ends_at": SESSION_ENDS_AT,
+            "next_heartbeat_at": NEXT_HEARTBEAT_AT,
+            "last_heartbeat_at": LAST_HEARTBEAT_AT,
+        })
+    if STATUS_PAGE is None:
+        return
+    STATUS_PAGE.publish(
+        current_state(),
+        SCHEDULE_STATE,
+        TOTAL_JIGGLES,
+        NEXT_HEARTBEAT_AT,
+        LAST_HEARTBEAT_AT,
+        WAITING_UNTIL if STATUS == "WAITING" else None,
+        AUTO_PAUSED,
+        DRY_RUN,
+    )
+
+
 def load_config(config_file: str = 'activity_config.json') -> dict:
     """Load configuration from JSON file."""
     if os.path.exists(config_file):
@@ -195,6 +346,7 @@ def load_config(config_file: str = 'activity_config.json') -> dict:
     return config
 
 
+@traced
 def reload_config() -> Tuple[bool, str]:
     """Reload configuration from current_config_file safely (never exits)."""
     global _RELOADED_CONFIG
@@ -207,16 +359,19 @@ def reload_config() -> Tuple[bool, str]:
             new_config = json.load(f)
     except FileNotFoundError:
         _RELOADED_CONFIG = None
+        count_metric("activity_keeper_config_reloads_total", result="failure")
         msg = "Could not read config file (file not found)"
         verbose_log(msg)
         return False, msg
     except json.JSONDecodeError as e:
         _RELOADED_CONFIG = None
+        count_metric("activity_keeper_config_reloads_total", result="failure")
         msg = f"Invalid JSON in config file: {e}"
         verbose_log(msg)
         return False, msg
     except Exception as e:
         _RELOADED_CONFIG = None
+        count_metric("activity_keeper_config_reloads_total", result="failure")
         msg = f"Could not read config file: {e}"
         verbose_log(msg)
         return False, msg
@@ -225,16 +380,20 @@ def reload_config() -> Tuple[bool, str]:
         is_valid, error_msg = validate_config(new_config)
     except Exception as e:
         _RELOADED_CONFIG = None
+        count_metric("activity_keeper_config_reloads_total", result="failure")
         msg = f"Config validation error: {e}"
         verbose_log(msg)
         return False, msg
 
     if not is_valid:
         _RELOADED_CONFIG = None
+        count_metric("activity_keeper_config_reloads_total", result="failure")
         verbose_log(f"Config reload validation failed: {error_msg}")
         return False, error_msg
 
     _RELOADED_CONFIG = new_config
+    invalidate_schedule_cache()  # Re-read holiday calendars on the next schedule check
+    count_metric("activity_keeper_config_reloads_total", result="success")
     verbose_log("Config reloaded successfully")
     return True, "Config reloaded successfully"
 
@@ -310,51 +469,14 @@ def load_preset(preset_name: str) -> Optional[dict]:
 
 
 def validate_config(config: dict) -> Tuple[bool, str]:
-    """Validate configuration values. Returns (is_valid, error_message)."""
-    verbose_log("Validating configuration")
-    # Check activity_interval
-    if config.get('activity_interval', 0) <= 0:
-        return False, "Error: activity_interval must be positive (e.g., 120)"
-    
-    # Check total_duration
-    if config.get('total_duration', 0) <= 0:
-        return False, "Error: total_duration must be positive (e.g., 18000)"
-    
-    # Check mouse_move_distance
-    if config.get('mouse_move_distance', 0) <= 0:
-        return False, "Error: mouse_move_distance must be positive (e.g., 10)"
-    
-    # Check schedule time format if enabled
-    if config.get('schedule_enabled', False):
-        warning_minutes = config.get('schedule_warning_minutes', 5)
-        if not isinstance(warning_minutes, (int, float)) or warning_minutes < 0:
-            return False, "Error: schedule_warning_minutes must be >= 0 (e.g., 5)"
-
-        try:
-            from datetime import datetime
-            datetime.strptime(config.get('work_hours_start', '09:00'), '%H:%M')
-            datetime.strptime(config.get('work_hours_end', '17:00'), '%H:%M')
-        except ValueError:
-            return False, "Error: work_hours times must be in HH:MM format (e.g., '09:00')"
-        
-        # Check work_days
-        work_days = config.get('work_days', [])
-        if not work_days or not all(1 <= day <= 7 for day in work_days):
-            return False, "Error: work_days must be list of numbers 1-7 (1=Monday, 7=Sunday)"
-    
-    # Check inactivity settings
-    if config.get('inactivity_threshold_seconds', 60) <= 0:
-        return False, "Error: inactivity_threshold_seconds must be positive"
-    
-    if config.get('inactivity_check_interval', 10) <= 0:
-        return False, "Error: inactivity_check_interval must be positive"
-
-    # Check pattern randomization settings
-    if config.get('pattern_randomization_enabled', False):
-        prob = config.get('randomization_mouse_probability', 0.7)
-        if not (0.0 <= prob <= 1.0):
-            return False, "Error: randomization_mouse_probability must be between 0.0 and 1.0"
+    """Validate configuration values. Returns (is_valid, error_message).
 
+    Every error is reported, one "Error: <key path> ..." line each (see keeper_config.SCHEMA).
+    """
+    verbose_log("Validating configuration")
+    errors = keeper_config.validate(config)
+    if errors:
+        return False, "\n".join(f"Error: {error}" for error in errors)
     return True, ""
 
 
@@ -373,19 +495,8 @@ def is_within_schedule(config: dict) -> bool:
     verbose_log(f"Checking schedule: enabled={config.get('schedule_enabled', False)}")
     if not config.get('schedule_enabled', False):
         return True
-    
-    now = datetime.now()
-    
-    # Check day of week
-    if now.isoweekday() not in config.get('work_days', [1, 2, 3, 4, 5]):
-        return False
-    
-    # Check time range
-    start_time = datetime.strptime(config['work_hours_start'], '%H:%M').time()
-    end_time = datetime.strptime(config['work_hours_end'], '%H:%M').time()
-    current_time = now.time()
-    
-    return start_time <= current_time <= end_time
+
+    return get_schedule(config).is_active()
 
 
 def get_next_schedule_start(config: dict) -> datetime:
@@ -395,41 +506,18 @@ def get_next_schedule_start(config: dict) -> datetime:
     if not config.get('schedule_enabled', False):
         return now
 
-    if is_within_schedule(config):
-        return now
-
-    work_days = config.get('work_days', [1, 2, 3, 4, 5])
-    start_time = datetime.strptime(config.get('work_hours_start', '09:00'), '%H:%M').time()
-
-    if now.isoweekday() in work_days:
-        today_start = datetime.combine(now.date(), start_time)
-        if now < today_start:
-            return today_start
-
-    for day_offset in range(1, 8):
-        candidate = now + timedelta(days=day_offset)
-        if candidate.isoweekday() in work_days:
-            return datetime.combine(candidate.date(), start_time)
-
-    return now
+    next_start = get_schedule(config).next_start(now.timestamp())
+    if next_start is None:
+        return now  # Nothing scheduled within the next year
+    return datetime.fromtimestamp(next_start)
 
 
 def _get_schedule_end_timestamp(config: dict) -> Optional[float]:
-    """Get today's schedule end time as a Unix timestamp, or None if not applicable."""
+    """Get the end of the current schedule window as a Unix timestamp, or None if not applicable."""
     if not config.get('schedule_enabled', False):
         return None
 
-    now = datetime.now()
-    if now.isoweekday() not in config.get('work_days', [1, 2, 3, 4, 5]):
-        return None
-
-    try:
-        end_time = datetime.strptime(config.get('work_hours_end', '17:00'), '%H:%M').time()
-    except ValueError:
-        return None
-
-    end_dt = datetime.combine(now.date(), end_time)
-    return end_dt.timestamp()
+    return get_schedule(config).current_end()
 
 
 def check_schedule_warning(config: dict, warning_shown: bool) -> Tuple[bool, bool]:
@@ -458,13 +546,34 @@ def check_schedule_warning(config: dict, warning_shown: bool) -> Tuple[bool, boo
 
     return False, warning_shown
 
-def perform_activity(method: str, keyboard_key: str = "scrolllock", mouse_distance: int = 10, pattern_randomization_enabled: bool = False, mouse_probability: float = 0.7) -> Tuple[int, int]:
-    """Perform activity to keep system awake with randomization."""
-    
+def show_schedule_warning(config: dict) -> None:
+    """Announce that the schedule window ends within schedule_warning_minutes."""
+    global SCHEDULE_STATE
+    warning_minutes = config.get('schedule_warning_minutes', 5)
+    SCHEDULE_STATE = "ending"
+    console_log(
+        f"WARNING: Schedule will end in less than {warning_minutes} minutes!"
+    )
+    logger.warning(
+        f"Schedule ending soon (threshold: {warning_minutes} minutes)"
+    )
+    if config.get('schedule_warning_sound', True) and config.get('sound_enabled', False):
+        play_sound(1500, 500)
+        play_sound(1500, 500)
+
+@traced
+def perform_activity(method: str, keyboard_key: str = "scrolllock", mouse_distance: int = 10, pattern_randomization_enabled: bool = False, mouse_probability: float = 0.7) -> Tuple[str, int, int]:
+    """Perform activity to keep system awake with randomization.
+
+    Returns (method, dx, dy) with the method actually used, which pattern
+    randomization may have changed.
+    """
+    rng = keeper_random.get_stream()
+
     # Handle pattern randomization
     if RANDOM_PATTERN or pattern_randomization_enabled:
         original_method = method
-        if random.random() < mouse_probability:
+        if rng.random() < mouse_probability:
             method = "mouse"
         else:
             method = "keyboard"
@@ -472,6 +581,8 @@ def perform_activity(method: str, keyboard_key: str = "scrolllock", mouse_distan
 
     verbose_log(f"Performing activity: method={method}")
     dx, dy = 0, 0
+    if not DRY_RUN:
+        load_pyautogui()
 
     if method == "keyboard":
         if DRY_RUN:
@@ -481,8 +592,8 @@ def perform_activity(method: str, keyboard_key: str = "scrolllock", mouse_distan
         logger.info(f"Pressed {keyboard_key} key (DRY-RUN: {DRY_RUN})")
     elif method == "mouse":
         # Randomize distance and direction
-        dx = random.randint(-mouse_distance, mouse_distance)
-        dy = random.randint(-mouse_distance, mouse_distance)
+        dx = rng.randint(-mouse_distance, mouse_distance)
+        dy = rng.randint(-mouse_distance, mouse_distance)
 
         # Ensure we actually move somewhere
         if dx == 0 and dy == 0:
@@ -491,15 +602,21 @@ def perform_activity(method: str, keyboard_key: str = "scrolllock", mouse_distan
         if DRY_RUN:
             verbose_log(f"DRY-RUN: Would have moved mouse ({dx}, {dy})")
             # Simulate timing
-            time.sleep(random.uniform(0.1, 0.3))
-            time.sleep(random.uniform(0.05, 0.15))
-            time.sleep(random.uniform(0.1, 0.3))
+            time.sleep(rng.uniform(0.1, 0.3))
+            time.sleep(rng.uniform(0.05, 0.15))
+            time.sleep(rng.uniform(0.1, 0.3))
             verbose_log("DRY-RUN: Would have pressed F15 key")
         else:
-            # Move randomly and back
-            pag.moveRel(dx, dy, duration=random.uniform(0.1, 0.3))
-            time.sleep(random.uniform(0.05, 0.15))
-            pag.moveRel(-dx, -dy, duration=random.uniform(0.1, 0.3))
+            # Move randomly and back along precomputed paths
+            import mouse_trajectory
+            engine = mouse_trajectory.get_engine()
+            x0, y0 = pag.position()
+            move = lambda x, y: pag.moveTo(x, y, _pause=False)
+            out = engine.path((x0, y0), (x0 + dx, y0 + dy), rng.uniform(0.1, 0.3))
+            mouse_trajectory.play_path(move, out, time.perf_counter, time.sleep)
+            time.sleep(rng.uniform(0.05, 0.15))
+            back = engine.path((x0 + dx, y0 + dy), (x0, y0), rng.uniform(0.1, 0.3))
+            mouse_trajectory.play_path(move, back, time.perf_counter, time.sleep)
 
             # Press F15 (Ghost Key) to ensure activity registration
             try:
@@ -509,11 +626,14 @@ def perform_activity(method: str, keyboard_key: str = "scrolllock", mouse_distan
 
         logger.info(f"Jiggled mouse ({dx}, {dy}) + F15 Key (DRY-RUN: {DRY_RUN})")
 
-    return dx, dy
+    return method, dx, dy
 
 
-def draw_dashboard(status: str, interval: int, total_jiggles: int, start_time: float, method: str, activity_history: list, show_warning: bool = False, waiting_until: Optional[datetime] = None) -> None:
-    """Draws a clean, persistent dashboard in the console."""
+@traced
+def draw_dashboard(status: str, interval: int, total_jiggles: int, start_time: float, method: str, activity_history: Optional[ActivityHistory], show_warning: bool = False, waiting_until: Optional[datetime] = None) -> None:
+    """Draws a clean, persistent dashboard in the console (not in event-line output mode)."""
+    if OUTPUT_MODE == "lines":
+        return
     uptime_sec = int(time.time() - start_time)
     hours, remainder = divmod(uptime_sec, 3600)
     minutes, seconds = divmod(remainder, 60)
@@ -541,6 +661,9 @@ def draw_dashboard(status: str, interval: int, total_jiggles: int, start_time: f
     print(f"|{f'  INTERVAL:  {interval} s (Randomized)'.ljust(width)}|")
     print(f"|{f'  JIGGLES:   {total_jiggles}'.ljust(width)}|")
     print(f"|{f'  METHOD:    {method}'.ljust(width)}|")
+    session = _ACTIVE_SESSION
+    if session is not None and session.click_job is not None:
+        print(f"|{f'  CLICKS:    {session.click_job.clicks}'.ljust(width)}|")
     if PROFILE != "default":
         print(f"|{f'  PROFILE:   {PROFILE}'.ljust(width)}|")
     if DETECT_INACTIVITY:
@@ -562,12 +685,20 @@ def draw_dashboard(status: str, interval: int, total_jiggles: int, start_time: f
     print("+------------------------------------------------+")
     print("\nRecent Activity:")
     if activity_history:
-        for activity in activity_history:
+        for activity in activity_history.format_recent(5):
             print(activity)
     else:
         print("  No activities yet...")
 
 
+def request_exit(key: int) -> None:
+    """Q/ESC: stop the session the way stop() does, so both engines report "stopped"."""
+    global STOP_REQUESTED
+    verbose_log(f"Exit key detected: {key}")
+    STOP_REQUESTED = True
+
+
+@traced
 def wait_for_next_activity(next_activity_time: float, end_time: float, config: dict = None) -> bool:
     """Wait until next activity time. Returns False if user wants to exit."""
     global PAUSED, AUTO_PAUSED, CONFIG_RELOAD_REQUESTED
@@ -577,9 +708,15 @@ def wait_for_next_activity(next_activity_time: float, end_time: float, config: d
     # Check for inactivity detection logic
     check_inactivity = DETECT_INACTIVITY or (config and config.get('inactivity_detection_enabled', False))
     inactivity_threshold = config.get('inactivity_threshold_seconds', 60) if config else 60
+    # The 0.1 s step only serves the countdown line and console keys. Without them, sleep until
+    # the heartbeat (or the next idle sample); wake_keeper() still cuts the wait short
+    poll_console = (OUTPUT_MODE == "tty" and not QUIET) or (CONSOLE_KEYS and msvcrt is not None)
+    check_interval = config.get('inactivity_check_interval', 10) if config else 10
 
     last_printed_second = -1
     while time.time() < next_activity_time:
+        publish_status()
+
         # Check for inactivity
         if check_inactivity:
             idle_time = get_idle_time_seconds()
@@ -591,6 +728,7 @@ def wait_for_next_activity(next_activity_time: float, end_time: float, config: d
                     AUTO_PAUSED = True
                     if TRAY_ENABLED:
                         update_tray_icon('paused')
+                    count_metric("activity_keeper_auto_pauses_total")
                     console_log("User activity detected, automatically pausing...")
                     verbose_log(f"Auto-pausing: idle_time={idle_time:.2f}s < threshold={inactivity_threshold}s")
                     return True # Return to main loop to handle pause state
@@ -602,14 +740,23 @@ def wait_for_next_activity(next_activity_time: float, end_time: float, config: d
                     AUTO_PAUSED = False
                     if TRAY_ENABLED:
                         update_tray_icon('running')
+                    count_metric("activity_keeper_auto_resumes_total")
                     console_log("User inactivity detected, automatically resuming...")
                     verbose_log(f"Auto-resuming: idle_time={idle_time:.2f}s >= threshold={inactivity_threshold}s")
 
+        if STOP_REQUESTED:
+            verbose_log("Stop requested")
+            return False
+
+        # Pause or reload requested from another thread (control server, tray, embedding program)
+        if CONFIG_RELOAD_REQUESTED or (PAUSED and not AUTO_PAUSED):
+            return True
+
         # Check for exit/pause/resume keys
-        if msvcrt.kbhit():
-            key = ord(msvcrt.getch())
+        key = read_key()
+        if key is not None:
             if key in EXIT_KEYS:
-                verbose_log(f"Exit key detected: {key}")
+                request_exit(key)
                 return False
             if key in [67, 99]:  # C or c
                 CONFIG_RELOAD_REQUESTED = True
@@ -635,7 +782,7 @@ def wait_for_next_activity(next_activity_time: float, end_time: float, config: d
         remaining_seconds = int(next_activity_time - now)
 
         if remaining_seconds != last_printed_second:
-            if not QUIET:
+            if not QUIET and OUTPUT_MODE == "tty":
                 display_sec = max(0, remaining_seconds)
                 sys.stdout.write(f"\r>>> NEXT HEARTBEAT IN: {display_sec}s   ")
                 if VERBOSE and check_inactivity:
@@ -643,7 +790,13 @@ def wait_for_next_activity(next_activity_time: float, end_time: float, config: d
                 sys.stdout.flush()
             last_printed_second = remaining_seconds
 
-        time.sleep(0.1)
+        if poll_console:
+            step = 0.1
+        else:
+            step = max(0.1, min(next_activity_time, end_time) - now)
+            if check_inactivity:
+                step = min(step, check_interval)
+        idle_wait(step)
         if time.time() >= end_time:
             break
     return True
@@ -651,9 +804,9 @@ def wait_for_next_activity(next_activity_time: float, end_time: float, config: d
 
 def handle_pause_resume() -> None:
     """Check for pause/resume keys and update state."""
-    global PAUSED
-    if msvcrt.kbhit():
-        key = ord(msvcrt.getch())
+    global PAUSED, AUTO_PAUSED
+    key = read_key()
+    if key is not None:
         if key in [80, 112]:  # P or p
             PAUSED = True
             verbose_log("Program PAUSED")
@@ -663,16 +816,63 @@ def handle_pause_resume() -> None:
             verbose_log("Program RESUMED")
 
 
-def keep_active(activity_interval: int, total_duration: int, method: str, keyboard_key: str, mouse_distance: int, config: dict) -> Tuple[bool, int]:
+@traced
+def perform_heartbeat(method: str, keyboard_key: str, mouse_distance: int, config: dict, activity_history: ActivityHistory, due_at: Optional[float] = None, pattern_randomization_enabled: bool = False, mouse_probability: float = 0.7) -> None:
+    """Send one heartbeat and record it in the metrics, status and history.
+
+    due_at is the time the heartbeat was scheduled for, used for the drift
+    metric; pass None when it was not sent on a schedule (e.g. after a resume).
+    """
+    global TOTAL_JIGGLES, LAST_HEARTBEAT_AT
+
+    if due_at is not None:
+        observe_metric("activity_keeper_heartbeat_drift_seconds", max(0.0, time.time() - due_at))
+    activity_started = time.perf_counter()
+    with INPUT_LOCK:
+        used, dx, dy = perform_activity(method, keyboard_key, mouse_distance, pattern_randomization_enabled, mouse_probability)
+    latency = time.perf_counter() - activity_started
+    observe_metric("activity_keeper_perform_activity_duration_seconds", latency)
+    count_metric("activity_keeper_heartbeats_sent_total")
+    TOTAL_JIGGLES += 1
+    LAST_HEARTBEAT_AT = time.time()
+    if LOW_POWER is not None:
+        LOW_POWER.heartbeat_sent(check_idle=not DRY_RUN)  # Dry runs inject nothing to verify
+    publish_status()
+    if OUTPUT_MODE == "lines":
+        moved = f"mouse {dx},{dy}" if used == "mouse" else used
+        console_log(f"Heartbeat #{TOTAL_JIGGLES} sent ({moved}, {latency * 1000:.0f} ms)")
+
+    # Sound notification
+    if config.get('sound_enabled', False) and config.get('sound_on_heartbeat', False):
+        play_sound(config.get('sound_frequency', 1000), config.get('sound_duration', 200))
+
+    with INPUT_LOCK:
+        activity_history.append(used, dx, dy, latency, LAST_HEARTBEAT_AT)
+
+
+def keep_active(activity_interval: int, total_duration: int, method: str, keyboard_key: str, mouse_distance: int, config: dict, activity_history: Optional[ActivityHistory] = None, resume_state: Optional[dict] = None) -> Tuple[bool, int]:
     """Main function to keep the system active.
 
+    resume_state (from a checkpoint) continues an interrupted session: its
+    end time and pending heartbeat are kept instead of starting fresh.
+
     Returns (should_wait_for_schedule, session_jiggles).
     """
-    global PAUSED, AUTO_PAUSED, CONFIG_RELOAD_REQUESTED
+    global PAUSED, AUTO_PAUSED, CONFIG_RELOAD_REQUESTED, STATUS, TOTAL_JIGGLES, NEXT_HEARTBEAT_AT, SCHEDULE_STATE, SESSION_STARTED_AT, SESSION_ENDS_AT
     start_time = time.time()
     end_time = start_time + total_duration
+    pending_heartbeat_at = None
+    if resume_state and (resume_state.get('session_ends_at') or 0) > start_time:
+        start_time = resume_state.get('session_started_at') or start_time
+        end_time = resume_state['session_ends_at']
+        pending_heartbeat_at = resume_state.get('next_heartbeat_at')
+        verbose_log(f"Resuming session: ends in {int(end_time - time.time())}s")
+    SESSION_STARTED_AT, SESSION_ENDS_AT = start_time, end_time
+    STATUS = "RUNNING"
+    SCHEDULE_STATE = "active" if config.get('schedule_enabled', False) else "disabled"
     total_jiggles = 0
-    activity_history = []  # Store last 5 activities
+    if activity_history is None:
+        activity_history = ActivityHistory()
     warning_shown = False
     should_wait_for_schedule = False
 
@@ -680,6 +880,7 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
     pattern_randomization_enabled = config.get('pattern_randomization_enabled', False)
     mouse_probability = config.get('randomization_mouse_probability', 0.7)
 
+    @traced
     def process_config_reload() -> None:
         nonlocal activity_interval, pattern_randomization_enabled, mouse_probability
         global CONFIG_RELOAD_REQUESTED
@@ -703,29 +904,11 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
             pattern_randomization_enabled = config.get('pattern_randomization_enabled', pattern_randomization_enabled)
             mouse_probability = config.get('randomization_mouse_probability', mouse_probability)
 
-            reloadable_keys = [
-                'activity_interval',
-                'pattern_randomization_enabled',
-                'randomization_mouse_probability',
-                'inactivity_detection_enabled',
-                'inactivity_threshold_seconds',
-                'sound_enabled',
-                'sound_on_heartbeat',
-                'sound_frequency',
-                'sound_duration',
-                'schedule_enabled',
-                'work_hours_start',
-                'work_hours_end',
-                'work_days',
-                'schedule_warning_minutes',
-                'schedule_warning_sound',
-            ]
-            for key in reloadable_keys:
+            for key in RELOADABLE_KEYS:
                 if old_config.get(key) != config.get(key):
                     verbose_log(f"Config updated: {key} = {old_config.get(key)} -> {config.get(key)}")
 
-            non_reloadable_keys = ['total_duration', 'method', 'keyboard_key', 'mouse_move_distance']
-            for key in non_reloadable_keys:
+            for key in RESTART_REQUIRED_KEYS:
                 if old_config.get(key) != config.get(key):
                     verbose_log(
                         f"Config changed (requires restart): {key} = {old_config.get(key)} -> {config.get(key)}"
@@ -738,6 +921,20 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
 
         CONFIG_RELOAD_REQUESTED = False
 
+    def send_heartbeat(due_at: Optional[float] = None) -> None:
+        nonlocal total_jiggles
+        perform_heartbeat(
+            method,
+            keyboard_key,
+            mouse_distance,
+            config,
+            activity_history,
+            due_at,
+            pattern_randomization_enabled,
+            mouse_probability,
+        )
+        total_jiggles += 1
+
     # Enable Stay Awake Mode
     prevent_sleep()
 
@@ -756,25 +953,18 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
                  AUTO_PAUSED = True
                  if TRAY_ENABLED:
                      update_tray_icon('paused')
+                 count_metric("activity_keeper_auto_pauses_total")
                  console_log("User activity detected, automatically pausing...")
                  verbose_log(f"Auto-pausing on start: idle_time={idle_time:.2f}s < threshold={inactivity_threshold}s")
 
-        # Initial activity (only if not paused)
-        if not PAUSED:
-            dx, dy = perform_activity(method, keyboard_key, mouse_distance, pattern_randomization_enabled, mouse_probability)
-            total_jiggles += 1
-
-            # Sound notification
-            if config.get('sound_enabled', False) and config.get('sound_on_heartbeat', False):
-                play_sound(config.get('sound_frequency', 1000), config.get('sound_duration', 200))
-
-            # Add to history (keep last 5)
-            timestamp = time.strftime("%H:%M:%S")
-            activity_history.append(f"[{timestamp}] Heartbeat sent! (Moved {dx}, {dy})")
-            if len(activity_history) > 5:
-                activity_history.pop(0)
+        # Initial activity (only if not paused, and not if a resumed heartbeat is still pending)
+        if not PAUSED and not (pending_heartbeat_at and pending_heartbeat_at > time.time()):
+            send_heartbeat()
 
         while time.time() < end_time:
+            if STOP_REQUESTED:
+                return False, total_jiggles
+
             # Check if still within schedule
             if not is_within_schedule(config):
                 if AUTO_RESTART and config.get('schedule_enabled', False):
@@ -791,16 +981,7 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
             # Check for schedule warning
             should_warn, warning_shown = check_schedule_warning(config, warning_shown)
             if should_warn:
-                warning_minutes = config.get('schedule_warning_minutes', 5)
-                console_log(
-                    f"WARNING: Schedule will end in less than {warning_minutes} minutes!"
-                )
-                logger.warning(
-                    f"Schedule ending soon (threshold: {warning_minutes} minutes)"
-                )
-                if config.get('schedule_warning_sound', True) and config.get('sound_enabled', False):
-                    play_sound(1500, 500)
-                    play_sound(1500, 500)
+                show_schedule_warning(config)
             
             # Draw UI
             if not QUIET:
@@ -815,9 +996,9 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
                 )
 
             # Handle buffered key presses (exit/pause/resume)
-            while msvcrt.kbhit():
-                key = ord(msvcrt.getch())
+            while (key := read_key()) is not None:
                 if key in EXIT_KEYS:
+                    request_exit(key)
                     return False, total_jiggles
                 if key in [67, 99]:  # C or c
                     CONFIG_RELOAD_REQUESTED = True
@@ -836,11 +1017,18 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
                     verbose_log("Program RESUMED")
 
             # Randomize current interval jitter (±10%)
-            jitter = int(activity_interval * JITTER_PERCENTAGE)
-            current_wait = activity_interval + random.randint(-jitter, jitter)
+            interval = heartbeat_interval(activity_interval)
+            jitter = int(interval * JITTER_PERCENTAGE)
+            current_wait = interval + keeper_random.get_stream().randint(-jitter, jitter)
             verbose_log(f"Next interval: {current_wait}s (jitter applied: ±{jitter}s)")
 
             next_activity_time = time.time() + current_wait
+            if pending_heartbeat_at is not None:
+                if pending_heartbeat_at > time.time():
+                    next_activity_time = pending_heartbeat_at
+                pending_heartbeat_at = None
+            NEXT_HEARTBEAT_AT = next_activity_time
+            publish_status()
 
             if not wait_for_next_activity(next_activity_time, end_time, config):
                 return False, total_jiggles
@@ -850,7 +1038,14 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
                 continue
 
             # While paused, update dashboard more frequently
+            was_paused = PAUSED
+            skipped_due = next_activity_time
             while PAUSED and time.time() < end_time:
+                publish_status()
+                if time.time() >= skipped_due:
+                    reason = "auto_pause" if AUTO_PAUSED else "manual_pause"
+                    count_metric("activity_keeper_heartbeats_skipped_total", reason=reason)
+                    skipped_due += heartbeat_interval(activity_interval)
                 process_config_reload()
                 # Check for inactivity auto-resume
                 check_inactivity = DETECT_INACTIVITY or config.get('inactivity_detection_enabled', False)
@@ -863,6 +1058,7 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
                         AUTO_PAUSED = False
                         if TRAY_ENABLED:
                             update_tray_icon('running')
+                        count_metric("activity_keeper_auto_resumes_total")
                         console_log("User inactivity detected, automatically resuming...")
                         verbose_log(f"Auto-resuming: idle_time={idle_time:.2f}s >= threshold={inactivity_threshold}s")
                         break
@@ -879,16 +1075,7 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
 
                 should_warn, warning_shown = check_schedule_warning(config, warning_shown)
                 if should_warn:
-                    warning_minutes = config.get('schedule_warning_minutes', 5)
-                    console_log(
-                        f"WARNING: Schedule will end in less than {warning_minutes} minutes!"
-                    )
-                    logger.warning(
-                        f"Schedule ending soon (threshold: {warning_minutes} minutes)"
-                    )
-                    if config.get('schedule_warning_sound', True) and config.get('sound_enabled', False):
-                        play_sound(1500, 500)
-                        play_sound(1500, 500)
+                    show_schedule_warning(config)
 
                 if not QUIET:
                     draw_dashboard(
@@ -901,9 +1088,13 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
                         warning_shown,
                     )
 
-                if msvcrt.kbhit():
-                    key = ord(msvcrt.getch())
+                if STOP_REQUESTED:
+                    return False, total_jiggles
+
+                key = read_key()
+                if key is not None:
                     if key in EXIT_KEYS:
+                        request_exit(key)
                         return False, total_jiggles
                     elif key in [67, 99]:  # C or c
                         CONFIG_RELOAD_REQUESTED = True
@@ -922,21 +1113,10 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
                             update_tray_icon('paused')
                         verbose_log("Program PAUSED")
 
-                time.sleep(0.5)
+                idle_wait(0.5)
 
-            if time.time() < end_time and not PAUSED:
-                dx, dy = perform_activity(method, keyboard_key, mouse_distance, pattern_randomization_enabled, mouse_probability)
-                total_jiggles += 1
-
-                # Sound notification
-                if config.get('sound_enabled', False) and config.get('sound_on_heartbeat', False):
-                    play_sound(config.get('sound_frequency', 1000), config.get('sound_duration', 200))
-
-                # Add to history (keep last 5)
-                timestamp = time.strftime("%H:%M:%S")
-                activity_history.append(f"[{timestamp}] Heartbeat sent! (Moved {dx}, {dy})")
-                if len(activity_history) > 5:
-                    activity_history.pop(0)
+            if time.time() < end_time and not PAUSED and not STOP_REQUESTED:
+                send_heartbeat(None if was_paused else next_activity_time)
 
         return False, total_jiggles
 
@@ -944,12 +1124,12 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
         print("\nActivity keeper stopped by user")
         return False, total_jiggles
     except Exception as e:
-        logger.error(f"An error occurred: {e}")
-        print(f"\nError: An unexpected error occurred")
-        print(f"Details: {e}")
-        print(f"Check {LOG_FILE} for more information.")
-        return False, total_jiggles
+        logger.exception(f"An error occurred: {e}")
+        raise  # A crash, not a finished session: main() exits non-zero so a supervisor restarts the keeper
     finally:
+        NEXT_HEARTBEAT_AT = None
+        SESSION_STARTED_AT = SESSION_ENDS_AT = None
+
         # Disable Stay Awake Mode so PC can sleep later
         allow_sleep()
 
@@ -958,7 +1138,7 @@ def keep_active(activity_interval: int, total_duration: int, method: str, keyboa
             verbose_log("Played exit sound")
 
 
-def display_exit_stats(start_time: float, total_jiggles: int) -> None:
+def display_exit_stats(start_time: float, total_jiggles: int, activity_history: Optional[ActivityHistory] = None) -> None:
     """Display statistics when program exits."""
     total_runtime = time.time() - start_time
     hours, remainder = divmod(int(total_runtime), 3600)
@@ -975,6 +1155,13 @@ def display_exit_stats(start_time: float, total_jiggles: int) -> None:
         avg_interval = total_runtime / (total_jiggles - 1)
         print(f"Average Interval: {avg_interval:.1f} seconds")
 
+    if activity_history is not None:
+        last_hour = activity_history.summary(3600)
+        overall = activity_history.summary()
+        print(f"Last Hour:        {last_hour['heartbeats']} heartbeats")
+        if overall['avg_latency_ms'] is not None:
+            print(f"Avg Latency:      {overall['avg_latency_ms']:.1f} ms (max {overall['max_latency_ms']:.1f} ms)")
+
     print("=" * 50)
 
     runtime_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
@@ -987,8 +1174,10 @@ def display_exit_stats(start_time: float, total_jiggles: int) -> None:
         logger.info(f"Session ended - Runtime: {runtime_str}, Jiggles: {total_jiggles}")
 
 
-def create_tray_image(status: str = 'running') -> Image.Image:
+def create_tray_image(status: str = 'running') -> 'Image.Image':
     """Create a tray icon image based on status."""
+    from PIL import Image, ImageDraw
+
     width = 64
     height = 64
     color = (0, 255, 0)  # Green for running
@@ -1009,6 +1198,7 @@ def tray_action_pause(icon, item) -> None:
     global PAUSED
     PAUSED = True
     update_tray_icon('paused')
+    wake_keeper()
     verbose_log("Paused via System Tray")
     console_log("Paused via System Tray")
 
@@ -1019,6 +1209,7 @@ def tray_action_resume(icon, item) -> None:
     PAUSED = False
     AUTO_PAUSED = False
     update_tray_icon('running')
+    wake_keeper()
     verbose_log("Resumed via System Tray")
     console_log("Resumed via System Tray")
 
@@ -1032,8 +1223,10 @@ def tray_action_exit(icon, item) -> None:
     os.kill(os.getpid(), signal.SIGINT)
 
 
-def create_tray_menu() -> Menu:
+def create_tray_menu() -> 'Menu':
     """Create the system tray menu."""
+    from pystray import Menu, MenuItem
+
     return Menu(
         MenuItem(f"Activity Keeper v{VERSION}", None, enabled=False),
         Menu.SEPARATOR,
@@ -1051,6 +1244,8 @@ def setup_tray_icon() -> None:
     if not TRAY_AVAILABLE:
         return
 
+    from pystray import Icon
+
     tray_icon = Icon(
         "ActivityKeeper", 
         create_tray_image('running'), 
@@ -1070,7 +1265,1089 @@ def update_tray_icon(status: str = 'running') -> None:
         tray_icon.icon = create_tray_image(status)
 
 
-def main() -> None:
+class AsyncEngine:
+    """Event-driven run loop on a single asyncio event loop (--engine async).
+
+    Heartbeats, schedule transitions, warnings and the countdown are named
+    timers; the loop sleeps until the earliest timer is due or an external
+    event (console key, control command, tray, idle sample, config reload)
+    arrives, so every wakeup corresponds to something that happened. Add a
+    trigger with set_timer() instead of another polling loop.
+    """
+
+    def __init__(self, session: 'KeeperSession') -> None:
+        self.session = session
+        self.config = session.config
+        self.timers: dict = {}  # name -> (due Unix time, callback)
+        self.exit_reason: Optional[str] = None
+        self.phase: Optional[str] = None  # "active" or "waiting"
+        self.method = self.config.get('method', 'mouse')
+        self.keyboard_key = self.config.get('keyboard_key', 'scrolllock')
+        self.mouse_distance = self.config.get('mouse_move_distance', 10)
+        self.activity_interval = self.config.get('activity_interval', 120)
+        self.session_start = 0.0
+        self.end_time = 0.0
+        self.next_due: Optional[float] = None  # Scheduled time of the pending heartbeat
+        self.drift_due: Optional[float] = None  # None when the pending heartbeat is not on schedule
+        self.skipped_due: Optional[float] = None
+        self.warning_shown = False
+        self.seen_paused = False
+        self._idle_gate = False  # Last value of _idle_sampling() seen by the control loop
+        self._changed: Optional['asyncio.Event'] = None
+        self._settings_changed: Optional['asyncio.Event'] = None
+        self._reload_requested: Optional['asyncio.Event'] = None
+        self._keys: Optional['asyncio.Queue'] = None
+
+    def run(self) -> str:
+        """Run the loop until the keeper stops; returns the session exit reason."""
+        import asyncio  # Only the async engine pays for loading asyncio (and ssl)
+        return asyncio.run(self._main())
+
+    # --- timers -----------------------------------------------------------
+
+    def set_timer(self, name: str, due: float, callback) -> None:
+        """Call callback() on the loop at Unix time `due`, replacing a timer of the same name."""
+        self.timers[name] = (due, callback)
+
+    def cancel_timer(self, *names: str) -> None:
+        for name in names:
+            self.timers.pop(name, None)
+
+    def notify(self) -> None:
+        """Wake the control loop to re-evaluate state (call on the loop thread)."""
+        self._changed.set()
+
+    # --- main loop ----------------------------------------------------------
+
+    async def _main(self) -> str:
+        import asyncio
+        global _ASYNC_WAKE
+        loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._settings_changed = asyncio.Event()
+        self._reload_requested = asyncio.Event()
+        self._keys = asyncio.Queue()
+        _ASYNC_WAKE = lambda: loop.call_soon_threadsafe(self._changed.set)
+
+        if CONSOLE_KEYS and msvcrt is not None:
+            threading.Thread(target=self._read_console_keys, args=(loop,), name="keeper-keys", daemon=True).start()
+        tasks = [
+            asyncio.create_task(self._input_task(), name="keeper-input"),
+            asyncio.create_task(self._idle_task(), name="keeper-idle"),
+            asyncio.create_task(self._config_task(), name="keeper-config"),
+        ]
+        try:
+            return await self._control()
+        finally:
+            _ASYNC_WAKE = None
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.phase == "active":
+                self._leave_session(wait_for_schedule=False)
+
+    async def _control(self) -> str:
+        import asyncio
+        if self.config.get('schedule_enabled', False) and not is_within_schedule(self.config):
+            if not AUTO_RESTART:
+                return "outside_schedule"
+            self._enter_waiting()
+        else:
+            self._enter_session(self.session.resumed_from)
+
+        while True:
+            self._changed.clear()
+            if STOP_REQUESTED:
+                return "stopped"
+            if self.exit_reason is not None:
+                break
+            if CONFIG_RELOAD_REQUESTED and not self._reload_requested.is_set():
+                self._reload_requested.set()
+            self._sync_state()
+            publish_status()
+            if self.exit_reason is not None:
+                break
+            if self._idle_sampling() != self._idle_gate:
+                self._idle_gate = not self._idle_gate
+                self._settings_changed.set()
+
+            name = min(self.timers, key=lambda n: self.timers[n][0], default=None)
+            timeout = None if name is None else max(0.0, self.timers[name][0] - time.time())
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                entry = self.timers.pop(name, None)
+                if entry is not None:
+                    entry[1]()
+            count_metric("activity_keeper_loop_wakeups_total")
+        return self.exit_reason
+
+    def _sync_state(self) -> None:
+        """Derive schedule timers from the current state and react to pause changes."""
+        config = self.config
+        if self.phase == "waiting":
+            if not config.get('schedule_enabled', False) or is_within_schedule(config):
+                self._on_schedule_start()
+            else:
+                next_start = get_next_schedule_start(config)
+                self.set_timer("schedule_start", next_start.timestamp(), self._on_schedule_start)
+            return
+
+        if config.get('schedule_enabled', False):
+            schedule_end = _get_schedule_end_timestamp(config)
+            if schedule_end is None:
+                self._on_schedule_end()
+                return
+            self.set_timer("schedule_end", schedule_end, self._on_schedule_end)
+            warning_minutes = config.get('schedule_warning_minutes', 5)
+            if not self.warning_shown and isinstance(warning_minutes, (int, float)) and warning_minutes > 0:
+                self.set_timer("warning", schedule_end - warning_minutes * 60, self._on_warning)
+            else:
+                self.cancel_timer("warning")
+        else:
+            self.cancel_timer("schedule_end", "warning")
+
+        if PAUSED and not self.seen_paused:
+            self.cancel_timer("heartbeat", "countdown")
+            self.skipped_due = self.next_due or time.time()
+            self.set_timer("skipped", self.skipped_due, self._on_skipped)
+            self._draw()
+        elif not PAUSED and self.seen_paused:
+            self.cancel_timer("skipped")
+            self.next_due, self.drift_due = time.time(), None  # Heartbeat right after a resume
+            self.set_timer("heartbeat", self.next_due, self._on_heartbeat)
+        self.seen_paused = PAUSED
+
+    # --- phases -------------------------------------------------------------
+
+    def _enter_session(self, resume_state: Optional[dict] = None) -> None:
+        global STATUS, SCHEDULE_STATE, SESSION_STARTED_AT, SESSION_ENDS_AT, NEXT_HEARTBEAT_AT, PAUSED, AUTO_PAUSED
+        config = self.config
+        try:
+            self.activity_interval = int(config.get('activity_interval', self.activity_interval))
+        except (TypeError, ValueError):
+            pass
+        self.session_start = time.time()
+        self.end_time = self.session_start + int(config.get('total_duration', 18000))
+        pending = None
+        if resume_state and (resume_state.get('session_ends_at') or 0) > self.session_start:
+            self.session_start = resume_state.get('session_started_at') or self.session_start
+            self.end_time = resume_state['session_ends_at']
+            pending = resume_state.get('next_heartbeat_at')
+            verbose_log(f"Resuming session: ends in {int(self.end_time - time.time())}s")
+        SESSION_STARTED_AT, SESSION_ENDS_AT = self.session_start, self.end_time
+        STATUS = "RUNNING"
+        SCHEDULE_STATE = "active" if config.get('schedule_enabled', False) else "disabled"
+        self.phase = "active"
+        self.warning_shown = False
+        self.set_timer("session_end", self.end_time, self._on_session_end)
+
+        prevent_sleep()
+        if config.get('sound_enabled', False):
+            play_sound(config.get('sound_frequency', 1000), config.get('sound_duration', 200))
+            verbose_log("Played startup sound")
+
+        if self._inactivity_enabled():
+            idle_time = get_idle_time_seconds()
+            threshold = config.get('inactivity_threshold_seconds', 60)
+            if idle_time < threshold:
+                self._auto_pause(idle_time, threshold)
+
+        self.seen_paused = PAUSED
+        if PAUSED:
+            self.skipped_due = pending or time.time()
+            self.set_timer("skipped", self.skipped_due, self._on_skipped)
+        elif pending and pending > time.time():
+            self.next_due = self.drift_due = pending
+            NEXT_HEARTBEAT_AT = pending
+            self.set_timer("heartbeat", pending, self._on_heartbeat)
+            self._start_countdown()
+        else:
+            self._send_heartbeat(None)
+        self._draw()
+
+    def _leave_session(self, wait_for_schedule: bool) -> None:
+        global NEXT_HEARTBEAT_AT, SESSION_STARTED_AT, SESSION_ENDS_AT
+        self.cancel_timer("session_end", "schedule_end", "warning", "heartbeat", "skipped", "countdown")
+        NEXT_HEARTBEAT_AT = None
+        SESSION_STARTED_AT = SESSION_ENDS_AT = None
+        self.next_due = None
+        self.phase = None
+        allow_sleep()
+        if self.config.get('sound_enabled', False) and not wait_for_schedule:
+            play_sound(800, 300)
+            verbose_log("Played exit sound")
+
+    def _enter_waiting(self) -> None:
+        global STATUS, SCHEDULE_STATE, WAITING_UNTIL
+        STATUS = "WAITING"
+        SCHEDULE_STATE = "waiting"
+        self.phase = "waiting"
+        count_metric("activity_keeper_schedule_waits_total")
+        next_start = get_next_schedule_start(self.config)
+        WAITING_UNTIL = next_start.timestamp()
+        logger.info(f"Outside work hours, waiting for next schedule (resumes at {next_start.strftime('%H:%M')})")
+        console_log(f"Outside work hours, waiting for next schedule (resumes at {next_start.strftime('%H:%M on %A')})")
+        if TRAY_ENABLED:
+            update_tray_icon('waiting')
+        self._on_waiting_dashboard()
+
+    # --- timer callbacks ----------------------------------------------------
+
+    def _on_session_end(self) -> None:
+        self.exit_reason = "finished"
+
+    def _on_schedule_end(self) -> None:
+        if AUTO_RESTART and self.config.get('schedule_enabled', False):
+            console_log("Outside scheduled hours. Entering waiting mode.")
+            logger.info("Outside work hours, returning to waiting mode")
+            self._leave_session(wait_for_schedule=True)
+            self._enter_waiting()
+            return
+        console_log("Outside scheduled hours. Stopping.")
+        self.exit_reason = "finished"
+
+    def _on_schedule_start(self) -> None:
+        self.cancel_timer("schedule_start", "dashboard")
+        logger.info("Schedule started, resuming activity")
+        console_log("Schedule started, resuming activity")
+        if TRAY_ENABLED:
+            update_tray_icon('running')
+        self._enter_session()
+
+    def _on_warning(self) -> None:
+        if _get_schedule_end_timestamp(self.config) is not None:
+            self.warning_shown = True
+            show_schedule_warning(self.config)
+            self._draw()
+
+    def _on_heartbeat(self) -> None:
+        if self._inactivity_enabled():
+            # Sample once more right before injecting so a returning user is never jiggled
+            idle_time = get_idle_time_seconds()
+            threshold = self.config.get('inactivity_threshold_seconds', 60)
+            if idle_time < threshold:
+                self._auto_pause(idle_time, threshold)
+                self.next_due = self.next_due or time.time()
+                return
+        self._send_heartbeat(self.drift_due)
+        self._draw()
+
+    def _on_skipped(self) -> None:
+        reason = "auto_pause" if AUTO_PAUSED else "manual_pause"
+        count_metric("activity_keeper_heartbeats_skipped_total", reason=reason)
+        self.skipped_due += heartbeat_interval(self.activity_interval)
+        self.set_timer("skipped", self.skipped_due, self._on_skipped)
+
+    def _on_countdown(self) -> None:
+        if self.next_due is None or QUIET:
+            return
+        remaining = max(0, int(self.next_due - time.time()))
+        sys.stdout.write(f"\r>>> NEXT HEARTBEAT IN: {remaining}s   ")
+        sys.stdout.flush()
+        if remaining > 0:
+            self.set_timer("countdown", self.next_due - remaining + 0.001, self._on_countdown)
+
+    def _on_waiting_dashboard(self) -> None:
+        global WAITING_UNTIL
+        next_start = get_next_schedule_start(self.config)
+        WAITING_UNTIL = next_start.timestamp()
+        if not QUIET:
+            draw_dashboard(
+                "WAITING",
+                self.config.get('activity_interval', self.activity_interval),
+                TOTAL_JIGGLES,
+                self.session.start_time,
+                self.method,
+                self.session.history,
+                show_warning=False,
+                waiting_until=next_start,
+            )
+            self.set_timer("dashboard", time.time() + 60, self._on_waiting_dashboard)
+
+    # --- actions ------------------------------------------------------------
+
+    def _send_heartbeat(self, due_at: Optional[float]) -> None:
+        global NEXT_HEARTBEAT_AT
+        if time.time() >= self.end_time:
+            return
+        perform_heartbeat(
+            self.method,
+            self.keyboard_key,
+            self.mouse_distance,
+            self.config,
+            self.session.history,
+            due_at,
+            self.config.get('pattern_randomization_enabled', False),
+            self.config.get('randomization_mouse_probability', 0.7),
+        )
+        interval = heartbeat_interval(self.activity_interval)
+        jitter = int(interval * JITTER_PERCENTAGE)
+        current_wait = interval + keeper_random.get_stream().randint(-jitter, jitter)
+        verbose_log(f"Next interval: {current_wait}s (jitter applied: ±{jitter}s)")
+        self.next_due = self.drift_due = time.time() + current_wait
+        NEXT_HEARTBEAT_AT = self.next_due
+        self.set_timer("heartbeat", self.next_due, self._on_heartbeat)
+        self._start_countdown()
+
+    def _start_countdown(self) -> None:
+        if not QUIET and OUTPUT_MODE == "tty":
+            self.set_timer("countdown", time.time(), self._on_countdown)
+
+    def _draw(self) -> None:
+        if not QUIET and self.phase == "active":
+            draw_dashboard(
+                "RUNNING",
+                self.activity_interval,
+                TOTAL_JIGGLES,
+                self.session_start,
+                self.method,
+                self.session.history,
+                self.warning_shown,
+            )
+
+    def _inactivity_enabled(self) -> bool:
+        return DETECT_INACTIVITY or self.config.get('inactivity_detection_enabled', False)
+
+    def _idle_sampling(self) -> bool:
+        """Whether an idle sample could change anything right now."""
+        return self._inactivity_enabled() and self.phase == "active" and not (PAUSED and not AUTO_PAUSED)
+
+    def _auto_pause(self, idle_time: float, threshold: float) -> None:
+        global PAUSED, AUTO_PAUSED
+        PAUSED = True
+        AUTO_PAUSED = True
+        if TRAY_ENABLED:
+            update_tray_icon('paused')
+        count_metric("activity_keeper_auto_pauses_total")
+        console_log("User activity detected, automatically pausing...")
+        verbose_log(f"Auto-pausing: idle_time={idle_time:.2f}s < threshold={threshold}s")
+        self.notify()
+
+    def _auto_resume(self, idle_time: float, threshold: float) -> None:
+        global PAUSED, AUTO_PAUSED
+        PAUSED = False
+        AUTO_PAUSED = False
+        if TRAY_ENABLED:
+            update_tray_icon('running')
+        count_metric("activity_keeper_auto_resumes_total")
+        console_log("User inactivity detected, automatically resuming...")
+        verbose_log(f"Auto-resuming: idle_time={idle_time:.2f}s >= threshold={threshold}s")
+        self.notify()
+
+    def _apply_reload(self, success: bool, message: str) -> None:
+        global CONFIG_RELOAD_REQUESTED
+        if success and _RELOADED_CONFIG is not None:
+            old_config = dict(self.config)
+            self.config.clear()
+            self.config.update(_RELOADED_CONFIG)
+            try:
+                self.activity_interval = int(self.config.get('activity_interval', self.activity_interval))
+            except (TypeError, ValueError):
+                pass
+            self.config['activity_interval'] = self.activity_interval
+            for key in RELOADABLE_KEYS:
+                if old_config.get(key) != self.config.get(key):
+                    verbose_log(f"Config updated: {key} = {old_config.get(key)} -> {self.config.get(key)}")
+            for key in RESTART_REQUIRED_KEYS:
+                if old_config.get(key) != self.config.get(key):
+                    verbose_log(f"Config changed (requires restart): {key} = {old_config.get(key)} -> {self.config.get(key)}")
+            console_log("Configuration reloaded successfully!")
+            if self.phase == "active" and not PAUSED:
+                # Restart the wait with the new interval, like the threaded engine
+                interval = heartbeat_interval(self.activity_interval)
+                jitter = int(interval * JITTER_PERCENTAGE)
+                self.next_due = self.drift_due = time.time() + interval + keeper_random.get_stream().randint(-jitter, jitter)
+                self.set_timer("heartbeat", self.next_due, self._on_heartbeat)
+                self._start_countdown()
+            self._draw()
+        else:
+            console_log(f"Config reload failed: {message}")
+        CONFIG_RELOAD_REQUESTED = False
+
+    # --- tasks ----------------------------------------------------------------
+
+    def _read_console_keys(self, loop: 'asyncio.AbstractEventLoop') -> None:
+        """Blocking msvcrt reader thread; hands each key to the input task."""
+        while True:
+            key = ord(msvcrt.getch())
+            try:
+                loop.call_soon_threadsafe(self._keys.put_nowait, key)
+            except RuntimeError:
+                return  # Loop closed
+
+    async def _input_task(self) -> None:
+        while True:
+            key = await self._keys.get()
+            if key in EXIT_KEYS:
+                verbose_log(f"Exit key detected: {key}")
+                self.exit_reason = "stopped"
+            elif key in [67, 99]:  # C or c
+                console_log("Config reload requested...")
+                self.session.reload()
+            elif key in [80, 112]:  # P or p
+                self.session.pause()
+            elif key in [82, 114]:  # R or r
+                self.session.resume()
+            self.notify()
+
+    async def _idle_task(self) -> None:
+        """Sample idle time only when the answer can change what the keeper does."""
+        import asyncio
+        while True:
+            if not self._idle_sampling():
+                await self._settings_changed.wait()
+                self._settings_changed.clear()
+                continue
+            idle_time = get_idle_time_seconds()
+            threshold = self.config.get('inactivity_threshold_seconds', 60)
+            if idle_time < threshold:
+                if not PAUSED:
+                    self._auto_pause(idle_time, threshold)
+                delay = threshold - idle_time  # Earliest moment the user can count as away
+            else:
+                if PAUSED and AUTO_PAUSED:
+                    self._auto_resume(idle_time, threshold)
+                delay = self.config.get('inactivity_check_interval', 10)
+            count_metric("activity_keeper_loop_wakeups_total")
+            await asyncio.sleep(max(0.1, delay))
+
+    async def _config_task(self) -> None:
+        """Apply reload requests; the file is read and validated off the loop thread."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._reload_requested.wait()
+            success, message = await loop.run_in_executor(None, reload_config)
+            self._reload_requested.clear()
+            self._apply_reload(success, message)
+            self.notify()
+
+
+class KeeperSession:
+    """Embeddable keeper run loop.
+
+    Lets another Python program drive the keeper without a subprocess:
+
+        session = KeeperSession(load_config('activity_config.json'))
+        threading.Thread(target=session.run, daemon=True).start()
+        session.pause()
+        print(session.stats())
+        session.stop()
+
+    The keeper state lives in module globals, so only one session can be
+    running per process at a time.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        *,
+        verbose: bool = False,
+        quiet: bool = True,
+        dry_run: bool = False,
+        auto_restart: bool = False,
+        detect_inactivity: bool = False,
+        random_pattern: bool = False,
+        console_keys: bool = False,
+        output_mode: str = "tty",
+        profile: str = "default",
+        config_file: Optional[str] = None,
+        status_file: Optional[str] = None,
+        metrics_port: Optional[int] = None,
+        metrics_file: Optional[str] = None,
+        metrics_interval: float = 15.0,
+        trace_file: Optional[str] = None,
+        trace_buffer: int = 100_000,
+        history_capacity: int = 4096,
+        engine: str = "sync",
+        checkpoint_file: Optional[str] = None,
+        checkpoint_fsync_interval: float = 5.0,
+        checkpoint_snapshot_interval: float = 300.0,
+        resume_max_age: float = 900.0,
+        idle_trace_file: Optional[str] = None,
+        idle_trace_interval: float = 1.0,
+        idle_trace_max_bytes: int = 4 * 1024 * 1024,
+        adaptive_interval: bool = False,
+        click_plan=None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.config = config
+        self.verbose = verbose
+        self.quiet = quiet
+        self.dry_run = dry_run
+        self.auto_restart = auto_restart
+        self.detect_inactivity = detect_inactivity
+        self.random_pattern = random_pattern
+        self.console_keys = console_keys
+        self.output_mode = output_mode  # "tty" or "lines" (see OUTPUT_MODE)
+        self.profile = profile
+        self.config_file = config_file  # Source for reload(); defaults to current_config_file
+        self.status_file = status_file  # Memory-mapped status page path ('' = default path)
+        self.metrics_port = metrics_port  # Serve Prometheus metrics on 127.0.0.1:<port>
+        self.metrics_file = metrics_file  # Or rewrite them into this file every metrics_interval seconds
+        self.metrics_interval = metrics_interval
+        self.trace_file = trace_file  # Chrome trace JSON written on exit and by dump_trace()
+        self.trace_buffer = trace_buffer  # Ring buffer capacity in spans
+        self.history = ActivityHistory(history_capacity)  # Kept across keep_active() sessions and runs
+        self.engine = engine  # "sync" (polling loops) or "async" (AsyncEngine)
+        self.checkpoint_file = checkpoint_file  # Journal/snapshot base path for crash recovery
+        self.checkpoint_fsync_interval = checkpoint_fsync_interval
+        self.checkpoint_snapshot_interval = checkpoint_snapshot_interval
+        self.resume_max_age = resume_max_age  # Older checkpoints start a fresh session
+        self.idle_trace_file = idle_trace_file  # Record get_idle_time_seconds() here for `tune`
+        self.idle_trace_interval = idle_trace_interval
+        self.idle_trace_max_bytes = idle_trace_max_bytes  # Rotated to <path>.1 beyond this size
+        self.idle_recorder = None
+        self.adaptive_interval = adaptive_interval  # Or config 'adaptive_interval_enabled'
+        self.low_power = None  # keeper_lowpower.AdaptiveInterval of the last run()
+        self.click_plan = click_plan  # mouse_automation config path or dict; or config 'click_plan'
+        self.click_job = None  # keeper_clickplan.ClickPlanJob of the last run()
+        self.seed = seed  # Seed for keeper_random; a fresh one per run() when None
+        self.rng = None  # keeper_random.RandomStream of the last run()
+        self.resumed_from: Optional[dict] = None  # Checkpoint state this run continued from
+        self.start_time: Optional[float] = None
+        self.exit_reason: Optional[str] = None  # finished, stopped or outside_schedule
+
+    def _apply_options(self) -> None:
+        """Copy this session's options into the module-level flags used by the loop."""
+        global VERBOSE, QUIET, DRY_RUN, AUTO_RESTART, DETECT_INACTIVITY, RANDOM_PATTERN, CONSOLE_KEYS, OUTPUT_MODE, PROFILE, current_config_file, _LAST_EVENT_STATE
+        VERBOSE = self.verbose
+        QUIET = self.quiet
+        DRY_RUN = self.dry_run
+        AUTO_RESTART = self.auto_restart
+        DETECT_INACTIVITY = self.detect_inactivity
+        RANDOM_PATTERN = self.random_pattern
+        CONSOLE_KEYS = self.console_keys
+        OUTPUT_MODE = self.output_mode
+        _LAST_EVENT_STATE = None
+        PROFILE = self.profile
+        if self.config_file is not None:
+            current_config_file = self.config_file
+
+    def _load_resume_state(self) -> Optional[dict]:
+        """Return the checkpointed state to continue from, or None to start fresh.
+
+        Only an unclean exit (crash, kill, power loss) that is younger than
+        resume_max_age is resumed.
+        """
+        import keeper_checkpoint
+        checkpoint = keeper_checkpoint.load_checkpoint(self.checkpoint_file)
+        self._checkpoint_seq = checkpoint["seq"] if checkpoint else 0
+        if checkpoint is None:
+            return None
+        state = checkpoint["state"]
+        age = time.time() - checkpoint["saved_at"]
+        if state.get("clean_exit"):
+            verbose_log("Previous run exited cleanly, starting a fresh session")
+            return None
+        if age > self.resume_max_age:
+            verbose_log(f"Checkpoint is {int(age)}s old, starting a fresh session")
+            return None
+        return state
+
+    def run(self) -> dict:
+        """Run until the duration ends, the schedule stops it, or stop() is called.
+
+        Blocks the calling thread and returns the final stats(). Raises
+        ValueError for an invalid config and RuntimeError if another session
+        is already running.
+        """
+        global _ACTIVE_SESSION, STOP_REQUESTED, STATUS, TOTAL_JIGGLES, LAST_HEARTBEAT_AT, STATUS_PAGE, METRICS, CHECKPOINT, PAUSED, LOW_POWER
+
+        is_valid, error_msg = validate_config(self.config)
+        if not is_valid:
+            raise ValueError(error_msg)
+        click_plan = self.click_plan or self.config.get('click_plan')
+        plan_config = plan_timeline = None
+        if click_plan:
+            import keeper_clickplan
+            plan_config = keeper_clickplan.load_plan_config(click_plan)  # Raises ValueError before anything starts
+            plan_timeline = keeper_clickplan.compile_plan_config(plan_config)
+        if self.engine not in ("sync", "async"):
+            raise ValueError(f"Unknown engine: {self.engine} (expected sync or async)")
+        if _ACTIVE_SESSION is not None:
+            raise RuntimeError("Another KeeperSession is already running in this process")
+
+        _ACTIVE_SESSION = self
+        exporters = []
+        self.low_power = None
+        self.click_job = None
+        self.idle_recorder = None
+        clean_exit = False
+        try:
+            # Everything below may fail to start (port in use, unwritable path); _shut_down() undoes what did start
+            self._apply_options()
+            self.rng = keeper_random.configure(self.seed)
+            logger.info(f"Random seed: {self.rng.seed} (replay with --seed {self.rng.seed})")
+            verbose_log(f"Random seed: {self.rng.seed}")
+            STOP_REQUESTED = False
+            TOTAL_JIGGLES = 0
+            LAST_HEARTBEAT_AT = None
+            _WAKE.clear()
+            self.start_time = time.time()
+            self.exit_reason = None
+            self.resumed_from = None
+            if self.checkpoint_file:
+                import keeper_checkpoint
+                self.resumed_from = self._load_resume_state()
+                if self.resumed_from is not None:
+                    state = self.resumed_from
+                    self.start_time = state.get("program_start") or self.start_time
+                    TOTAL_JIGGLES = state.get("total_jiggles", 0)
+                    LAST_HEARTBEAT_AT = state.get("last_heartbeat_at")
+                    PAUSED = bool(state.get("paused")) and not state.get("auto_paused")
+                    message = (
+                        f"Resumed session from checkpoint (uptime {int(time.time() - self.start_time)}s, "
+                        f"{TOTAL_JIGGLES} heartbeats{', paused' if PAUSED else ''})"
+                    )
+                    console_log(message)
+                    logger.info(message)
+                CHECKPOINT = keeper_checkpoint.CheckpointWriter(
+                    self.checkpoint_file,
+                    self.checkpoint_fsync_interval,
+                    self.checkpoint_snapshot_interval,
+                    initial_seq=self._checkpoint_seq,
+                )
+                CHECKPOINT.start()
+            if self.status_file is not None:
+                import keeper_status
+                STATUS_PAGE = keeper_status.StatusPage(self.status_file or None)
+            if self.trace_file:
+                import keeper_trace
+                keeper_trace.enable(self.trace_buffer)
+            if self.metrics_port is not None or self.metrics_file:
+                import keeper_metrics
+                METRICS = keeper_metrics.create_keeper_registry()
+                if self.metrics_port is not None:
+                    exporters.append(keeper_metrics.MetricsHTTPServer(METRICS, self.metrics_port))
+                if self.metrics_file:
+                    exporters.append(keeper_metrics.MetricsFileWriter(METRICS, self.metrics_file, self.metrics_interval))
+                for exporter in exporters:
+                    exporter.start()
+                    console_log(f"Metrics exported at {exporter.address}")
+            if self.adaptive_interval or self.config.get('adaptive_interval_enabled', False):
+                import keeper_lowpower
+                self.low_power = LOW_POWER = keeper_lowpower.AdaptiveInterval(
+                    self.config, get_idle_time_seconds, lambda: STAY_AWAKE, JITTER_PERCENTAGE
+                )
+            if plan_config is not None:
+                self.click_job = self._start_click_job(plan_config, plan_timeline)
+            if self.idle_trace_file:
+                import keeper_idle
+                self.idle_recorder = keeper_idle.IdleRecorder(
+                    self.idle_trace_file, get_idle_time_seconds, self.idle_trace_interval, self.idle_trace_max_bytes
+                )
+                self.idle_recorder.start()
+                console_log(f"Recording idle trace to {self.idle_trace_file}")
+
+            if self.engine == "async":
+                self.exit_reason = AsyncEngine(self).run()
+            else:
+                self.exit_reason = self._run_loop()
+            clean_exit = True
+        except (KeyboardInterrupt, SystemExit):
+            clean_exit = True  # Ctrl+C / signal exit is deliberate, not a crash
+            raise
+        finally:
+            self._shut_down(exporters, clean_exit)
+        return self.stats()
+
+    def _shut_down(self, exporters: list, clean_exit: bool) -> None:
+        """Stop whatever run() started. Each step runs even when an earlier one fails."""
+        global _ACTIVE_SESSION, STATUS, STATUS_PAGE, METRICS, CHECKPOINT, LOW_POWER
+
+        def step(name: str, action) -> None:
+            try:
+                action()
+            except Exception as e:
+                logger.error(f"Shutdown: {name} failed: {e}")
+
+        def report_low_power() -> None:
+            low_power = self.low_power.stats()
+            if low_power["disabled_reason"]:
+                logger.warning(f"Adaptive interval disabled: {low_power['disabled_reason']}")
+            elif low_power["interval"]:
+                logger.info(
+                    f"Adaptive interval: {low_power['interval']}s instead of {low_power['base_interval']}s "
+                    f"(timeout {low_power['presence_timeout_seconds']}s from {low_power['timeout_source']}), "
+                    f"{low_power['heartbeats_saved']} heartbeats saved"
+                )
+
+        def stop_click_job() -> None:
+            self.click_job.stop()
+            if self.click_job.error:
+                logger.warning(f"Click plan stopped: {self.click_job.error}")
+
+        def close_idle_recorder() -> None:
+            self.idle_recorder.close()
+            if self.idle_recorder.error:
+                logger.warning(f"Idle trace recording stopped: {self.idle_recorder.error}")
+
+        for exporter in exporters:
+            step("metrics exporter", exporter.close)
+        METRICS = None
+        if self.click_job is not None:
+            step("click plan", stop_click_job)
+        LOW_POWER = None
+        if self.low_power is not None:
+            step("adaptive interval report", report_low_power)
+        if self.idle_recorder is not None:
+            step("idle trace", close_idle_recorder)
+        if self.trace_file:
+            import keeper_trace
+            if keeper_trace.active() is not None:
+                step("trace dump", self.dump_trace)
+            step("tracing", keeper_trace.disable)
+        STATUS = "STOPPED"
+        step("status", publish_status)
+        if STATUS_PAGE is not None:
+            step("status page", STATUS_PAGE.close)
+            STATUS_PAGE = None
+        if CHECKPOINT is not None:
+            step("checkpoint", lambda: CHECKPOINT.close(clean_exit))
+            if CHECKPOINT.error:
+                logger.warning(f"Checkpointing stopped: {CHECKPOINT.error}")
+            CHECKPOINT = None
+        _ACTIVE_SESSION = None
+
+    def _start_click_job(self, plan_config: dict, timeline):
+        """Start a click plan that shares the heartbeat input lock and log; it counts its own clicks."""
+        import keeper_clickplan
+        import mouse_automation
+        import mouse_trajectory
+
+        rng = self.rng.spawn("click_plan")  # Own stream: its draws do not depend on heartbeat timing
+        if DRY_RUN:
+            backend = mouse_automation.DryRunBackend()
+        else:
+            load_pyautogui()
+            # Own trajectory engine too, so moves on the job thread never draw from the heartbeat streams
+            backend = mouse_automation.PyAutoGuiBackend(mouse_trajectory.TrajectoryEngine(rng.spawn("trajectory")))
+
+        def on_click(record: dict) -> None:
+            if record.get("skipped"):
+                verbose_log(f"Click plan: {record['step']} skipped ({current_state()})")
+                return
+            if record["pos"] is None:
+                logger.info(f"Click plan: {record['step']} skipped, {record.get('image')} not found on screen")
+                return
+            x, y = record["pos"]
+            message = f"Click plan: {record['step']} ({record['button']}) at ({x}, {y}), {record['late'] * 1000:.0f} ms late"
+            logger.info(f"{message} (DRY-RUN: {DRY_RUN})")
+            if OUTPUT_MODE == "lines":
+                console_log(message)
+
+        job = keeper_clickplan.ClickPlanJob(
+            plan_config,
+            timeline,
+            backend,
+            is_active=lambda: STATUS == "RUNNING" and not PAUSED and not STOP_REQUESTED,
+            lock=INPUT_LOCK,
+            on_click=on_click,
+            rng=rng,
+        )
+        job.start()
+        console_log(f"Click plan started: {len(job.timeline)} clicks every {job.timeline.period:.0f}s")
+        return job
+
+    def pause(self) -> None:
+        """Pause heartbeats until resume() is called."""
+        global PAUSED, AUTO_PAUSED
+        PAUSED = True
+        AUTO_PAUSED = False  # Manual pause overrides auto-pause
+        if TRAY_ENABLED:
+            update_tray_icon('paused')
+        verbose_log("Program PAUSED")
+        publish_status()
+        wake_keeper()
+
+    def resume(self) -> None:
+        """Resume heartbeats after pause() or an auto-pause."""
+        global PAUSED, AUTO_PAUSED
+        PAUSED = False
+        AUTO_PAUSED = False
+        if TRAY_ENABLED:
+            update_tray_icon('waiting' if STATUS == "WAITING" else 'running')
+        verbose_log("Program RESUMED")
+        publish_status()
+        wake_keeper()
+
+    def stop(self) -> None:
+        """Ask run() to return as soon as possible. Safe to call from any thread."""
+        global STOP_REQUESTED
+        STOP_REQUESTED = True
+        verbose_log("Stop requested")
+        wake_keeper()
+
+    def reload(self) -> None:
+        """Ask the run loop to reload the config file at its next wakeup."""
+        global CONFIG_RELOAD_REQUESTED
+        CONFIG_RELOAD_REQUESTED = True
+        verbose_log("Config reload requested")
+        wake_keeper()
+
+    @traced
+    def handle_command(self, cmd: str, request: Optional[dict] = None) -> dict:
+        """Run a control command (pause, resume, reload, stats, stop, trace) and return stats()."""
+        actions = {
+            "pause": self.pause,
+            "resume": self.resume,
+            "reload": self.reload,
+            "stop": self.stop,
+            "stats": lambda: None,
+            "trace": lambda: self.dump_trace((request or {}).get("file")),
+        }
+        if cmd not in actions:
+            raise ValueError(f"Unknown command: {cmd}")
+        if cmd != "stats":
+            console_log(f"Control command received: {cmd}")
+            logger.info(f"Control command received: {cmd}")
+        extra = actions[cmd]()
+        result = self.stats()
+        if cmd == "trace":
+            result["trace"] = extra
+        return result
+
+    def dump_trace(self, path: Optional[str] = None) -> dict:
+        """Write the trace ring buffer as Chrome trace JSON without stopping the tracer."""
+        import keeper_trace
+        tracer = keeper_trace.active()
+        if tracer is None:
+            raise RuntimeError("Tracing is not enabled (start with --trace PATH)")
+        path = path or self.trace_file
+        events = tracer.dump(path)
+        console_log(f"Trace written to {path} ({events} events)")
+        logger.info(f"Trace written to {path} ({events} events)")
+        return {"file": os.path.abspath(path), "events": events}
+
+    def history_since(self, minutes: float) -> list:
+        """Return heartbeats from the last `minutes` minutes as dicts, oldest first."""
+        return [record._asdict() for record in self.history.since(minutes * 60)]
+
+    def stats(self) -> dict:
+        """Return a snapshot of the session state."""
+        uptime = time.time() - self.start_time if self.start_time is not None else 0.0
+        return {
+            "state": current_state(),
+            "schedule_state": SCHEDULE_STATE,
+            "paused": PAUSED,
+            "auto_paused": AUTO_PAUSED,
+            "uptime_seconds": round(uptime, 3),
+            "total_jiggles": TOTAL_JIGGLES,
+            "next_heartbeat_at": NEXT_HEARTBEAT_AT,
+            "last_heartbeat_at": LAST_HEARTBEAT_AT,
+            "last_hour": self.history.summary(3600),
+            "profile": self.profile,
+            "exit_reason": self.exit_reason,
+            "resumed": self.resumed_from is not None,
+            "adaptive_interval": self.low_power.stats() if self.low_power is not None else None,
+            "click_plan": self.click_job.stats() if self.click_job is not None else None,
+            "seed": self.rng.seed if self.rng is not None else None,
+            "version": VERSION,
+        }
+
+    def _process_waiting_reload(self) -> None:
+        """Apply a pending config reload while waiting for the schedule."""
+        global CONFIG_RELOAD_REQUESTED
+        if not CONFIG_RELOAD_REQUESTED:
+            return
+
+        config = self.config
+        success, message = reload_config()
+        if success and _RELOADED_CONFIG is not None:
+            old_config = dict(config)
+            config.clear()
+            config.update(_RELOADED_CONFIG)
+            if VERBOSE:
+                for key in ['schedule_enabled', 'work_hours_start', 'work_hours_end', 'work_days']:
+                    if old_config.get(key) != config.get(key):
+                        verbose_log(
+                            f"Config updated (waiting): {key} = {old_config.get(key)} -> {config.get(key)}"
+                        )
+            console_log("Configuration reloaded successfully!")
+        else:
+            console_log(f"Config reload failed: {message}")
+        CONFIG_RELOAD_REQUESTED = False
+
+    def _run_loop(self) -> str:
+        """Alternate between keep_active() sessions and waiting for the schedule."""
+        global CONFIG_RELOAD_REQUESTED, PAUSED, AUTO_PAUSED, STATUS, SCHEDULE_STATE, WAITING_UNTIL
+        config = self.config
+        activity_interval = config.get('activity_interval', 120)
+        total_duration = config.get('total_duration', 18000)
+        method = config.get('method', 'mouse')
+        keyboard_key = config.get('keyboard_key', 'scrolllock')
+        mouse_distance = config.get('mouse_move_distance', 10)
+        resume_state = self.resumed_from  # Only the first keep_active() call continues the checkpoint
+
+        while True:
+            # Allow some settings to affect new sessions (e.g., after --auto-restart)
+            try:
+                activity_interval = int(config.get('activity_interval', activity_interval))
+            except (TypeError, ValueError):
+                pass
+            try:
+                total_duration = int(config.get('total_duration', total_duration))
+            except (TypeError, ValueError):
+                pass
+
+            if config.get('schedule_enabled', False) and not is_within_schedule(config):
+                if not AUTO_RESTART:
+                    return "outside_schedule"
+
+                STATUS = "WAITING"
+                SCHEDULE_STATE = "waiting"
+                count_metric("activity_keeper_schedule_waits_total")
+                next_start = get_next_schedule_start(config)
+                logger.info(
+                    f"Outside work hours, waiting for next schedule (resumes at {next_start.strftime('%H:%M')})"
+                )
+                console_log(
+                    f"Outside work hours, waiting for next schedule (resumes at {next_start.strftime('%H:%M on %A')})"
+                )
+
+                if TRAY_ENABLED:
+                    update_tray_icon('waiting')
+
+                while config.get('schedule_enabled', False) and not is_within_schedule(config):
+                    self._process_waiting_reload()
+
+                    next_start = get_next_schedule_start(config)
+                    WAITING_UNTIL = next_start.timestamp()
+                    publish_status()
+                    if not QUIET:
+                        draw_dashboard(
+                            "WAITING",
+                            config.get('activity_interval', activity_interval),
+                            TOTAL_JIGGLES,
+                            self.start_time,
+                            method,
+                            self.history,
+                            show_warning=False,
+                            waiting_until=next_start,
+                        )
+
+                    for _ in range(60):
+                        if STOP_REQUESTED:
+                            return "stopped"
+
+                        key = read_key()
+                        if key is not None:
+                            if key in EXIT_KEYS:
+                                request_exit(key)
+                                return "stopped"
+                            if key in [67, 99]:  # C or c
+                                CONFIG_RELOAD_REQUESTED = True
+                                console_log("Config reload requested...")
+                                verbose_log("Config reload requested via keypress (waiting)")
+                            if key in [80, 112]:  # P or p
+                                PAUSED = True
+                                if TRAY_ENABLED:
+                                    update_tray_icon('paused')
+                                verbose_log("Program PAUSED")
+                            elif key in [82, 114]:  # R or r
+                                PAUSED = False
+                                AUTO_PAUSED = False  # Reset auto-pause on manual resume
+                                if TRAY_ENABLED:
+                                    # Resumed but still outside the schedule, so show waiting (blue)
+                                    update_tray_icon('waiting')
+                                verbose_log("Program RESUMED")
+
+                        self._process_waiting_reload()
+                        publish_status()
+
+                        if is_within_schedule(config):
+                            break
+                        idle_wait(1)
+
+                logger.info("Schedule started, resuming activity")
+                console_log("Schedule started, resuming activity")
+                if TRAY_ENABLED:
+                    update_tray_icon('running')
+                continue
+
+            should_wait_for_schedule, _ = keep_active(
+                activity_interval,
+                total_duration,
+                method,
+                keyboard_key,
+                mouse_distance,
+                config,
+                self.history,
+                resume_state,
+            )
+            resume_state = None
+
+            if STOP_REQUESTED:
+                return "stopped"
+
+            if should_wait_for_schedule and AUTO_RESTART:
+                continue
+
+            return "finished"
+
+
+def run_ctl_command(argv: list) -> int:
+    """`ctl` subcommand: send pause/resume/reload/stats/stop to a running keeper."""
+    import keeper_control
+    return keeper_control.main(argv)
+
+
+def run_status_command(argv: list) -> int:
+    """`status` subcommand: print the status page published with --status-file."""
+    import keeper_status
+    return keeper_status.main(argv)
+
+
+def run_supervise_command(argv: list) -> int:
+    """`supervise` subcommand: run the keeper as a child process and restart it on crashes."""
+    import keeper_supervise
+    return keeper_supervise.main(argv)
+
+
+def run_tune_command(argv: list) -> int:
+    """`tune` subcommand: replay idle traces recorded with --record-idle against candidate thresholds."""
+    import keeper_idle
+    return keeper_idle.main(argv)
+
+
+def run_aggregate_command(argv: list) -> int:
+    """`aggregate` subcommand: poll many keepers concurrently and merge their status."""
+    import keeper_aggregate
+    return keeper_aggregate.main(argv)
+
+
+def run_minimal_command(argv: list) -> int:
+    """`minimal` subcommand: run the minimal headless keeper (smallest when started as keeper_minimal.py)."""
+    import keeper_minimal
+    return keeper_minimal.main(argv)
+
+
+def run_validate_command(argv: list) -> int:
+    """`validate` subcommand: check config and preset files (or directory trees of them) against the schema."""
+    return keeper_config.main(argv)
+
+
+def get_subcommands() -> dict:
+    """Returns a dictionary of subcommand names and their entry points."""
+    return {
+        "aggregate": run_aggregate_command,
+        "ctl": run_ctl_command,
+        "minimal": run_minimal_command,
+        "status": run_status_command,
+        "supervise": run_supervise_command,
+        "tune": run_tune_command,
+        "validate": run_validate_command,
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    subcommands = get_subcommands()
+    if argv and argv[0] in subcommands:
+        sys.exit(subcommands[argv[0]](argv[1:]))
+
     parser = argparse.ArgumentParser(description="Keep PC active and Teams green without mouse clicks")
     parser.add_argument('--config', type=str, default='activity_config.json', help='Configuration file')
     parser.add_argument('--interval', type=int, help='Activity interval in seconds')
@@ -1089,9 +2366,46 @@ def main() -> None:
     parser.add_argument('--detect-inactivity', action='store_true', help='Automatically pause when user activity is detected')
     parser.add_argument('--random-pattern', action='store_true', help='Randomly vary activity method between mouse and keyboard for human-like behavior')
     parser.add_argument('--tray', action='store_true', help='Run in system tray with icon and menu controls')
-    args = parser.parse_args()
+    parser.add_argument('--control', nargs='?', const='', metavar='ADDRESS', help='Accept pause/resume/reload/stats/stop commands on a local socket or named pipe (see "ctl" subcommand); tcp:HOST:PORT serves read-only stats to "aggregate"')
+    parser.add_argument('--status-file', nargs='?', const='', metavar='PATH', help='Publish live status to a memory-mapped file for external readers (see "status" subcommand)')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT', help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-file', type=str, metavar='PATH', help='Rewrite Prometheus metrics into PATH periodically (textfile collector)')
+    parser.add_argument('--metrics-interval', type=float, default=15.0, metavar='SECONDS', help='Rewrite interval for --metrics-file (default: 15)')
+    parser.add_argument('--trace', type=str, metavar='PATH', help='Record a timeline and write it to PATH as Chrome trace JSON on exit (open in Perfetto)')
+    parser.add_argument('--trace-buffer', type=int, default=100_000, metavar='N', help='Number of most recent spans kept for --trace (default: 100000)')
+    parser.add_argument('--profile-run', nargs='?', const='profile_run', metavar='DIR', help='Run under cProfile with periodic tracemalloc snapshots; write reports to DIR (default: profile_run)')
+    parser.add_argument('--profile-snapshot-interval', type=float, default=600.0, metavar='SECONDS', help='Seconds between tracemalloc snapshots for --profile-run (default: 600)')
+    parser.add_argument('--profile-top', type=int, default=25, metavar='N', help='Entries in the --profile-run summaries (default: 25)')
+    parser.add_argument('--output', choices=['auto', 'tty', 'lines'], default='auto', help='Console output: live dashboard (tty), one line per event (lines), or lines only when stdout is redirected (auto, default)')
+    parser.add_argument('--engine', choices=['sync', 'async'], default='sync', help='Run loop: "sync" polling loops or a single event-driven asyncio loop (default: sync)')
+    parser.add_argument('--checkpoint', nargs='?', const='activity_keeper.checkpoint', metavar='PATH', help='Journal session state to PATH and resume it after a crash (default: activity_keeper.checkpoint)')
+    parser.add_argument('--checkpoint-fsync', type=float, default=5.0, metavar='SECONDS', help='Maximum seconds between journal fsyncs for --checkpoint (default: 5)')
+    parser.add_argument('--checkpoint-snapshot', type=float, default=300.0, metavar='SECONDS', help='Seconds between compacted snapshots for --checkpoint (default: 300)')
+    parser.add_argument('--resume-max-age', type=float, default=900.0, metavar='SECONDS', help='Ignore checkpoints older than this when resuming (default: 900)')
+    parser.add_argument('--record-idle', nargs='?', const='idle_trace.akit', metavar='PATH', help='Record idle-time samples to a binary trace for the "tune" subcommand (default: idle_trace.akit)')
+    parser.add_argument('--record-idle-interval', type=float, default=1.0, metavar='SECONDS', help='Seconds between idle samples for --record-idle (default: 1)')
+    parser.add_argument('--record-idle-max-kb', type=int, default=4096, metavar='KB', help='Rotate the idle trace to PATH.1 beyond this size (default: 4096)')
+    parser.add_argument('--seed', type=int, help='Seed for all random decisions (jitter, jiggle offsets, method choice); the seed of every run is logged')
+    parser.add_argument('--click-plan', type=str, metavar='PATH', help='Also run a mouse_automation click plan (e.g. config.json) inside the keeper, sharing its schedule, pause state and input')
+    parser.add_argument('--adaptive-interval', action='store_true', help='Stretch the heartbeat interval to the measured presence timeout minus adaptive_interval_margin_seconds')
+    args = parser.parse_args(argv)
+
+    global _PROFILE_RUN_ACTIVE
+    if args.profile_run is not None and not _PROFILE_RUN_ACTIVE:
+        import keeper_profile
+        _PROFILE_RUN_ACTIVE = True
+        try:
+            keeper_profile.run_profiled(
+                lambda: main(argv),
+                args.profile_run,
+                args.profile_snapshot_interval,
+                args.profile_top,
+            )
+        finally:
+            _PROFILE_RUN_ACTIVE = False
+        return
 
-    global VERBOSE, LOG_FILE, logger, PROFILE, QUIET, DRY_RUN, AUTO_RESTART, PAUSED, DETECT_INACTIVITY, AUTO_PAUSED, RANDOM_PATTERN, CONFIG_RELOAD_REQUESTED, current_config_file, TRAY_ENABLED, tray_icon
+    global VERBOSE, LOG_FILE, logger, PROFILE, QUIET, DRY_RUN, AUTO_RESTART, DETECT_INACTIVITY, RANDOM_PATTERN, current_config_file, TRAY_ENABLED
     VERBOSE = args.verbose
     LOG_FILE = args.log
     QUIET = args.quiet
@@ -1099,7 +2413,16 @@ def main() -> None:
     AUTO_RESTART = args.auto_restart
     DETECT_INACTIVITY = args.detect_inactivity
     RANDOM_PATTERN = args.random_pattern
-    
+
+    if not DRY_RUN:
+        try:
+            load_pyautogui()
+        except ImportError:
+            print("Error: pyautogui module not found!")
+            print("Please install it with: pip install pyautogui")
+            print("Or activate your virtual environment first.")
+            sys.exit(1)
+
     if args.tray:
         if TRAY_AVAILABLE:
             TRAY_ENABLED = True
@@ -1176,8 +2499,6 @@ def main() -> None:
     activity_interval = args.interval or config.get('activity_interval', 120)
     total_duration = args.duration or config.get('total_duration', 18000)
     method = args.method or config.get('method', 'mouse')
-    keyboard_key = config.get('keyboard_key', 'scrolllock')
-    mouse_distance = config.get('mouse_move_distance', 10)
 
     # Update actual config dict with these for potential saving
     config['activity_interval'] = activity_interval
@@ -1204,156 +2525,83 @@ def main() -> None:
         sys.exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)  # e.g. forwarded by the supervise subcommand
+    if hasattr(signal, 'SIGBREAK'):
+        signal.signal(signal.SIGBREAK, signal_handler)  # CTRL_BREAK_EVENT: how supervise stops the keeper on Windows
+
+    # Redirected output (Task Scheduler, services, CI) gets one line per event instead of the live dashboard
+    output_mode = args.output
+    if output_mode == 'auto':
+        output_mode = 'tty' if sys.stdout.isatty() else 'lines'
+
+    session = KeeperSession(
+        config,
+        verbose=VERBOSE,
+        quiet=QUIET,
+        dry_run=DRY_RUN,
+        auto_restart=AUTO_RESTART,
+        detect_inactivity=DETECT_INACTIVITY,
+        random_pattern=RANDOM_PATTERN,
+        console_keys=True,
+        output_mode=output_mode,
+        profile=PROFILE,
+        status_file=args.status_file,
+        metrics_port=args.metrics_port,
+        metrics_file=args.metrics_file,
+        metrics_interval=args.metrics_interval,
+        trace_file=args.trace,
+        trace_buffer=args.trace_buffer,
+        engine=args.engine,
+        checkpoint_file=args.checkpoint,
+        checkpoint_fsync_interval=args.checkpoint_fsync,
+        checkpoint_snapshot_interval=args.checkpoint_snapshot,
+        resume_max_age=args.resume_max_age,
+        idle_trace_file=args.record_idle,
+        idle_trace_interval=args.record_idle_interval,
+        idle_trace_max_bytes=args.record_idle_max_kb * 1024,
+        adaptive_interval=args.adaptive_interval,
+        click_plan=args.click_plan,
+        seed=args.seed,
+    )
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda sig, frame: session.reload())
 
-    program_start_time = time.time()
-    program_total_jiggles = 0
+    control_server = None
+    if args.control is not None:
+        import keeper_control
+        control_server = keeper_control.ControlServer(args.control or None, session.handle_command)
+        try:
+            control_server.start()
+        except (OSError, ValueError) as e:
+            print(f"Error: could not start control server: {e}")
+            sys.exit(1)
+        console_log(f"Control server listening on {control_server.address}")
+        logger.info(f"Control server listening on {control_server.address}")
 
     try:
-        while True:
-            # Allow some settings to affect new sessions (e.g., after --auto-restart)
-            try:
-                activity_interval = int(config.get('activity_interval', activity_interval))
-            except (TypeError, ValueError):
-                pass
-            try:
-                total_duration = int(config.get('total_duration', total_duration))
-            except (TypeError, ValueError):
-                pass
-
-            if config.get('schedule_enabled', False) and not is_within_schedule(config):
-                if not AUTO_RESTART:
-                    print("Outside scheduled hours. Exiting.")
-                    print(f"Schedule: {config.get('work_hours_start')} - {config.get('work_hours_end')}")
-                    print(f"Work days: {config.get('work_days')}")
-                    sys.exit(0)
-
-                next_start = get_next_schedule_start(config)
-                logger.info(
-                    f"Outside work hours, waiting for next schedule (resumes at {next_start.strftime('%H:%M')})"
-                )
-                console_log(
-                    f"Outside work hours, waiting for next schedule (resumes at {next_start.strftime('%H:%M on %A')})"
-                )
-
-                if TRAY_ENABLED:
-                    update_tray_icon('waiting')
-
-                while config.get('schedule_enabled', False) and not is_within_schedule(config):
-                    if CONFIG_RELOAD_REQUESTED:
-                        success, message = reload_config()
-                        if success and _RELOADED_CONFIG is not None:
-                            old_config = dict(config)
-                            config.clear()
-                            config.update(_RELOADED_CONFIG)
-                            try:
-                                activity_interval = int(config.get('activity_interval', activity_interval))
-                            except (TypeError, ValueError):
-                                pass
-                            try:
-                                total_duration = int(config.get('total_duration', total_duration))
-                            except (TypeError, ValueError):
-                                pass
-                            if VERBOSE:
-                                for key in ['schedule_enabled', 'work_hours_start', 'work_hours_end', 'work_days']:
-                                    if old_config.get(key) != config.get(key):
-                                        verbose_log(
-                                            f"Config updated (waiting): {key} = {old_config.get(key)} -> {config.get(key)}"
-                                        )
-                            console_log("Configuration reloaded successfully!")
-                        else:
-                            console_log(f"Config reload failed: {message}")
-                        CONFIG_RELOAD_REQUESTED = False
-
-                    next_start = get_next_schedule_start(config)
-                    if not QUIET:
-                        draw_dashboard(
-                            "WAITING",
-                            activity_interval,
-                            program_total_jiggles,
-                            program_start_time,
-                            method,
-                            [],
-                            show_warning=False,
-                            waiting_until=next_start,
-                        )
-
-                    for _ in range(60):
-                        if msvcrt.kbhit():
-                            key = ord(msvcrt.getch())
-                            if key in EXIT_KEYS:
-                                return
-                            if key in [67, 99]:  # C or c
-                                CONFIG_RELOAD_REQUESTED = True
-                                console_log("Config reload requested...")
-                                verbose_log("Config reload requested via keypress (waiting)")
-                            if key in [80, 112]:  # P or p
-                                PAUSED = True
-                                if TRAY_ENABLED:
-                                    update_tray_icon('paused')
-                                verbose_log("Program PAUSED")
-                            elif key in [82, 114]:  # R or r
-                                PAUSED = False
-                                AUTO_PAUSED = False  # Reset auto-pause on manual resume
-                                if TRAY_ENABLED:
-                                    # If still waiting, should technically be 'waiting', but if user resumes manually maybe they want 'running'? 
-                                    # But we are in the waiting loop. Let's keep it consistent with waiting loop.
-                                    # Actually if paused, icon is yellow. If resumed but waiting, icon should be blue.
-                                    update_tray_icon('waiting')
-                                verbose_log("Program RESUMED")
-
-                        if CONFIG_RELOAD_REQUESTED:
-                            success, message = reload_config()
-                            if success and _RELOADED_CONFIG is not None:
-                                old_config = dict(config)
-                                config.clear()
-                                config.update(_RELOADED_CONFIG)
-                                try:
-                                    activity_interval = int(config.get('activity_interval', activity_interval))
-                                except (TypeError, ValueError):
-                                    pass
-                                try:
-                                    total_duration = int(config.get('total_duration', total_duration))
-                                except (TypeError, ValueError):
-                                    pass
-                                if VERBOSE:
-                                    for key in ['schedule_enabled', 'work_hours_start', 'work_hours_end', 'work_days']:
-                                        if old_config.get(key) != config.get(key):
-                                            verbose_log(
-                                                f"Config updated (waiting): {key} = {old_config.get(key)} -> {config.get(key)}"
-                                            )
-                                console_log("Configuration reloaded successfully!")
-                            else:
-                                console_log(f"Config reload failed: {message}")
-                            CONFIG_RELOAD_REQUESTED = False
-
-                        if is_within_schedule(config):
-                            break
-                        time.sleep(1)
-
-                logger.info("Schedule started, resuming activity")
-                console_log("Schedule started, resuming activity")
-                if TRAY_ENABLED:
-                    update_tray_icon('running')
-                continue
-
-            should_wait_for_schedule, session_jiggles = keep_active(
-                activity_interval,
-                total_duration,
-                method,
-                keyboard_key,
-                mouse_distance,
-                config,
-            )
-            program_total_jiggles += session_jiggles
-
-            if should_wait_for_schedule and AUTO_RESTART:
-                continue
+        try:
+            session.run()
+        except Exception as e:
+            if isinstance(e, ValueError) and session.start_time is None:  # Rejected before starting
+                print(e)
+                print("Please check your configuration file and try again.")
+                sys.exit(1)
+            logger.error(f"Keeper crashed: {e!r}")
+            print(f"\nError: An unexpected error occurred")
+            print(f"Details: {e}")
+            print(f"Check {LOG_FILE} for more information.")
+            sys.exit(1)
 
-            break
+        if session.exit_reason == "outside_schedule":
+            print("Outside scheduled hours. Exiting.")
+            print(f"Schedule: {config.get('work_hours_start')} - {config.get('work_hours_end')}")
+            print(f"Work days: {config.get('work_days')}")
     finally:
+        if control_server is not None:
+            control_server.close()
         if TRAY_ENABLED and tray_icon:
             tray_icon.stop()
-        display_exit_stats(program_start_time, program_total_jiggles)
+        display_exit_stats(session.start_time or time.time(), TOTAL_JIGGLES, session.history)
         print("\nActivity keeper finished.")
 
 
@@ -0,0 +1,331 @@
+"""`aggregate` subcommand: poll many keepers and merge their status.
+
+Each endpoint is a keeper control address: a Unix socket path, a named
+pipe, or "tcp:HOST:PORT" for keepers started with `--control tcp:...`.
+Endpoints come from the command line or from a file with one endpoint per
+line, optionally preceded by a name:
+
+    # name      address
+    kiosk-01    tcp:10.0.4.21:8765
+    kiosk-02    tcp:10.0.4.22:8765
+    /tmp/activity_keeper-1000.sock
+
+All endpoints are queried with `{"cmd": "stats"}` from one asyncio loop.
+At most `--concurrency` requests are in flight and every request has its own
+`--timeout`, so a slow or dead host costs one timeout and does not delay the
+others. With `--watch`, polling repeats every interval and only the rows that
+changed are redrawn (or printed, with --json).
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import keeper_control
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 2.0
+READ_LIMIT = 1 << 20  # Longest reply line accepted from a keeper
+
+# Row fields compared to decide whether a keeper changed between polls
+CHANGE_FIELDS = ("ok", "state", "schedule_state", "total_jiggles", "last_heartbeat_at", "error")
+
+
+class Endpoint(NamedTuple):
+    name: str
+    address: str
+
+
+def parse_endpoint(text: str) -> Endpoint:
+    """Parse "ADDRESS" or "NAME ADDRESS" into an Endpoint."""
+    parts = text.split(None, 1)
+    if len(parts) == 2:
+        return Endpoint(parts[0], parts[1].strip())
+    return Endpoint(text.strip(), text.strip())
+
+
+def load_endpoints(path: str) -> List[Endpoint]:
+    """Read endpoints from a file; blank lines and lines starting with '#' are ignored."""
+    endpoints = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                endpoints.append(parse_endpoint(line))
+    return endpoints
+
+
+def _in_daemon_thread(func: Callable, *args) -> "asyncio.Future":
+    """Run func(*args) on a daemon thread and return a future for its result.
+
+    Unlike run_in_executor, a call that never returns does not hold up
+    asyncio.run() on exit: nothing waits for the thread.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result, error) -> None:
+        if future.done():  # Cancelled by a timeout
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run() -> None:
+        result, error = None, None
+        try:
+            result = func(*args)
+        except Exception as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(settle, result, error)
+        except RuntimeError:
+            pass  # Loop already closed
+
+    threading.Thread(target=run, name="keeper-aggregate-pipe", daemon=True).start()
+    return future
+
+
+async def query_stats(address: str, timeout: float) -> dict:
+    """Send {"cmd": "stats"} to one keeper and return its reply."""
+    if address.startswith(keeper_control.PIPE_PREFIX):
+        # asyncio has no client for named pipes; a worker thread waits instead. Opening a busy
+        # pipe can block past the client timeout, so the wait is bounded here as well
+        reply = _in_daemon_thread(keeper_control.send_command, "stats", address, timeout)
+        return await asyncio.wait_for(reply, timeout)
+
+    async def exchange() -> dict:
+        tcp = keeper_control.parse_tcp_address(address)
+        if tcp is not None:
+            reader, writer = await asyncio.open_connection(*tcp, limit=READ_LIMIT)
+        else:
+            reader, writer = await asyncio.open_unix_connection(address, limit=READ_LIMIT)
+        try:
+            writer.write(json.dumps({"cmd": "stats"}).encode('utf-8') + b"\n")
+            await writer.drain()
+            line = await reader.readline()
+        finally:
+            writer.close()
+        if not line:
+            raise ConnectionError("keeper closed the connection without replying")
+        return json.loads(line)
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+def make_row(endpoint: Endpoint, reply: Optional[dict], error: Optional[str], latency: float) -> dict:
+    """Flatten one poll result into a table row."""
+    row = {
+        "name": endpoint.name,
+        "address": endpoint.address,
+        "ok": False,
+        "state": "unreachable",
+        "schedule_state": None,
+        "total_jiggles": None,
+        "last_heartbeat_at": None,
+        "next_heartbeat_at": None,
+        "uptime_seconds": None,
+        "version": None,
+        "latency_ms": round(latency * 1000, 1),
+        "polled_at": time.time(),
+        "error": error,
+    }
+    if reply is not None:
+        if not reply.get("ok"):
+            row["state"] = "error"
+            row["error"] = reply.get("error", "keeper refused the request")
+        else:
+            stats = reply.get("result") or {}
+            row["ok"] = True
+            for key in ("state", "schedule_state", "total_jiggles", "last_heartbeat_at",
+                        "next_heartbeat_at", "uptime_seconds", "version"):
+                row[key] = stats.get(key, row[key])
+    return row
+
+
+class Aggregator:
+    """Poll a fixed set of endpoints with bounded concurrency and keep the latest row for each."""
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        query: Callable[[str, float], Awaitable[dict]] = query_stats,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.endpoints = endpoints
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.query = query
+        self.clock = clock
+        self.rows: Dict[str, dict] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def poll_one(self, endpoint: Endpoint) -> dict:
+        async with self._semaphore:
+            started = self.clock()
+            reply, error = None, None
+            try:
+                reply = await self.query(endpoint.address, self.timeout)
+            except asyncio.TimeoutError:
+                error = f"no reply within {self.timeout:g}s"
+            except (OSError, ValueError) as e:
+                error = f"{type(e).__name__}: {e}"
+            return make_row(endpoint, reply, error, self.clock() - started)
+
+    async def poll(self, on_row: Optional[Callable[[dict, bool], None]] = None) -> List[dict]:
+        """Poll every endpoint once; on_row(row, changed) runs as each reply arrives."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        for task in asyncio.as_completed([self.poll_one(endpoint) for endpoint in self.endpoints]):
+            row = await task
+            previous = self.rows.get(row["name"])
+            changed = previous is None or any(previous[key] != row[key] for key in CHANGE_FIELDS)
+            self.rows[row["name"]] = row
+            if on_row is not None:
+                on_row(row, changed)
+        return self.ordered_rows()
+
+    def ordered_rows(self) -> List[dict]:
+        return [self.rows[endpoint.name] for endpoint in self.endpoints if endpoint.name in self.rows]
+
+    async def watch(
+        self,
+        interval: float,
+        on_row: Callable[[dict, bool], None],
+        on_round: Optional[Callable[[List[dict]], None]] = None,
+        rounds: Optional[int] = None,
+    ) -> None:
+        """Poll every `interval` seconds (on absolute deadlines) until cancelled or `rounds` are done."""
+        deadline = self.clock()
+        done = 0
+        while rounds is None or done < rounds:
+            rows = await self.poll(on_row)
+            if on_round is not None:
+                on_round(rows)
+            done += 1
+            deadline += interval
+            delay = deadline - self.clock()
+            if delay > 0 and (rounds is None or done < rounds):
+                await asyncio.sleep(delay)
+            elif delay <= 0:
+                deadline = self.clock()  # Polling took longer than the interval; do not try to catch up
+
+
+def _age(timestamp: Optional[float], now: float) -> str:
+    if not timestamp:
+        return "-"
+    seconds = max(0, int(now - timestamp))
+    if seconds < 120:
+        return f"{seconds}s ago"
+    if seconds < 7200:
+        return f"{seconds // 60}m ago"
+    return f"{seconds // 3600}h ago"
+
+
+def _duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def summary_line(rows: List[dict]) -> str:
+    """One-line count of keepers per state, e.g. "3 keepers: 2 running, 1 unreachable"."""
+    counts: Dict[str, int] = {}
+    for row in rows:
+        counts[row["state"]] = counts.get(row["state"], 0) + 1
+    parts = ", ".join(f"{count} {state}" for state, count in sorted(counts.items()))
+    return f"{len(rows)} keepers: {parts}" if rows else "0 keepers"
+
+
+def format_table(rows: List[dict], now: Optional[float] = None) -> str:
+    """Render rows as an aligned text table followed by the summary line."""
+    now = time.time() if now is None else now
+    header = ("KEEPER", "STATE", "SCHEDULE", "JIGGLES", "LAST HEARTBEAT", "UPTIME", "RTT MS", "ERROR")
+    lines = [header]
+    for row in rows:
+        lines.append((
+            row["name"],
+            row["state"],
+            row["schedule_state"] or "-",
+            "-" if row["total_jiggles"] is None else str(row["total_jiggles"]),
+            _age(row["last_heartbeat_at"], now),
+            _duration(row["uptime_seconds"]),
+            f"{row['latency_ms']:.1f}",
+            row["error"] or "",
+        ))
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    text = ["  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in lines]
+    text.append(summary_line(rows))
+    return "\n".join(text)
+
+
+def main(argv: Optional[list] = None) -> int:
+    """`aggregate` subcommand: print the merged status of many keepers."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="activity_keeper.py aggregate", description="Poll many keepers and merge their status")
+    parser.add_argument('endpoints', nargs='*', metavar='ADDRESS', help='Control addresses (socket path, named pipe or tcp:HOST:PORT)')
+    parser.add_argument('--hosts', type=str, metavar='FILE', help='File with one "[NAME] ADDRESS" endpoint per line')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help=f'Requests in flight at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help=f'Seconds to wait for each keeper (default: {DEFAULT_TIMEOUT:g})')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table (one line per changed keeper with --watch)')
+    parser.add_argument('--watch', nargs='?', const=10.0, type=float, metavar='SECONDS', help='Poll again every SECONDS (default: 10) and show only what changed')
+    parser.add_argument('--rounds', type=int, metavar='N', help='Stop --watch after N polls')
+    args = parser.parse_args(argv)
+
+    endpoints = [parse_endpoint(text) for text in args.endpoints]
+    if args.hosts:
+        try:
+            endpoints.extend(load_endpoints(args.hosts))
+        except OSError as e:
+            print(f"Error: could not read {args.hosts}: {e}", file=sys.stderr)
+            return 1
+    if not endpoints:
+        parser.error("no endpoints given (pass addresses or --hosts FILE)")
+    names = [endpoint.name for endpoint in endpoints]
+    if len(set(names)) != len(names):
+        parser.error("endpoint names must be unique")
+
+    aggregator = Aggregator(endpoints, args.concurrency, args.timeout)
+
+    if args.watch is None:
+        rows = asyncio.run(aggregator.poll())
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            print(format_table(rows))
+        return 0 if all(row["ok"] for row in rows) else 1
+
+    tty = sys.stdout.isatty() and not args.json
+    changes = []
+
+    def on_row(row: dict, changed: bool) -> None:
+        if not changed:
+            return
+        if args.json:
+            print(json.dumps(row), flush=True)
+        else:
+            changes.append(row)
+
+    def on_round(rows: List[dict]) -> None:
+        if args.json or not changes:
+            return
+        if tty:
+            sys.stdout.write("\033[H\033[J" + format_table(rows) + "\n")  # Redraw in place
+        else:
+            print(format_table(changes))
+        sys.stdout.flush()
+        changes.clear()
+
+    try:
+        asyncio.run(aggregator.watch(args.watch, on_row, on_round, args.rounds))
+    except KeyboardInterrupt:
+        pass
+    return 0
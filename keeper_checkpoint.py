@@ -0,0 +1,186 @@
+"""Crash-safe session checkpoints: an append-only journal plus compacted snapshots.
+
+The keeper hands state changes to CheckpointWriter.update(), which only
+diffs a dict and puts the delta on a queue. A background thread appends
+deltas to `<path>.journal`, fsyncs at most every `fsync_interval`
+seconds, and every `snapshot_interval` seconds writes the whole state to
+`<path>.snapshot.json` through a temp file and atomic rename before it
+truncates the journal. No file I/O happens on the heartbeat path.
+
+load_checkpoint() rebuilds the last state from the snapshot and the
+journal records written after it. A torn last journal line is ignored.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+SNAPSHOT_SUFFIX = ".snapshot.json"
+JOURNAL_SUFFIX = ".journal"
+FORMAT_VERSION = 1
+
+_CLOSE = object()
+_MISSING = object()
+
+
+def _fsync_dir(path: str) -> None:
+    """Persist a rename on POSIX; Windows has no directory handles."""
+    if os.name == 'nt':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class CheckpointWriter:
+    """Journal state deltas from a background thread."""
+
+    def __init__(self, path: str, fsync_interval: float = 5.0, snapshot_interval: float = 300.0, initial_seq: int = 0) -> None:
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+        self._state: dict = {}  # Caller-side copy used for diffing
+        self._seq = initial_seq
+        self._queue_start_seq = initial_seq
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()  # update() runs on the keeper, control and tray threads; keeps seq order
+        self._thread: Optional[threading.Thread] = None
+        self.snapshots_written = 0
+        self.fsyncs = 0
+        self.error: Optional[str] = None  # Set when the writer thread stopped on an I/O error
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="keeper-checkpoint", daemon=True)
+        self._thread.start()
+
+    def update(self, fields: dict) -> None:
+        """Queue the fields that changed since the last call. Never blocks on I/O."""
+        with self._lock:
+            if self.error is not None:
+                return  # Nothing consumes the queue any more
+            delta = {key: value for key, value in fields.items() if self._state.get(key, _MISSING) != value}
+            if not delta:
+                return
+            self._state.update(delta)
+            self._seq += 1
+            self._queue.put((self._seq, time.time(), delta))
+
+    def close(self, clean_exit: bool = True) -> None:
+        """Flush everything, write a final snapshot and stop the thread."""
+        if self._thread is None:
+            return
+        self._queue.put((_CLOSE, clean_exit))
+        self._thread.join(timeout=10.0)
+        self._thread = None
+
+    def _run(self) -> None:
+        applied: dict = {}
+        applied_seq = self._queue_start_seq
+        journal = None
+        dirty = False
+        last_fsync = time.monotonic()
+        last_snapshot = time.monotonic()
+        try:
+            journal = open(self.path + JOURNAL_SUFFIX, 'a', encoding='utf-8')
+            while True:
+                now = time.monotonic()
+                deadlines = [last_snapshot + self.snapshot_interval]
+                if dirty:
+                    deadlines.append(last_fsync + self.fsync_interval)
+                try:
+                    item = self._queue.get(timeout=max(0.0, min(deadlines) - now))
+                except queue.Empty:
+                    item = None
+
+                if item is not None and item[0] is _CLOSE:
+                    applied["clean_exit"] = item[1]
+                    journal.close()
+                    self._write_snapshot(applied, applied_seq)
+                    return
+
+                if item is not None:
+                    seq, wall, delta = item
+                    journal.write(json.dumps({"seq": seq, "t": wall, "d": delta}) + "\n")
+                    applied.update(delta)
+                    applied_seq = seq
+                    dirty = True
+
+                now = time.monotonic()
+                if dirty and now - last_fsync >= self.fsync_interval:
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                    self.fsyncs += 1
+                    dirty = False
+                    last_fsync = now
+                if now - last_snapshot >= self.snapshot_interval:
+                    journal.close()
+                    self._write_snapshot(applied, applied_seq)
+                    journal = open(self.path + JOURNAL_SUFFIX, 'a', encoding='utf-8')
+                    dirty = False
+                    last_snapshot = now
+        except OSError as e:  # Checkpointing is best effort; never take the keeper down
+            self.error = str(e)
+            while True:  # Release what was queued; update() stops queueing now that error is set
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+        finally:
+            if journal is not None and not journal.closed:
+                journal.close()
+
+    def _write_snapshot(self, state: dict, seq: int) -> None:
+        snapshot_path = self.path + SNAPSHOT_SUFFIX
+        tmp_path = snapshot_path + ".tmp"
+        document = {"version": FORMAT_VERSION, "seq": seq, "saved_at": time.time(), "pid": os.getpid(), "state": state}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+        _fsync_dir(snapshot_path)
+        # The snapshot now covers everything in the journal
+        with open(self.path + JOURNAL_SUFFIX, 'w', encoding='utf-8'):
+            pass
+        self.snapshots_written += 1
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    """Return {"state", "seq", "saved_at"} from the snapshot and journal, or None."""
+    state: dict = {}
+    seq = 0
+    saved_at = None
+
+    try:
+        with open(path + SNAPSHOT_SUFFIX, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") == FORMAT_VERSION:
+            state = dict(snapshot["state"])
+            seq = snapshot["seq"]
+            saved_at = snapshot["saved_at"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    try:
+        with open(path + JOURNAL_SUFFIX, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Torn write from a crash; everything after it is unreliable
+                if record["seq"] <= seq:
+                    continue
+                state.update(record["d"])
+                state.pop("clean_exit", None)
+                seq = record["seq"]
+                saved_at = record["t"]
+    except OSError:
+        pass
+
+    if saved_at is None:
+        return None
+    return {"state": state, "seq": seq, "saved_at": saved_at}
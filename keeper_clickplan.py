@@ -0,0 +1,124 @@
+"""mouse_automation click plans run as a second job inside the keeper.
+
+The job compiles a mouse_automation config (its "plan", or the classic
+two-click loop) into a timeline and runs it on a thread next to the
+heartbeat loop. It shares the keeper's input lock, so a click never lands
+in the middle of a jiggle. Clicks only fire while the keeper is running:
+when it is paused, auto-paused, stopped or waiting for the schedule,
+clicks that come due are skipped, and the timeline keeps its deadlines.
+"""
+import json
+import os
+import sys
+import threading
+from typing import Callable, Optional, Union
+
+
+class _Stopped(Exception):
+    pass
+
+
+def load_plan_config(source: Union[str, dict]) -> dict:
+    """Return a mouse_automation config from a JSON file path or an inline dict."""
+    if isinstance(source, dict):
+        config = dict(source)
+    else:
+        if not os.path.exists(source):
+            raise ValueError(f"Click plan file not found: {source}")
+        with open(source, 'r') as f:
+            config = json.load(f)
+    config.setdefault("total_moves", 0)
+    return config
+
+
+def compile_plan_config(config: dict):
+    """Compile a plan config into a mouse_automation Timeline; raises ValueError."""
+    import mouse_automation
+    try:
+        return mouse_automation.compile_plan(config.get('plan') or mouse_automation.default_plan(config), config)
+    except KeyError as e:
+        raise ValueError(f"Click plan needs a 'plan' or the key {e}")
+
+
+class ClickPlanJob:
+    """Run one compiled click plan on a daemon thread until it finishes or stop() is called.
+
+    is_active() decides whether a due click fires. on_click(record) receives
+    every mouse_automation click record, with "skipped" set for gated ones.
+    total_moves of 0 repeats the plan until the keeper stops.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        timeline,
+        backend,
+        *,
+        is_active: Callable[[], bool],
+        lock,
+        on_click: Callable[[dict], None],
+        rng=None,
+    ) -> None:
+        import mouse_automation
+        self.config = config
+        self.timeline = timeline
+        self.passes = config.get('total_moves') or sys.maxsize
+        self.clicks = 0
+        self.skipped = 0
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        def record_click(record, step, lateness):
+            if record.get("skipped") or record["pos"] is None:
+                self.skipped += 1
+            else:
+                self.clicks += 1
+            on_click(record)
+
+        self.runner = mouse_automation.PlanRunner(
+            self.timeline,
+            backend,
+            rng,
+            config.get('duration_variation', 0.5),
+            sleep=self._sleep,
+            on_click=record_click,
+            lock=lock,
+            gate=lambda step: is_active(),
+        )
+
+    def _sleep(self, seconds: float) -> None:
+        if self._stop.wait(seconds):
+            raise _Stopped()
+
+    def _run(self) -> None:
+        try:
+            self.runner.run(self.passes)
+        except _Stopped:
+            pass
+        except Exception as e:  # pyautogui failsafe, missing image support, ...
+            self.error = f"{type(e).__name__}: {e}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="keeper-click-plan", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+    def stats(self) -> dict:
+        lateness = {
+            label: {"runs": count, "mean_ms": round(total / count * 1000, 1), "max_ms": round(worst * 1000, 1)}
+            for label, (count, total, worst) in self.runner.report.steps.items()
+        }
+        return {
+            "steps": len(self.timeline),
+            "period_seconds": round(self.timeline.period, 3),
+            "passes_completed": self.runner.completed,
+            "clicks": self.clicks,
+            "skipped": self.skipped,
+            "lateness": lateness,
+            "error": self.error,
+        }
@@ -0,0 +1,307 @@
+"""Declarative config schema, compiled once into a validator.
+
+SCHEMA lists every key the keeper reads with its accepted JSON types and
+value check. compile_schema() turns it into one closure per key, plus the
+cross-key RULES, so a validation pass is a flat loop with no lookups or
+branching on the schema. Validation collects every error with its key
+path ("work_days[2]", "schedule_windows[0]: ...") instead of stopping at
+the first one.
+
+Preset files are partial configs merged over a full one, so they are
+validated with partial=True: missing required keys are not errors there.
+
+The `validate` subcommand checks a whole tree of `*_config.json` and
+`*_preset.json` files on a thread pool and writes a JSON report.
+"""
+import fnmatch
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from keeper_schedule import Schedule, ScheduleError
+
+NUMBER = (int, float)
+CONFIG_PATTERNS = ("*_config.json", "*_preset.json")
+
+
+class ConfigError(NamedTuple):
+    path: str  # Key path such as "work_days[2]"; empty for errors that carry their own
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path} {self.message}" if self.path else self.message
+
+
+class Field(NamedTuple):
+    types: tuple
+    check: Optional[Callable[[Any], bool]] = None
+    message: str = ""
+    required: bool = False
+    when: Optional[Callable[[dict], bool]] = None  # Only validated when this holds for the whole config
+    items: Optional["Field"] = None  # Spec for each element of a list
+
+
+def _hh_mm(value: str) -> bool:
+    try:
+        datetime.strptime(value, '%H:%M')
+    except ValueError:
+        return False
+    return True
+
+
+def _schedule_on(config: dict) -> bool:
+    return config.get('schedule_enabled', False) is True
+
+
+def _work_hours_used(config: dict) -> bool:
+    return _schedule_on(config) and 'schedule_windows' not in config
+
+
+def _positive(value) -> bool:
+    return value > 0
+
+
+BOOL = Field((bool,), message="must be true or false")
+
+SCHEMA: Dict[str, Field] = {
+    'activity_interval': Field(NUMBER, _positive, "must be positive (e.g., 120)", required=True),
+    'total_duration': Field(NUMBER, _positive, "must be positive (e.g., 18000)", required=True),
+    'mouse_move_distance': Field(NUMBER, _positive, "must be positive (e.g., 10)", required=True),
+    'method': Field((str,), lambda v: v in ('keyboard', 'mouse'), "must be 'keyboard' or 'mouse'"),
+    'keyboard_key': Field((str,), lambda v: v.strip() != "", "must be a key name (e.g., 'scrolllock')"),
+    'schedule_enabled': BOOL,
+    'work_hours_start': Field((str,), _hh_mm, "must be in HH:MM format (e.g., '09:00')", when=_work_hours_used),
+    'work_hours_end': Field((str,), _hh_mm, "must be in HH:MM format (e.g., '17:00')", when=_work_hours_used),
+    'work_days': Field(
+        (list,), lambda v: len(v) > 0, "must be list of numbers 1-7 (1=Monday, 7=Sunday)", when=_work_hours_used,
+        items=Field((int,), lambda v: 1 <= v <= 7, "must be a number 1-7 (1=Monday, 7=Sunday)"),
+    ),
+    'schedule_windows': Field((list,), message="must be a list of windows", when=_schedule_on),
+    'schedule_exceptions': Field((list,), message="must be a list of exceptions", when=_schedule_on),
+    'holiday_calendars': Field((list,), message="must be a list of .ics paths", when=_schedule_on, items=Field((str,), message="must be a file path")),
+    'schedule_timezone': Field((str, type(None)), message="must be a timezone name (e.g., 'Europe/Berlin')", when=_schedule_on),
+    'schedule_warning_minutes': Field(NUMBER, lambda v: v >= 0, "must be >= 0 (e.g., 5)", when=_schedule_on),
+    'schedule_warning_sound': BOOL,
+    'sound_enabled': BOOL,
+    'sound_on_heartbeat': BOOL,
+    'sound_frequency': Field((int,), lambda v: 37 <= v <= 32767, "must be a frequency in Hz from 37 to 32767"),
+    'sound_duration': Field((int,), _positive, "must be positive milliseconds (e.g., 200)"),
+    'inactivity_detection_enabled': BOOL,
+    'inactivity_threshold_seconds': Field(NUMBER, _positive, "must be positive"),
+    'inactivity_check_interval': Field(NUMBER, _positive, "must be positive"),
+    'presence_timeout_seconds': Field(NUMBER, _positive, "must be positive (e.g., 300)"),
+    'adaptive_interval_margin_seconds': Field(NUMBER, lambda v: v >= 0, "must be >= 0 and below presence_timeout_seconds"),
+    'adaptive_interval_enabled': BOOL,
+    'pattern_randomization_enabled': BOOL,
+    'randomization_mouse_probability': Field(
+        NUMBER, lambda v: 0.0 <= v <= 1.0, "must be between 0.0 and 1.0",
+        when=lambda config: config.get('pattern_randomization_enabled', False) is True,
+    ),
+    'click_plan': Field((str, dict), message="must be a mouse_automation config path or object"),
+}
+
+
+def _margin_rule(config: dict, errors: List[ConfigError], base_dir: Optional[str]) -> None:
+    presence = config.get('presence_timeout_seconds', 300)
+    margin = config.get('adaptive_interval_margin_seconds', 60)
+    if _is_number(presence) and _is_number(margin) and 0 <= margin and presence > 0 and margin >= presence:
+        errors.append(ConfigError('adaptive_interval_margin_seconds', SCHEMA['adaptive_interval_margin_seconds'].message))
+
+
+def _schedule_rule(config: dict, errors: List[ConfigError], base_dir: Optional[str]) -> None:
+    """Parse the whole schedule (windows, exceptions, calendars) when the per-key checks passed."""
+    if not _schedule_on(config):
+        return
+    schedule_keys = ('work_hours_start', 'work_hours_end', 'work_days', 'schedule_windows',
+                     'schedule_exceptions', 'holiday_calendars', 'schedule_timezone')
+    if any(error.path.split('[')[0] in schedule_keys for error in errors):
+        return  # Already reported; parsing would only repeat it
+    if base_dir is not None and config.get('holiday_calendars'):
+        config = dict(config, holiday_calendars=[os.path.join(base_dir, path) for path in config['holiday_calendars']])
+    try:
+        Schedule.from_config(config)
+    except ScheduleError as e:
+        errors.extend(ConfigError("", error) for error in e.errors)
+    except (TypeError, ValueError, AttributeError, KeyError) as e:
+        errors.append(ConfigError("", f"schedule could not be parsed: {e}"))
+
+
+RULES = [_margin_rule, _schedule_rule]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, NUMBER) and not isinstance(value, bool)
+
+
+def _compile_value(spec: Field) -> Callable[[Any, str, List[ConfigError]], None]:
+    """Build the checker for one value: type, value check, then list items."""
+    types, check, message = spec.types, spec.check, spec.message
+    rejects_bool = bool not in types  # JSON true/false are Python ints
+    item_check = _compile_value(spec.items) if spec.items is not None else None
+
+    def check_value(value, path: str, errors: List[ConfigError]) -> None:
+        if not isinstance(value, types) or (rejects_bool and isinstance(value, bool)):
+            errors.append(ConfigError(path, message))
+            return
+        if check is not None and not check(value):
+            errors.append(ConfigError(path, message))
+            return
+        if item_check is not None:
+            for i, item in enumerate(value):
+                item_check(item, f"{path}[{i}]", errors)
+
+    return check_value
+
+
+def _compile_field(key: str, spec: Field) -> Callable[[dict, List[ConfigError], bool], None]:
+    check_value = _compile_value(spec)
+    required, when, message = spec.required, spec.when, spec.message
+
+    def check_field(config: dict, errors: List[ConfigError], partial: bool) -> None:
+        if key not in config:
+            if required and not partial:
+                errors.append(ConfigError(key, message))
+            return
+        if when is None or when(config):
+            check_value(config[key], key, errors)
+
+    return check_field
+
+
+class ConfigValidator:
+    """Validator compiled from a schema and cross-key rules."""
+
+    def __init__(self, schema: Dict[str, Field], rules: list) -> None:
+        self.checks = [_compile_field(key, spec) for key, spec in schema.items()]
+        self.rules = list(rules)
+        self.known_keys = frozenset(schema)
+
+    def validate(self, config: dict, partial: bool = False, base_dir: Optional[str] = None) -> List[ConfigError]:
+        """Return every error in config (empty when valid).
+
+        partial skips missing required keys (presets). base_dir resolves
+        relative holiday calendar paths; by default they are relative to the
+        working directory, as in the keeper.
+        """
+        errors: List[ConfigError] = []
+        for check in self.checks:
+            check(config, errors, partial)
+        for rule in self.rules:
+            rule(config, errors, base_dir)
+        return errors
+
+    def unknown_keys(self, config: dict) -> List[str]:
+        """Keys the keeper does not read (usually typos)."""
+        return sorted(key for key in config if key not in self.known_keys)
+
+
+_VALIDATOR: Optional[ConfigValidator] = None
+
+
+def compile_schema() -> ConfigValidator:
+    """Return the validator for SCHEMA and RULES, compiled on first use."""
+    global _VALIDATOR
+    if _VALIDATOR is None:
+        _VALIDATOR = ConfigValidator(SCHEMA, RULES)
+    return _VALIDATOR
+
+
+def validate(config: dict, partial: bool = False, base_dir: Optional[str] = None) -> List[ConfigError]:
+    """Validate config against the compiled schema; returns all errors."""
+    return compile_schema().validate(config, partial, base_dir)
+
+
+# --- validate subcommand --------------------------------------------------
+
+def find_config_files(paths: List[str]) -> List[str]:
+    """Expand directories to the config and preset files below them; files are kept as given."""
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in CONFIG_PATTERNS):
+                    found.append(os.path.join(root, name))
+    return found
+
+
+def validate_file(path: str) -> dict:
+    """Validate one config or preset file; returns its report entry."""
+    kind = "preset" if path.endswith("_preset.json") else "config"
+    result = {"file": path, "kind": kind, "valid": False, "errors": [], "unknown_keys": []}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, UnicodeDecodeError) as e:
+        result["errors"].append({"path": "", "message": f"could not read file: {e}"})
+        return result
+    except json.JSONDecodeError as e:
+        result["errors"].append({"path": "", "message": f"invalid JSON: {e}"})
+        return result
+    if not isinstance(config, dict):
+        result["errors"].append({"path": "", "message": "must be a JSON object"})
+        return result
+
+    validator = compile_schema()
+    errors = validator.validate(config, partial=kind == "preset", base_dir=os.path.dirname(path))
+    result["errors"] = [error._asdict() for error in errors]
+    result["unknown_keys"] = validator.unknown_keys(config)
+    result["valid"] = not errors
+    return result
+
+
+def validate_files(paths: List[str], jobs: Optional[int] = None) -> List[dict]:
+    """Validate files on a thread pool (file reads overlap); results keep the input order."""
+    compile_schema()  # Compile once before the workers start
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(validate_file, paths))
+
+
+def build_report(results: List[dict], seconds: float) -> dict:
+    invalid = sum(1 for result in results if not result["valid"])
+    return {
+        "files": len(results),
+        "valid": len(results) - invalid,
+        "invalid": invalid,
+        "seconds": round(seconds, 3),
+        "results": results,
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    """`validate` subcommand: check config and preset files, optionally whole directory trees."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="activity_keeper.py validate", description="Validate keeper config and preset files")
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='Config files, or directories searched for *_config.json and *_preset.json')
+    parser.add_argument('--jobs', type=int, metavar='N', help='Files validated in parallel (default: CPU count + 4, at most 32)')
+    parser.add_argument('--report', type=str, metavar='FILE', help='Write the JSON report to FILE')
+    parser.add_argument('--json', action='store_true', help='Print the JSON report instead of a summary')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    files = find_config_files(args.paths)
+    report = build_report(validate_files(files, args.jobs), time.perf_counter() - started)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for result in report["results"]:
+            if result["valid"] and not result["unknown_keys"]:
+                continue
+            print(f"{'OK     ' if result['valid'] else 'INVALID'} {result['file']}")
+            for error in result["errors"]:
+                print(f"    {ConfigError(**error)}")
+            for key in result["unknown_keys"]:
+                print(f"    warning: unknown key '{key}'")
+        print(f"{report['files']} files: {report['valid']} valid, {report['invalid']} invalid ({report['seconds']:.2f}s)")
+    return 1 if report["invalid"] else 0
@@ -0,0 +1,368 @@
+"""Local control channel for a running activity keeper.
+
+Requests are newline-delimited JSON objects such as {"cmd": "pause"} and
+each one gets exactly one JSON line back:
+
+    {"ok": true, "cmd": "pause", "result": {...}}
+    {"ok": false, "error": "Unknown command: foo"}
+
+The server listens on a Unix domain socket on POSIX and on a named pipe on
+Windows. Every connection is served by a thread blocked in accept/read, so
+an idle server costs nothing and a command reaches the keeper immediately.
+
+The pipe rejects remote clients (PIPE_REJECT_REMOTE_CLIENTS), and its first
+instance is created with FILE_FLAG_FIRST_PIPE_INSTANCE, so start() fails
+instead of sharing the name when another process already owns it.
+
+A "tcp:HOST:PORT" address listens on TCP instead, for fleet monitoring
+(see the "aggregate" subcommand). Over TCP only the read-only commands in
+REMOTE_COMMANDS are accepted; pause, stop and the rest stay local.
+"""
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+COMMANDS = ("pause", "resume", "reload", "stats", "stop", "trace")
+REMOTE_COMMANDS = ("stats",)
+PIPE_PREFIX = "\\\\.\\pipe\\"
+TCP_PREFIX = "tcp:"
+MAX_LINE_BYTES = 64 * 1024
+
+# Win32 values _winapi does not export
+PIPE_REJECT_REMOTE_CLIENTS = 0x00000008
+FILE_FLAG_FIRST_PIPE_INSTANCE = 0x00080000
+ERROR_ACCESS_DENIED = 5
+ERROR_PIPE_BUSY = 231
+
+
+def default_address() -> str:
+    """Return the per-user default control address for this platform."""
+    if os.name == 'nt':
+        return PIPE_PREFIX + "activity_keeper"
+    return os.path.join(tempfile.gettempdir(), f"activity_keeper-{os.getuid()}.sock")
+
+
+def parse_tcp_address(address: str) -> Optional[tuple]:
+    """Return (host, port) for a "tcp:HOST:PORT" address, None for socket paths and pipes."""
+    if not address.startswith(TCP_PREFIX):
+        return None
+    host, _, port = address[len(TCP_PREFIX):].rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid TCP control address (expected tcp:HOST:PORT): {address}")
+    return host.strip("[]"), int(port)
+
+
+def handle_request(line: bytes, handler: Callable[[str, dict], object]) -> bytes:
+    """Decode one request line, run it through handler and encode the reply."""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+    except ValueError as e:
+        return _encode({"ok": False, "error": f"Invalid request: {e}"})
+
+    cmd = request.get("cmd")
+    if cmd not in COMMANDS:
+        return _encode({"ok": False, "error": f"Unknown command: {cmd}"})
+
+    try:
+        result = handler(cmd, request)
+    except Exception as e:
+        return _encode({"ok": False, "cmd": cmd, "error": str(e)})
+    return _encode({"ok": True, "cmd": cmd, "result": result})
+
+
+def _encode(message: dict) -> bytes:
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+
+def _serve_stream(recv: Callable[[], bytes], send: Callable[[bytes], None], handler: Callable[[str, dict], object]) -> None:
+    """Answer request lines from one client until it disconnects."""
+    buffer = b""
+    while True:
+        chunk = recv()
+        if not chunk:
+            return
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            if line.strip():
+                send(handle_request(line, handler))
+        if len(buffer) > MAX_LINE_BYTES:
+            send(_encode({"ok": False, "error": "Request line too long"}))
+            return
+
+
+class ControlServer:
+    """Serve keeper commands on a Unix socket or Windows named pipe.
+
+    handler(cmd, request) is called on the connection thread and its return
+    value is sent back as "result".
+    """
+
+    def __init__(self, address: Optional[str], handler: Callable[[str, dict], object]) -> None:
+        self.address = address or default_address()
+        self.handler = handler
+        self._sock: Optional[socket.socket] = None
+        self._pipe: Optional[int] = None  # First pipe instance, created by start()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_pipe(self) -> bool:
+        return self.address.startswith(PIPE_PREFIX)
+
+    @property
+    def is_tcp(self) -> bool:
+        return self.address.startswith(TCP_PREFIX)
+
+    def _remote_handler(self, cmd: str, request: dict) -> object:
+        if cmd not in REMOTE_COMMANDS:
+            raise PermissionError(f"'{cmd}' is only accepted on the local control address")
+        return self.handler(cmd, request)
+
+    def start(self) -> None:
+        """Bind the address and start accepting clients in a daemon thread."""
+        if self.is_pipe:
+            self._pipe = self._create_pipe(first=True)
+            target = self._serve_pipe
+        elif self.is_tcp:
+            self._bind_tcp()
+            target = self._serve_unix
+        else:
+            self._bind_unix()
+            target = self._serve_unix
+        self._thread = threading.Thread(target=target, name="keeper-control", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop accepting clients and remove the socket file."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)  # Wakes the blocked accept()
+            except OSError:
+                pass
+            self._sock.close()
+            if not self.is_tcp:
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+        elif self.is_pipe:
+            # Connect once so the blocked ConnectNamedPipe() returns
+            try:
+                open(self.address, 'r+b', buffering=0).close()
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _bind_unix(self) -> None:
+        if os.path.exists(self.address):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.address)
+            except OSError:
+                os.unlink(self.address)  # Stale socket left by a crashed keeper
+            else:
+                raise OSError(f"Control address already in use: {self.address}")
+            finally:
+                probe.close()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)  # Only the owning user may connect
+        try:
+            sock.bind(self.address)
+        finally:
+            os.umask(old_umask)
+        sock.listen(8)
+        self._sock = sock
+
+    def _bind_tcp(self) -> None:
+        host, port = parse_tcp_address(self.address)
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(64)
+        if port == 0:
+            self.address = f"{TCP_PREFIX}{host}:{sock.getsockname()[1]}"
+        self._sock = sock
+
+    def _serve_unix(self) -> None:
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve_unix_client, args=(conn,), daemon=True).start()
+
+    def _serve_unix_client(self, conn: socket.socket) -> None:
+        handler = self._remote_handler if self.is_tcp else self.handler
+        with conn:
+            try:
+                _serve_stream(lambda: conn.recv(4096), conn.sendall, handler)
+            except OSError:
+                pass
+
+    def _create_pipe(self, first: bool = False) -> int:
+        """Create one pipe instance; the first one must not join a pipe another process created."""
+        import _winapi
+
+        open_mode = _winapi.PIPE_ACCESS_DUPLEX | (FILE_FLAG_FIRST_PIPE_INSTANCE if first else 0)
+        try:
+            return _winapi.CreateNamedPipe(
+                self.address,
+                open_mode,
+                _winapi.PIPE_TYPE_BYTE | _winapi.PIPE_READMODE_BYTE | _winapi.PIPE_WAIT | PIPE_REJECT_REMOTE_CLIENTS,
+                _winapi.PIPE_UNLIMITED_INSTANCES,
+                MAX_LINE_BYTES,
+                MAX_LINE_BYTES,
+                _winapi.NMPWAIT_WAIT_FOREVER,
+                _winapi.NULL,
+            )
+        except OSError as e:
+            if first and getattr(e, 'winerror', None) == ERROR_ACCESS_DENIED:
+                raise OSError(f"Control address already in use: {self.address}") from e
+            raise
+
+    def _serve_pipe(self) -> None:
+        import _winapi
+
+        while not self._closed.is_set():
+            if self._pipe is not None:
+                handle, self._pipe = self._pipe, None
+            else:
+                try:
+                    handle = self._create_pipe()
+                except OSError:
+                    return  # The keeper keeps running without the control channel
+            try:
+                _winapi.ConnectNamedPipe(handle, False)
+            except OSError as e:
+                if getattr(e, 'winerror', None) != _winapi.ERROR_PIPE_CONNECTED:
+                    _winapi.CloseHandle(handle)
+                    continue
+            if self._closed.is_set():
+                _winapi.CloseHandle(handle)
+                return
+            threading.Thread(target=self._serve_pipe_client, args=(handle,), daemon=True).start()
+
+    def _serve_pipe_client(self, handle: int) -> None:
+        import _winapi
+
+        def recv() -> bytes:
+            try:
+                data, _ = _winapi.ReadFile(handle, 4096, False)
+            except OSError:
+                return b""
+            return data
+
+        def send(data: bytes) -> None:
+            _winapi.WriteFile(handle, data, False)
+
+        try:
+            _serve_stream(recv, send, self.handler)
+        except OSError:
+            pass
+        finally:
+            _winapi.CloseHandle(handle)
+
+
+def _pipe_exchange(address: str, payload: bytes, timeout: float) -> bytes:
+    """Send payload over a named pipe and read the reply line, all within timeout seconds."""
+    import _winapi
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            pipe = open(address, 'r+b', buffering=0)
+            break
+        except OSError as e:
+            remaining = deadline - time.monotonic()
+            if getattr(e, 'winerror', None) != ERROR_PIPE_BUSY or remaining <= 0:
+                raise
+            _winapi.WaitNamedPipe(address, max(1, int(remaining * 1000)))  # Raises OSError when it times out
+
+    # Pipe reads cannot time out; a worker does the exchange and is abandoned when the keeper does not answer
+    result: dict = {}
+
+    def exchange() -> None:
+        reply = b""
+        try:
+            with pipe:
+                pipe.write(payload)
+                while not reply.endswith(b"\n"):
+                    chunk = pipe.read(4096)
+                    if not chunk:
+                        break
+                    reply += chunk
+        except OSError as e:
+            result["error"] = e
+        result["reply"] = reply
+
+    worker = threading.Thread(target=exchange, name="keeper-ctl-pipe", daemon=True)
+    worker.start()
+    worker.join(max(0.0, deadline - time.monotonic()))
+    if worker.is_alive():
+        raise TimeoutError(f"No reply from {address} within {timeout:g}s")
+    if "error" in result:
+        raise result["error"]
+    return result["reply"]
+
+
+def send_command(cmd: str, address: Optional[str] = None, timeout: float = 2.0, **fields) -> dict:
+    """Send one command to a running keeper and return its decoded reply."""
+    address = address or default_address()
+    payload = _encode({"cmd": cmd, **fields})
+
+    if address.startswith(PIPE_PREFIX):
+        reply = _pipe_exchange(address, payload, timeout)
+    else:
+        tcp = parse_tcp_address(address)
+        if tcp is not None:
+            sock = socket.create_connection(tcp, timeout=timeout)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(address)
+        with sock:
+            sock.sendall(payload)
+            reply = b""
+            while not reply.endswith(b"\n"):
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                reply += chunk
+
+    if not reply:
+        raise ConnectionError("Keeper closed the connection without replying")
+    return json.loads(reply)
+
+
+def main(argv: Optional[list] = None) -> int:
+    """`ctl` subcommand: send one command and print the JSON reply."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="activity_keeper.py ctl", description="Control a running activity keeper")
+    parser.add_argument('command', choices=COMMANDS, help='Command to send')
+    parser.add_argument('--address', type=str, help=f'Control socket or pipe (default: {default_address()})')
+    parser.add_argument('--timeout', type=float, default=2.0, help='Seconds to wait for a reply (default: 2)')
+    args = parser.parse_args(argv)
+
+    try:
+        reply = send_command(args.command, args.address, args.timeout)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not reach keeper at {args.address or default_address()}: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(reply, indent=2))
+    return 0 if reply.get("ok") else 1
@@ -0,0 +1,120 @@
+"""Bounded heartbeat history stored in parallel typed arrays.
+
+Each record costs 25 bytes no matter how long the keeper runs. Display
+strings are only built when the dashboard or a report asks for them.
+"""
+import time
+from array import array
+from collections import namedtuple
+from typing import Iterator, List, Optional
+
+DEFAULT_CAPACITY = 4096  # ~5.7 days at the default 120 s interval
+
+METHODS = ("mouse", "keyboard")
+
+HeartbeatRecord = namedtuple("HeartbeatRecord", "monotonic wall method dx dy latency")
+
+
+class ActivityHistory:
+    """Fixed-capacity ring buffer of heartbeat records.
+
+    Records are appended in time order, so the monotonic timestamps are
+    sorted by logical index and window queries use binary search.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._monotonic = array('d', bytes(8 * capacity))
+        self._wall = array('d', bytes(8 * capacity))
+        self._method = array('b', bytes(capacity))
+        self._dx = array('h', bytes(2 * capacity))
+        self._dy = array('h', bytes(2 * capacity))
+        self._latency = array('f', bytes(4 * capacity))
+        self._start = 0  # Physical slot of the oldest record
+        self._count = 0
+        self.total_appended = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _slot(self, index: int) -> int:
+        return (self._start + index) % self.capacity
+
+    def append(self, method: str, dx: int, dy: int, latency: float, wall: Optional[float] = None, monotonic: Optional[float] = None) -> None:
+        """Record one heartbeat; the oldest record is overwritten when full."""
+        if self._count < self.capacity:
+            slot = self._slot(self._count)
+            self._count += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._monotonic[slot] = time.monotonic() if monotonic is None else monotonic
+        self._wall[slot] = time.time() if wall is None else wall
+        self._method[slot] = METHODS.index(method)
+        self._dx[slot] = max(-32768, min(32767, dx))
+        self._dy[slot] = max(-32768, min(32767, dy))
+        self._latency[slot] = latency
+        self.total_appended += 1
+
+    def _record(self, index: int) -> HeartbeatRecord:
+        slot = self._slot(index)
+        return HeartbeatRecord(
+            self._monotonic[slot],
+            self._wall[slot],
+            METHODS[self._method[slot]],
+            self._dx[slot],
+            self._dy[slot],
+            self._latency[slot],
+        )
+
+    def _first_index_since(self, cutoff: float) -> int:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._monotonic[self._slot(mid)] < cutoff:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def records(self, last: Optional[int] = None) -> Iterator[HeartbeatRecord]:
+        """Yield the `last` most recent records (all by default), oldest first."""
+        first = 0 if last is None else max(0, self._count - last)
+        for index in range(first, self._count):
+            yield self._record(index)
+
+    def since(self, seconds: float, now: Optional[float] = None) -> List[HeartbeatRecord]:
+        """Return records from the last `seconds` seconds, oldest first."""
+        now = time.monotonic() if now is None else now
+        first = self._first_index_since(now - seconds)
+        return [self._record(index) for index in range(first, self._count)]
+
+    def format_recent(self, count: int = 5) -> List[str]:
+        """Format the newest `count` records as dashboard lines."""
+        lines = []
+        for record in self.records(count):
+            timestamp = time.strftime("%H:%M:%S", time.localtime(record.wall))
+            lines.append(f"[{timestamp}] Heartbeat sent! (Moved {record.dx}, {record.dy})")
+        return lines
+
+    def summary(self, seconds: Optional[float] = None, now: Optional[float] = None) -> dict:
+        """Aggregate heartbeats in the last `seconds` seconds (or the whole buffer)."""
+        records = list(self.records()) if seconds is None else self.since(seconds, now)
+        result = {
+            "heartbeats": len(records),
+            "mouse": sum(1 for r in records if r.method == "mouse"),
+            "keyboard": sum(1 for r in records if r.method == "keyboard"),
+            "avg_interval_seconds": None,
+            "avg_latency_ms": None,
+            "max_latency_ms": None,
+        }
+        if len(records) > 1:
+            span = records[-1].monotonic - records[0].monotonic
+            result["avg_interval_seconds"] = round(span / (len(records) - 1), 1)
+        if records:
+            latencies = [r.latency for r in records]
+            result["avg_latency_ms"] = round(1000 * sum(latencies) / len(latencies), 1)
+            result["max_latency_ms"] = round(1000 * max(latencies), 1)
+        return result
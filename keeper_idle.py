@@ -0,0 +1,363 @@
+"""Idle-time trace recorder and the `tune` subcommand that replays traces.
+
+Trace files are a fixed header followed by fixed-size records:
+
+    header  <4sHHdf  magic b"AKIT", layout version, reserved, start Unix time, sample interval
+    record  <If      time since start in 0.1 s units, idle seconds
+
+Recording costs one idle query and one struct.pack_into per sample; records
+are written in blocks of FLUSH_EVERY. An existing trace at the path is
+continued, so a restarted keeper appends to it. When a file reaches
+max_bytes it is rotated to `<path>.1` (replacing the previous one), so disk
+use is bounded by twice max_bytes.
+
+`tune` replays traces through the auto-pause rule (pause while idle time is
+below the threshold, resume once it reaches it) for a list of candidate
+thresholds. It uses NumPy when it is installed and an equivalent pure-Python
+path otherwise.
+"""
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from bisect import bisect_right
+from typing import Callable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+MAGIC = b"AKIT"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sHHdf")
+RECORD = struct.Struct("<If")
+TICKS_PER_SECOND = 10
+FLUSH_EVERY = 64
+GAP_SAMPLES = 5  # Samples further apart than this many sample intervals: the keeper was offline in between
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024  # ~6 days at one sample per second
+
+
+class IdleRecorder:
+    """Sample an idle-time source every `interval` seconds into a trace file."""
+
+    def __init__(self, path: str, source: Callable[[], float], interval: float = 1.0, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        if max_bytes < HEADER.size + RECORD.size * FLUSH_EVERY:
+            raise ValueError(f"max_bytes must be at least {HEADER.size + RECORD.size * FLUSH_EVERY}")
+        self.path = path
+        self.source = source
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.samples = 0
+        self.error: Optional[str] = None
+        self._buffer = bytearray(RECORD.size * FLUSH_EVERY)
+        self._pending = 0
+        self._file = None
+        self._file_start = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _open(self, now: float, append: bool = False) -> None:
+        if append and self._reopen():
+            return
+        self._file = open(self.path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, LAYOUT_VERSION, 0, now, self.interval))
+        self._file_start = now
+
+    def _reopen(self) -> bool:
+        """Continue the trace already at path; False when there is none (or it is not a trace)."""
+        try:
+            f = open(self.path, 'r+b')
+        except FileNotFoundError:
+            return False
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or HEADER.unpack(header)[:2] != (MAGIC, LAYOUT_VERSION):
+            f.close()
+            return False
+        body = f.seek(0, os.SEEK_END) - HEADER.size
+        f.truncate(HEADER.size + body - body % RECORD.size)  # Drop a torn last record
+        f.seek(0, os.SEEK_END)
+        self._file = f
+        self._file_start = HEADER.unpack(header)[3]  # New records keep counting from the original start
+        return True
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        if self._file.tell() + RECORD.size * self._pending > self.max_bytes:
+            self._file.close()
+            os.replace(self.path, self.path + ".1")
+            # The buffered records keep their offsets from the old start time
+            self._open(self._file_start)
+        self._file.write(memoryview(self._buffer)[:RECORD.size * self._pending])
+        self._file.flush()
+        self._pending = 0
+
+    def sample(self, now: Optional[float] = None) -> None:
+        """Record one sample (called by the recorder thread; public for tests)."""
+        now = time.time() if now is None else now
+        if self._file is None:
+            self._open(now, append=True)
+        ticks = max(0, int((now - self._file_start) * TICKS_PER_SECOND))
+        RECORD.pack_into(self._buffer, RECORD.size * self._pending, min(ticks, 0xFFFFFFFF), self.source())
+        self._pending += 1
+        self.samples += 1
+        if self._pending == FLUSH_EVERY:
+            self._flush()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.wait(self.interval):
+                self.sample()
+        except Exception as e:  # Unsupported idle source or disk error: stop recording, keep the keeper
+            self.error = str(e)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="keeper-idle-recorder", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self._file is not None:
+            try:
+                self._flush()
+            finally:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path: str) -> Tuple[float, float, Sequence[float], Sequence[float]]:
+    """Return (start_time, interval, times, idle) with times as Unix seconds."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: not an idle trace (too short)")
+    magic, version, _, start, interval = HEADER.unpack_from(data)
+    if magic != MAGIC or version != LAYOUT_VERSION:
+        raise ValueError(f"{path}: not an idle trace (bad magic or version)")
+    body = memoryview(data)[HEADER.size:]
+    body = body[:len(body) - len(body) % RECORD.size]  # Ignore a torn last record
+
+    if NUMPY_AVAILABLE:
+        records = np.frombuffer(body, dtype=np.dtype([("ticks", "<u4"), ("idle", "<f4")]))
+        times = start + records["ticks"].astype(np.float64) / TICKS_PER_SECOND
+        return start, interval, times, records["idle"].astype(np.float64)
+    times, idle = [], []
+    for ticks, value in RECORD.iter_unpack(body):
+        times.append(start + ticks / TICKS_PER_SECOND)
+        idle.append(value)
+    return start, interval, times, idle
+
+
+def load_traces(paths: Sequence[str]) -> Tuple[Sequence[float], Sequence[float]]:
+    """Merge traces (rotated backups included when given) into one series sorted by sample time.
+
+    Sorted by the samples, not the headers: a rotated file and its
+    successor share the same header start time, and paths may come in any order.
+    """
+    loaded = [read_trace(path) for path in paths]
+    if NUMPY_AVAILABLE:
+        times = np.concatenate([trace[2] for trace in loaded]) if loaded else np.empty(0)
+        idle = np.concatenate([trace[3] for trace in loaded]) if loaded else np.empty(0)
+        order = np.argsort(times, kind="stable")
+        return times[order], idle[order]
+    samples = sorted(
+        (pair for trace in loaded for pair in zip(trace[2], trace[3])),
+        key=lambda pair: pair[0],
+    )
+    return [t for t, _ in samples], [value for _, value in samples]
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def evaluate_threshold(times, idle, threshold: float, interval: float, presence_timeout: float) -> dict:
+    """Replay one threshold over a trace.
+
+    Reports pause episodes, paused share, heartbeats sent and skipped on a
+    fixed `interval` grid, auto-resume delay (time since the last input when
+    the keeper resumes) and the longest stretch with neither input nor a
+    heartbeat, which must stay below presence_timeout. Samples more than
+    GAP_SAMPLES sample intervals apart (nights, reboots) split the trace into
+    segments that are replayed separately, so offline time counts as neither
+    sent nor skipped heartbeats.
+    """
+    if NUMPY_AVAILABLE:
+        times, idle = np.asarray(times, dtype=np.float64), np.asarray(idle, dtype=np.float64)
+        replay = _replay_numpy
+    else:
+        times, idle = list(times), list(idle)
+        replay = _replay_python
+    if len(times) == 0:
+        return _summary(threshold, 0, 0, 0.0, 0, 0, None, 0.0, presence_timeout)
+
+    samples = episodes = paused = sent = skipped = 0
+    delays: List[float] = []
+    max_gap = 0.0
+    for first, last in _segments(times):
+        part = replay(times[first:last], idle[first:last], threshold, interval)
+        samples += last - first
+        episodes += part[0]
+        paused += part[1]
+        sent += part[2]
+        skipped += part[3]
+        delays.extend(part[4])
+        max_gap = max(max_gap, part[5])
+    if not delays:
+        quantiles = None
+    elif NUMPY_AVAILABLE:
+        quantiles = (float(np.median(delays)), float(np.percentile(delays, 95)))
+    else:
+        quantiles = (_percentile(delays, 0.5), _percentile(delays, 0.95))
+    return _summary(threshold, samples, episodes, paused / samples, sent, skipped, quantiles, max_gap, presence_timeout)
+
+
+def _segments(times) -> List[Tuple[int, int]]:
+    """[first, last) index ranges of the runs of samples with no offline gap between them."""
+    if len(times) < 2:
+        return [(0, len(times))]
+    if NUMPY_AVAILABLE:
+        steps = np.diff(times)
+        limit = GAP_SAMPLES * float(np.median(steps))
+        breaks = (np.flatnonzero(steps > limit) + 1).tolist()
+    else:
+        steps = [b - a for a, b in zip(times, times[1:])]
+        limit = GAP_SAMPLES * sorted(steps)[len(steps) // 2]
+        breaks = [i + 1 for i, step in enumerate(steps) if step > limit]
+    bounds = [0, *breaks, len(times)]
+    return list(zip(bounds, bounds[1:]))
+
+
+def _summary(threshold, samples, episodes, paused_share, sent, skipped, delays, max_gap, presence_timeout) -> dict:
+    return {
+        "threshold_seconds": threshold,
+        "samples": samples,
+        "pause_episodes": episodes,
+        "paused_percent": round(100.0 * paused_share, 1),
+        "heartbeats_sent": sent,
+        "heartbeats_skipped": skipped,
+        "resume_delay_median_seconds": None if delays is None else round(delays[0], 1),
+        "resume_delay_p95_seconds": None if delays is None else round(delays[1], 1),
+        "max_uncovered_gap_seconds": round(max_gap, 1),
+        "presence_safe": max_gap < presence_timeout,
+    }
+
+
+def _replay_numpy(times, idle, threshold, interval) -> tuple:
+    """Replay one gap-free segment: (episodes, paused samples, sent, skipped, resume delays, max uncovered gap)."""
+    paused = idle < threshold
+    previous = np.concatenate(([False], paused[:-1]))
+    episodes = int(np.count_nonzero(paused & ~previous))
+    resumed = ~paused & previous
+    delays = idle[resumed]  # Idle time at the resume sample == time since the last input
+
+    due = np.arange(times[0], times[-1], interval)
+    at_due = np.searchsorted(times, due, side="right") - 1
+    skipped_mask = paused[at_due]
+    sent_times = due[~skipped_mask]
+
+    last_input = times - idle
+    if sent_times.size:
+        last_beat_index = np.searchsorted(sent_times, times, side="right") - 1
+        last_beat = np.where(last_beat_index >= 0, sent_times[np.maximum(last_beat_index, 0)], -np.inf)
+    else:  # Every heartbeat skipped (user active throughout, or threshold above the usual idle time)
+        last_beat = np.full(times.shape, -np.inf)
+    uncovered = times - np.maximum(last_input, last_beat)
+    return (
+        episodes,
+        int(np.count_nonzero(paused)),
+        int(sent_times.size),
+        int(np.count_nonzero(skipped_mask)),
+        delays.tolist(),
+        float(np.max(uncovered)),
+    )
+
+
+def _replay_python(times, idle, threshold, interval) -> tuple:
+    """Pure-Python _replay_numpy."""
+    paused = [value < threshold for value in idle]
+    episodes = 0
+    delays = []
+    for i, is_paused in enumerate(paused):
+        was_paused = paused[i - 1] if i else False
+        if is_paused and not was_paused:
+            episodes += 1
+        elif was_paused and not is_paused:
+            delays.append(idle[i])
+
+    sent_times = []
+    skipped = 0
+    due = times[0]
+    while due < times[-1]:
+        if paused[bisect_right(times, due) - 1]:
+            skipped += 1
+        else:
+            sent_times.append(due)
+        due += interval
+
+    max_gap = 0.0
+    for t, value in zip(times, idle):
+        index = bisect_right(sent_times, t) - 1
+        last_beat = sent_times[index] if index >= 0 else float("-inf")
+        max_gap = max(max_gap, t - max(t - value, last_beat))
+    return episodes, sum(paused), len(sent_times), skipped, delays, max_gap
+
+
+def _resample(times, idle, step: int):
+    """Keep every `step`-th sample to model a slower inactivity check interval."""
+    if step <= 1:
+        return times, idle
+    return times[::step], idle[::step]
+
+
+def main(argv: Optional[list] = None) -> int:
+    """`tune` subcommand: compare candidate inactivity thresholds on recorded traces."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="activity_keeper.py tune", description="Replay idle traces (--record-idle) against candidate inactivity thresholds")
+    parser.add_argument('traces', nargs='+', help='Trace files (include rotated .1 files to cover more time)')
+    parser.add_argument('--thresholds', type=str, default='15,30,60,90,120,180', help='Comma-separated inactivity_threshold_seconds candidates')
+    parser.add_argument('--interval', type=float, default=120.0, help='activity_interval to replay (default: 120)')
+    parser.add_argument('--check-interval', type=float, default=None, help='Model a slower inactivity check by subsampling (default: trace sample interval)')
+    parser.add_argument('--presence-timeout', type=float, default=300.0, help='Seconds without input before presence goes away (default: 300)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    try:
+        thresholds = [float(value) for value in args.thresholds.split(',') if value.strip()]
+        sample_interval = min(read_trace(path)[1] for path in args.traces)
+        times, idle = load_traces(args.traces)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    step = max(1, round((args.check_interval or sample_interval) / sample_interval))
+    times, idle = _resample(times, idle, step)
+    results = [evaluate_threshold(times, idle, threshold, args.interval, args.presence_timeout) for threshold in thresholds]
+
+    if args.json:
+        print(json.dumps({"engine": "numpy" if NUMPY_AVAILABLE else "python", "results": results}, indent=2))
+        return 0
+
+    segments = _segments(times) if len(times) else []
+    span_hours = sum(float(times[last - 1] - times[first]) for first, last in segments) / 3600  # Offline gaps excluded
+    print(f"{len(times)} samples over {span_hours:.1f} h, interval {args.interval:g} s, check every {step * sample_interval:g} s")
+    print(f"{'threshold':>9} {'pauses':>7} {'paused%':>8} {'sent':>6} {'skipped':>8} {'resume p50':>11} {'resume p95':>11} {'max gap':>8}  safe")
+    for r in results:
+        p50 = "-" if r["resume_delay_median_seconds"] is None else f"{r['resume_delay_median_seconds']:.0f}s"
+        p95 = "-" if r["resume_delay_p95_seconds"] is None else f"{r['resume_delay_p95_seconds']:.0f}s"
+        print(
+            f"{r['threshold_seconds']:>8g}s {r['pause_episodes']:>7} {r['paused_percent']:>8} {r['heartbeats_sent']:>6} "
+            f"{r['heartbeats_skipped']:>8} {p50:>11} {p95:>11} {r['max_uncovered_gap_seconds']:>7.0f}s  {'yes' if r['presence_safe'] else 'NO'}"
+        )
+    return 0
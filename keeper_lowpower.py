@@ -0,0 +1,162 @@
+"""Low-power heartbeat interval derived from the measured presence timeout.
+
+Presence goes away after the shortest of these idle timeouts:
+
+- `presence_timeout_seconds` from the config (Teams marks you Away after 5 minutes)
+- the screen saver timeout, when a screen saver is active
+- the machine inactivity limit (`InactivityTimeoutSecs` policy), which locks the session
+
+Display and system sleep are not candidates because the keeper holds a
+`prevent_sleep` power request. If that request could not be set, or the idle
+source does not work, the configured interval is used unchanged.
+
+The timeouts are measured once, on the first interval() call. The interval
+is then stretched to (timeout - margin) / (1 + jitter), so even a heartbeat
+with maximum positive jitter arrives `margin` seconds before the timeout.
+After the first heartbeat the idle source must read close to zero. If it does
+not, injected input does not count as activity on this machine, and adaptive
+mode turns itself off.
+"""
+import ctypes
+import math
+import sys
+from typing import Callable, Optional, Tuple
+
+DEFAULT_PRESENCE_TIMEOUT = 300
+DEFAULT_MARGIN = 60
+HEARTBEAT_RESET_TOLERANCE = 2.0  # Idle seconds allowed right after a heartbeat
+
+SPI_GETSCREENSAVETIMEOUT = 0x000E
+SPI_GETSCREENSAVEACTIVE = 0x0010
+INACTIVITY_POLICY_KEY = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Policies\System"
+
+
+def screen_saver_timeout() -> Optional[int]:
+    """Seconds until the screen saver starts, or None when none is active."""
+    if sys.platform != 'win32':
+        return None
+    user32 = ctypes.windll.user32
+    active = ctypes.c_int(0)
+    if not user32.SystemParametersInfoW(SPI_GETSCREENSAVEACTIVE, 0, ctypes.byref(active), 0) or not active.value:
+        return None
+    timeout = ctypes.c_int(0)
+    if not user32.SystemParametersInfoW(SPI_GETSCREENSAVETIMEOUT, 0, ctypes.byref(timeout), 0):
+        return None
+    return timeout.value or None
+
+
+def inactivity_lock_timeout() -> Optional[int]:
+    """Seconds until the machine inactivity limit locks the session, or None."""
+    if sys.platform != 'win32':
+        return None
+    import winreg
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, INACTIVITY_POLICY_KEY) as key:
+            value, _ = winreg.QueryValueEx(key, "InactivityTimeoutSecs")
+    except OSError:
+        return None
+    return int(value) or None
+
+
+class AdaptiveInterval:
+    """Stretch activity_interval up to the measured presence timeout.
+
+    config is read on every call, so presence_timeout_seconds and
+    adaptive_interval_margin_seconds follow hot-reloads. stay_awake()
+    reports whether the prevent_sleep power request is in effect.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        idle_source: Callable[[], float],
+        stay_awake: Callable[[], bool],
+        jitter: float = 0.1,
+        os_timeouts: Tuple[Callable[[], Optional[int]], ...] = (screen_saver_timeout, inactivity_lock_timeout),
+    ) -> None:
+        self.config = config
+        self.idle_source = idle_source
+        self.stay_awake = stay_awake
+        self.jitter = jitter
+        self.os_timeouts = os_timeouts
+        self.measured = False
+        self.os_timeout: Optional[int] = None  # Shortest OS timeout found by measure()
+        self.os_timeout_source: Optional[str] = None
+        self.disabled_reason: Optional[str] = None
+        self.verified = False
+        self.base_interval: Optional[int] = None
+        self.current_interval: Optional[int] = None
+        self.heartbeats_saved = 0.0
+
+    def measure(self) -> None:
+        """Read the OS timeouts and check the power request and idle source (once)."""
+        self.measured = True
+        if not self.stay_awake():
+            self.disabled_reason = "stay-awake power request is not active"
+            return
+        try:
+            idle = float(self.idle_source())
+        except Exception as e:
+            self.disabled_reason = f"idle source unavailable: {e}"
+            return
+        if not math.isfinite(idle) or idle < 0:
+            self.disabled_reason = f"idle source returned {idle}"
+            return
+        for probe in self.os_timeouts:
+            try:
+                timeout = probe()
+            except Exception:
+                continue  # A probe that fails cannot shorten the timeout
+            if timeout and (self.os_timeout is None or timeout < self.os_timeout):
+                self.os_timeout = timeout
+                self.os_timeout_source = probe.__name__
+
+    def presence_timeout(self) -> Tuple[int, str]:
+        """Effective timeout in seconds and where it comes from."""
+        configured = int(self.config.get('presence_timeout_seconds', DEFAULT_PRESENCE_TIMEOUT))
+        if self.os_timeout is not None and self.os_timeout < configured:
+            return self.os_timeout, self.os_timeout_source
+        return configured, "presence_timeout_seconds"
+
+    def interval(self, base: int) -> int:
+        """Heartbeat interval to use instead of base (never shorter than base)."""
+        if not self.measured:
+            self.measure()
+        self.base_interval = base
+        if self.disabled_reason:
+            self.current_interval = base
+            return base
+        timeout, _ = self.presence_timeout()
+        margin = self.config.get('adaptive_interval_margin_seconds', DEFAULT_MARGIN)
+        safe = int((timeout - margin) / (1 + self.jitter))
+        self.current_interval = max(base, safe)
+        return self.current_interval
+
+    def heartbeat_sent(self, check_idle: bool = True) -> None:
+        """Account for a heartbeat; the first one verifies that it reset the idle time."""
+        if check_idle and self.measured and not self.verified and not self.disabled_reason:
+            try:
+                idle = float(self.idle_source())
+            except Exception as e:
+                idle, error = math.inf, str(e)
+            else:
+                error = f"{idle:.1f}s idle right after a heartbeat"
+            self.verified = True
+            if idle > HEARTBEAT_RESET_TOLERANCE:
+                self.disabled_reason = f"heartbeats do not reset the idle time ({error})"
+                return
+        if self.base_interval and self.current_interval:
+            self.heartbeats_saved += self.current_interval / self.base_interval - 1
+
+    def stats(self) -> dict:
+        timeout, source = self.presence_timeout()
+        return {
+            "active": self.measured and not self.disabled_reason,
+            "presence_timeout_seconds": timeout,
+            "timeout_source": source,
+            "margin_seconds": self.config.get('adaptive_interval_margin_seconds', DEFAULT_MARGIN),
+            "base_interval": self.base_interval,
+            "interval": self.current_interval,
+            "heartbeats_saved": round(self.heartbeats_saved),
+            "disabled_reason": self.disabled_reason,
+        }
@@ -0,0 +1,220 @@
+"""Keeper counters and histograms in Prometheus text exposition format.
+
+Metrics are exported either from a localhost HTTP listener (GET /metrics)
+or by periodically rewriting a text file that node_exporter's textfile
+collector (or any other scraper) can pick up.
+"""
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from keeper_trace import traced
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 2.0, 5.0)
+DRIFT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), initial: Sequence[Tuple[str, ...]] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {tuple(values): 0 for values in initial}
+        if not self.labelnames:
+            self.values[()] = 0
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram without labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def render(self) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(self.total)}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics. All updates and renders are serialized by one lock."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        with self._lock:
+            self._metrics[name].inc(amount, **labels)
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self._metrics[name].observe(value)
+
+    def render(self) -> str:
+        """Return all metrics in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for metric in self._metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def create_keeper_registry() -> MetricsRegistry:
+    """Build the registry with every metric the keeper reports."""
+    registry = MetricsRegistry()
+    registry.add(Counter("activity_keeper_heartbeats_sent_total", "Heartbeats injected (including dry-run)."))
+    registry.add(Counter(
+        "activity_keeper_heartbeats_skipped_total",
+        "Scheduled heartbeats dropped because the keeper was paused when they came due.",
+        ["reason"],
+        [("auto_pause",), ("manual_pause",)],
+    ))
+    registry.add(Counter("activity_keeper_auto_pauses_total", "Automatic pauses caused by user activity."))
+    registry.add(Counter("activity_keeper_auto_resumes_total", "Automatic resumes after user inactivity."))
+    registry.add(Counter(
+        "activity_keeper_config_reloads_total",
+        "Config reload attempts by result.",
+        ["result"],
+        [("success",), ("failure",)],
+    ))
+    registry.add(Counter("activity_keeper_schedule_waits_total", "Times the keeper entered waiting-for-schedule mode."))
+    registry.add(Counter("activity_keeper_loop_wakeups_total", "Run loop wakeups (timer expiry or external wake)."))
+    registry.add(Histogram(
+        "activity_keeper_perform_activity_duration_seconds",
+        "Wall time spent in perform_activity().",
+        DURATION_BUCKETS,
+    ))
+    registry.add(Histogram(
+        "activity_keeper_heartbeat_drift_seconds",
+        "Delay between a heartbeat's scheduled time and when it was sent.",
+        DRIFT_BUCKETS,
+    ))
+    return registry
+
+
+class MetricsHTTPServer:
+    """Serve GET /metrics on a local port from a daemon thread."""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = "127.0.0.1") -> None:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass  # Keep scrapes out of the console
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self.address = f"http://{host}:{self._server.server_address[1]}/metrics"
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, name="keeper-metrics", daemon=True).start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsFileWriter:
+    """Rewrite a metrics text file every `interval` seconds with an atomic rename."""
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 15.0) -> None:
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.address = path
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @traced
+    def write(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.registry.render())
+        os.replace(tmp_path, self.path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                pass  # Try again on the next tick
+
+    def start(self) -> None:
+        self.write()
+        self._thread = threading.Thread(target=self._run, name="keeper-metrics", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        try:
+            self.write()  # Final values for the last scrape
+        except OSError:
+            pass
@@ -0,0 +1,436 @@
+"""Minimal headless keeper for memory-constrained machines.
+
+Run it directly so that none of the full keeper is loaded:
+
+    python keeper_minimal.py --config activity_config.json
+
+Only the primitives a heartbeat needs are loaded:
+
+- SendInput through ctypes for the mouse jiggle and key press (no pyautogui, Pillow or screenshot code)
+- GetLastInputInfo for inactivity detection
+- SetThreadExecutionState to keep the machine awake
+
+State is a handful of numbers in a __slots__ object. Nothing grows with
+uptime: there is no heartbeat history, dashboard, tray or control server,
+and log lines go straight to the file. Peak RSS is reported at exit.
+
+Supported config keys: activity_interval, total_duration, method,
+keyboard_key, mouse_move_distance, inactivity_detection_enabled and
+inactivity_threshold_seconds. Schedules need the full keeper.
+"""
+import ctypes
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+import keeper_random
+
+JITTER_PERCENTAGE = 0.1
+RSS_BUDGET_BYTES = 24 * 1024 * 1024  # Peak RSS of a simulated week (enforced by tests/test_minimal_memory.py)
+STEADY_STATE_BUDGET_BYTES = 64 * 1024  # Python heap growth allowed after the first day
+
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+MOUSEEVENTF_MOVE = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+ES_CONTINUOUS = 0x80000000
+ES_SYSTEM_REQUIRED = 0x00000001
+ES_DISPLAY_REQUIRED = 0x00000002
+VK_F15 = 0x7E
+
+# Virtual-key codes for the keys a heartbeat may press
+KEY_CODES = {
+    "scrolllock": 0x91,
+    "numlock": 0x90,
+    "shift": 0x10,
+    "ctrl": 0x11,
+    "alt": 0x12,
+    **{f"f{n}": 0x70 + n - 1 for n in range(13, 25)},
+}
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", ctypes.c_long),
+                ("dy", ctypes.c_long),
+                ("mouseData", ctypes.c_ulong),
+                ("dwFlags", ctypes.c_ulong),
+                ("time", ctypes.c_ulong),
+                ("dwExtraInfo", ctypes.c_size_t)]
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", ctypes.c_ushort),
+                ("wScan", ctypes.c_ushort),
+                ("dwFlags", ctypes.c_ulong),
+                ("time", ctypes.c_ulong),
+                ("dwExtraInfo", ctypes.c_size_t)]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [("uMsg", ctypes.c_ulong),
+                ("wParamL", ctypes.c_ushort),
+                ("wParamH", ctypes.c_ushort)]
+
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_ulong), ("u", _INPUTUNION)]
+
+
+class POINT(ctypes.Structure):
+    _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+
+
+class LASTINPUTINFO(ctypes.Structure):
+    _fields_ = [("cbSize", ctypes.c_uint),
+                ("dwTime", ctypes.c_uint)]
+
+
+class SendInputInjector:
+    """Inject heartbeats with user32.SendInput (Windows only)."""
+
+    def __init__(self) -> None:
+        if sys.platform != 'win32':
+            raise OSError("SendInput is only available on Windows (use --dry-run elsewhere)")
+        self.user32 = ctypes.windll.user32
+        self._keys = (INPUT * 2)()  # Reused for every key press: down, up
+        self._keys[0].type = self._keys[1].type = INPUT_KEYBOARD
+        self._keys[1].u.ki.dwFlags = KEYEVENTF_KEYUP
+        self._move = INPUT(type=INPUT_MOUSE)
+        self._move.u.mi.dwFlags = MOUSEEVENTF_MOVE
+        self._point = POINT()
+
+    def key(self, vk: int) -> None:
+        self._keys[0].u.ki.wVk = self._keys[1].u.ki.wVk = vk
+        if self.user32.SendInput(2, self._keys, ctypes.sizeof(INPUT)) != 2:
+            raise OSError(f"SendInput failed for key 0x{vk:02X}")
+
+    def mouse(self, dx: int, dy: int) -> None:
+        """Move by (dx, dy) as real input, then put the cursor back exactly."""
+        self.user32.GetCursorPos(ctypes.byref(self._point))
+        self._move.u.mi.dx, self._move.u.mi.dy = dx, dy
+        if self.user32.SendInput(1, ctypes.byref(self._move), ctypes.sizeof(INPUT)) != 1:
+            raise OSError("SendInput failed for mouse move")
+        time.sleep(0.05)
+        self.user32.SetCursorPos(self._point.x, self._point.y)  # Pointer acceleration makes a relative move back inexact
+        self.key(VK_F15)  # Ghost key, like the full keeper
+
+
+class DryRunInjector:
+    """Count heartbeats without injecting anything."""
+
+    def __init__(self) -> None:
+        self.keys = 0
+        self.moves = 0
+
+    def key(self, vk: int) -> None:
+        self.keys += 1
+
+    def mouse(self, dx: int, dy: int) -> None:
+        self.moves += 1
+
+
+def get_idle_seconds() -> float:
+    """Seconds since the last user input (Windows)."""
+    info = LASTINPUTINFO(ctypes.sizeof(LASTINPUTINFO), 0)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        raise OSError("GetLastInputInfo failed")
+    return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000.0
+
+
+def set_stay_awake(enabled: bool) -> bool:
+    """Hold (or release) the system and display awake request; False when unavailable."""
+    if sys.platform != 'win32':
+        return False
+    flags = ES_CONTINUOUS | ES_SYSTEM_REQUIRED | ES_DISPLAY_REQUIRED if enabled else ES_CONTINUOUS
+    return bool(ctypes.windll.kernel32.SetThreadExecutionState(flags))
+
+
+class _PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    _fields_ = [("cb", ctypes.c_ulong),
+                ("PageFaultCount", ctypes.c_ulong),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t)]
+
+
+def _windows_memory() -> Optional[_PROCESS_MEMORY_COUNTERS]:
+    counters = _PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, or None when unknown."""
+    if sys.platform == 'win32':
+        counters = _windows_memory()
+        return counters.PeakWorkingSetSize if counters else None
+    try:
+        # Linux: the high-water mark of this address space. ru_maxrss can still
+        # hold the parent's RSS from before exec.
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Bytes on macOS, KiB elsewhere
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, or None when unknown."""
+    if sys.platform == 'win32':
+        counters = _windows_memory()
+        return counters.WorkingSetSize if counters else None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class VirtualClock:
+    """Clock whose sleep() advances time instantly (--simulate and tests)."""
+
+    __slots__ = ("now",)
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += max(0.0, seconds)
+
+
+class MinimalKeeper:
+    """Heartbeat loop with constant-size state.
+
+    injector has key(vk) and mouse(dx, dy). idle_source returns seconds since
+    the last user input and is only called when inactivity detection is on:
+    a heartbeat that comes due while the user is active is skipped. Without a
+    sleep function the loop waits on an event that stop() sets, so a stop
+    (e.g. from the SIGTERM handler) ends the run without waiting for the
+    next heartbeat.
+    """
+
+    __slots__ = (
+        "interval", "duration", "method", "vk", "distance", "idle_threshold",
+        "injector", "idle_source", "clock", "sleep", "rng", "log",
+        "started_at", "heartbeats", "skipped", "last_heartbeat_at", "stop_requested", "_stopped",
+    )
+
+    def __init__(
+        self,
+        config: dict,
+        injector,
+        idle_source: Optional[Callable[[], float]] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Optional[Callable[[float], None]] = None,
+        rng=None,
+        log: Callable[[str], None] = lambda message: None,
+    ) -> None:
+        self.interval = int(config['activity_interval'])
+        self.duration = float(config['total_duration'])
+        self.method = config.get('method', 'mouse')
+        self.vk = KEY_CODES[config.get('keyboard_key', 'scrolllock')]
+        self.distance = int(config.get('mouse_move_distance', 10))
+        detect = config.get('inactivity_detection_enabled', False) and idle_source is not None
+        self.idle_threshold = float(config.get('inactivity_threshold_seconds', 60)) if detect else None
+        self.injector = injector
+        self.idle_source = idle_source
+        self.clock = clock
+        self._stopped = threading.Event()
+        self.sleep = sleep if sleep is not None else self._stopped.wait
+        self.rng = rng if rng is not None else keeper_random.RandomStream(block_size=64, use_numpy=False)
+        self.log = log
+        self.started_at = 0.0
+        self.heartbeats = 0
+        self.skipped = 0
+        self.last_heartbeat_at = 0.0
+        self.stop_requested = False
+
+    def stop(self) -> None:
+        """End run() as soon as possible; safe to call from a signal handler or another thread."""
+        self.stop_requested = True
+        self._stopped.set()
+
+    def _next_wait(self) -> int:
+        jitter = int(self.interval * JITTER_PERCENTAGE)
+        return self.interval + self.rng.randint(-jitter, jitter)
+
+    def _heartbeat(self, now: float) -> None:
+        if self.idle_threshold is not None and self.idle_source() < self.idle_threshold:
+            self.skipped += 1  # The user is active; no heartbeat needed
+            self.log("Heartbeat skipped: user active")
+            return
+        if self.method == 'keyboard':
+            self.injector.key(self.vk)
+        else:
+            dx = self.rng.randint(-self.distance, self.distance)
+            dy = self.rng.randint(-self.distance, self.distance)
+            self.injector.mouse(dx or 1, dy)
+        self.heartbeats += 1
+        self.last_heartbeat_at = now
+        self.log(f"Heartbeat {self.heartbeats} ({self.method})")
+
+    def run(self) -> dict:
+        """Send heartbeats until total_duration has passed or stop() is called."""
+        self.started_at = now = self.clock()
+        end = self.started_at + self.duration
+        due = now + self._next_wait()
+        while not self.stop_requested:
+            if due >= end:
+                self.sleep(max(0.0, end - now))
+                break
+            if due > now:
+                self.sleep(due - now)
+            now = self.clock()
+            if self.stop_requested:
+                break
+            self._heartbeat(now)
+            due += self._next_wait()
+            if due <= now:
+                due = now + self._next_wait()  # Suspended or overloaded: do not burst to catch up
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            "heartbeats": self.heartbeats,
+            "skipped_user_active": self.skipped,
+            "last_heartbeat_at": self.last_heartbeat_at or None,
+            "uptime_seconds": round(self.clock() - self.started_at, 3),
+            "seed": getattr(self.rng, "seed", None),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+
+def check_config(config: dict) -> Optional[str]:
+    """Return an error for configs the minimal keeper cannot run, or None."""
+    for key in ('activity_interval', 'total_duration'):
+        value = config.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            return f"{key} must be positive"
+    if config.get('method', 'mouse') not in ('mouse', 'keyboard'):
+        return "method must be 'keyboard' or 'mouse'"
+    if config.get('keyboard_key', 'scrolllock') not in KEY_CODES:
+        return f"keyboard_key must be one of: {', '.join(KEY_CODES)}"
+    if config.get('schedule_enabled', False):
+        return "schedules are not supported in minimal mode (use activity_keeper.py)"
+    return None
+
+
+def _megabytes(value: Optional[int]) -> str:
+    return f"{value / (1024 * 1024):.1f} MB" if value is not None else "unknown"
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Run the minimal keeper; returns the exit status."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="keeper_minimal.py", description="Minimal headless activity keeper")
+    parser.add_argument('--config', type=str, default='activity_config.json', help='Configuration file')
+    parser.add_argument('--interval', type=int, help='Activity interval in seconds')
+    parser.add_argument('--duration', type=int, help='Total duration in seconds')
+    parser.add_argument('--method', choices=['keyboard', 'mouse'], help='Activity method')
+    parser.add_argument('--detect-inactivity', action='store_true', help='Skip heartbeats while the user is active')
+    parser.add_argument('--dry-run', action='store_true', help='Do not inject input')
+    parser.add_argument('--log', type=str, metavar='PATH', help='Append one line per heartbeat to PATH')
+    parser.add_argument('--seed', type=int, help='Seed for interval jitter and jiggle offsets')
+    parser.add_argument('--simulate', type=float, metavar='DAYS', help='Run DAYS of heartbeats instantly on a virtual clock (implies --dry-run) and report memory')
+    args = parser.parse_args(argv)
+
+    config = {}
+    if os.path.exists(args.config):
+        try:
+            with open(args.config, 'r') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: could not read {args.config}: {e}", file=sys.stderr)
+            return 1
+    config.setdefault('activity_interval', 120)
+    config.setdefault('total_duration', 18000)
+    if args.interval:
+        config['activity_interval'] = args.interval
+    if args.duration:
+        config['total_duration'] = args.duration
+    if args.method:
+        config['method'] = args.method
+    if args.detect_inactivity:
+        config['inactivity_detection_enabled'] = True
+    if args.simulate:
+        config['total_duration'] = args.simulate * 86400
+    error = check_config(config)
+    if error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+
+    log_file = open(args.log, 'a', buffering=1) if args.log else None
+
+    def log(message: str) -> None:
+        line = f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}"
+        print(line, flush=True)
+        if log_file is not None:
+            log_file.write(line + "\n")
+
+    clock, sleep, idle_source = time.time, None, None
+    if args.simulate:
+        clock = VirtualClock(time.time())
+        sleep = clock.sleep
+        injector = DryRunInjector()
+    elif args.dry_run:
+        injector = DryRunInjector()
+    else:
+        try:
+            injector = SendInputInjector()
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    if config.get('inactivity_detection_enabled') and sys.platform == 'win32' and not args.simulate:
+        idle_source = get_idle_seconds
+
+    rng = keeper_random.RandomStream(args.seed, block_size=64, use_numpy=False)
+    keeper = MinimalKeeper(config, injector, idle_source, clock, sleep, rng, log if not args.simulate else (lambda message: None))
+    signal.signal(signal.SIGTERM, lambda signum, frame: keeper.stop())
+
+    log(f"Minimal keeper started: {keeper.method} every {keeper.interval}s "
+        f"for {int(keeper.duration)}s{' (dry run)' if args.dry_run or args.simulate else ''}, seed {rng.seed}")
+    stay_awake = not args.simulate and not args.dry_run and set_stay_awake(True)
+    try:
+        keeper.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if stay_awake:
+            set_stay_awake(False)
+        stats = keeper.stats()
+        log(f"Minimal keeper finished: {stats['heartbeats']} heartbeats, {stats['skipped_user_active']} skipped "
+            f"(user active), peak RSS {_megabytes(stats['peak_rss_bytes'])}")
+        if log_file is not None:
+            log_file.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
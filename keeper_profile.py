@@ -0,0 +1,107 @@
+"""Profiling harness behind `activity_keeper.py --profile-run`.
+
+Runs a callable under cProfile while a background thread takes periodic
+tracemalloc snapshots. When the callable returns (or exits), it writes
+into the output directory:
+
+    keeper_<stamp>.pstats          cProfile data for pstats/snakeviz
+    keeper_<stamp>_pstats.txt      top functions by cumulative time
+    keeper_<stamp>_memory.csv      traced memory at every snapshot
+    keeper_<stamp>_alloc_diff.txt  top-N allocation growth, first vs last snapshot
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+TRACEMALLOC_FRAMES = 5
+
+
+class MemorySampler:
+    """Take a tracemalloc snapshot every `interval` seconds in a daemon thread.
+
+    Only the first and the latest snapshot are kept, so memory use stays flat
+    however long the session runs.
+    """
+
+    def __init__(self, interval: float, timeline_path: str) -> None:
+        self.interval = interval
+        self.timeline_path = timeline_path
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.latest: Optional[tracemalloc.Snapshot] = None
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def take(self) -> None:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            if self.baseline is None:
+                self.baseline = snapshot
+            self.latest = snapshot
+            self.samples += 1
+            with open(self.timeline_path, 'a', encoding='utf-8') as f:
+                f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')},{current},{peak}\n")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.take()
+
+    def start(self) -> None:
+        with open(self.timeline_path, 'w', encoding='utf-8') as f:
+            f.write("time,traced_bytes,peak_traced_bytes\n")
+        self.take()
+        self._thread = threading.Thread(target=self._run, name="keeper-memory-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self.take()
+
+
+def write_allocation_diff(baseline: tracemalloc.Snapshot, latest: tracemalloc.Snapshot, path: str, top_n: int) -> None:
+    """Write the `top_n` source lines whose allocations grew the most."""
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+    stats = latest.filter_traces(ignore).compare_to(baseline.filter_traces(ignore), 'lineno')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"Top {top_n} allocation sites by growth (first vs last snapshot)\n\n")
+        for stat in stats[:top_n]:
+            f.write(f"{stat}\n")
+
+
+def run_profiled(func: Callable[[], object], output_dir: str, snapshot_interval: float = 600.0, top_n: int = 25) -> object:
+    """Call func() under cProfile and tracemalloc and write the reports on the way out."""
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, time.strftime("keeper_%Y%m%d_%H%M%S"))
+
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    sampler = MemorySampler(snapshot_interval, f"{prefix}_memory.csv")
+    sampler.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        sampler.stop()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f"{prefix}.pstats")
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(top_n)
+        with open(f"{prefix}_pstats.txt", 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        write_allocation_diff(sampler.baseline, sampler.latest, f"{prefix}_alloc_diff.txt", top_n)
+        print(f"Profile written to {prefix}.pstats ({sampler.samples} memory snapshots)")
@@ -0,0 +1,124 @@
+"""Seeded random stream shared by the keeper, mouse_automation and trajectories.
+
+Every random decision (heartbeat jitter, jiggle offsets, method choice,
+click jitter and durations, trajectory shapes) draws from one RandomStream,
+so a session started with the same seed makes the same decisions. The seed
+is logged at startup; pass it back with --seed to replay a session.
+
+Uniform doubles are generated BLOCK_SIZE at a time and every other value
+(randint, uniform, choice, gauss, getrandbits) is derived from them. With
+NumPy installed, blocks come from a NumPy Mersenne Twister loaded with the
+state of random.Random(seed). This produces the same doubles as the pure
+Python fallback, so a seed replays identically whether or not NumPy is
+installed. NumPy is only imported when the first stream is created.
+"""
+import importlib.util
+import math
+import os
+import random
+import threading
+from typing import Optional, Sequence
+
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+BLOCK_SIZE = 1024
+
+
+def new_seed() -> int:
+    """Fresh seed from the OS entropy source."""
+    return int.from_bytes(os.urandom(8), 'little') >> 1
+
+
+class RandomStream:
+    """random-module compatible subset backed by pre-generated blocks of doubles.
+
+    Thread-safe: the heartbeat loop and the click plan job draw from it
+    concurrently. Only draws made in the same order repeat exactly, so a
+    job that runs on its own thread should use spawn().
+    """
+
+    def __init__(self, seed: Optional[int] = None, block_size: int = BLOCK_SIZE, use_numpy: Optional[bool] = None) -> None:
+        self.seed = new_seed() if seed is None else int(seed)
+        self.block_size = block_size
+        self.drawn = 0  # Values consumed so far
+        self.blocks = 0  # Blocks generated so far
+        self._python = random.Random(self.seed)
+        self._numpy = None
+        if NUMPY_AVAILABLE if use_numpy is None else use_numpy:
+            import numpy as np
+            state = self._python.getstate()[1]
+            self._numpy = np.random.RandomState()
+            self._numpy.set_state(('MT19937', np.array(state[:624], dtype=np.uint32), state[624]))
+        self._block: list = []
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        if self._numpy is not None:
+            block = self._numpy.random_sample(self.block_size).tolist()
+        else:
+            draw = self._python.random
+            block = [draw() for _ in range(self.block_size)]
+        block.reverse()  # pop() from the end keeps generation order
+        self._block = block
+        self.blocks += 1
+
+    def random(self) -> float:
+        """Next double in [0, 1)."""
+        with self._lock:
+            if not self._block:
+                self._refill()
+            self.drawn += 1
+            return self._block.pop()
+
+    def uniform(self, a: float, b: float) -> float:
+        return a + (b - a) * self.random()
+
+    def randint(self, a: int, b: int) -> int:
+        """Integer in [a, b], both ends included."""
+        span = b - a + 1
+        return a + min(int(self.random() * span), span - 1)
+
+    def choice(self, seq: Sequence):
+        return seq[self.randint(0, len(seq) - 1)]
+
+    def gauss(self, mu: float = 0.0, sigma: float = 1.0) -> float:
+        """Normal variate (Box-Muller, one variate per two draws)."""
+        u1 = 1.0 - self.random()  # (0, 1]: log() stays finite
+        u2 = self.random()
+        return mu + sigma * math.sqrt(-2.0 * math.log(u1)) * math.cos(2.0 * math.pi * u2)
+
+    def getrandbits(self, k: int) -> int:
+        """Integer with k random bits, 32 bits per draw."""
+        value = 0
+        for _ in range((k + 31) // 32):
+            value = (value << 32) | int(self.random() * 4294967296.0)
+        return value >> (-k % 32)
+
+    def spawn(self, name: str) -> "RandomStream":
+        """Independent stream whose seed is derived from this seed and name."""
+        return RandomStream(random.Random(f"{self.seed}:{name}").getrandbits(63), self.block_size, self._numpy is not None)
+
+    def stats(self) -> dict:
+        return {
+            "seed": self.seed,
+            "backend": "numpy" if self._numpy is not None else "python",
+            "drawn": self.drawn,
+            "blocks": self.blocks,
+        }
+
+
+_STREAM: Optional[RandomStream] = None
+
+
+def configure(seed: Optional[int] = None) -> RandomStream:
+    """Replace the process-wide stream with one for seed (a fresh seed when None)."""
+    global _STREAM
+    _STREAM = RandomStream(seed)
+    return _STREAM
+
+
+def get_stream() -> RandomStream:
+    """Process-wide stream; created with a fresh seed on first use."""
+    if _STREAM is None:
+        return configure()
+    return _STREAM
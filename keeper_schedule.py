@@ -0,0 +1,444 @@
+"""Work schedule compiled into a sorted interval index.
+
+A schedule is built from:
+
+    schedule_windows     [{"days": [1, 2, 3, 4, 5], "start": "09:00", "end": "12:00"}, ...]
+                         (defaults to work_days + work_hours_start/work_hours_end)
+    schedule_exceptions  [{"date": "2026-12-24", "windows": [{"start": "09:00", "end": "12:00"}]},
+                          {"date": "2026-12-27", "until": "2026-12-31", "off": true}, ...]
+    holiday_calendars    ["holidays.ics", ...]  all-day events are days off,
+                         timed events block their exact time range
+
+    schedule_timezone    "Europe/Berlin"  IANA zone the times are in (default: system local time)
+
+A window whose end is not after its start runs past midnight
+(22:00-06:00); it belongs to the day it starts on, for both `days` and
+exceptions. Start and end are wall-clock times in the schedule's zone, so
+a window keeps its local hours across DST changes. A time that does not
+exist (skipped by a spring-forward change) moves forward by the gap, and
+an ambiguous one (repeated at fall-back) means its first occurrence.
+
+Everything is expanded into merged [start, end) Unix-time intervals for
+the next HORIZON_DAYS days, stored in two sorted arrays. DST is resolved
+while expanding, so queries are a single bisect with no time-zone math,
+and thousands of calendar entries cost nothing per check.
+Days are weekday numbers 1=Monday ... 7=Sunday.
+"""
+import json
+import logging
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, time as dtime, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+HORIZON_DAYS = 366
+YEARLY_RULE_PARTS = {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL'}  # Everything else (BYDAY, BYMONTH, ...) is unsupported
+
+logger = logging.getLogger(__name__)
+REBUILD_MARGIN = 7 * 86400  # Recompile when a query gets this close to the horizon
+
+SCHEDULE_KEYS = (
+    'work_hours_start',
+    'work_hours_end',
+    'work_days',
+    'schedule_windows',
+    'schedule_exceptions',
+    'holiday_calendars',
+    'schedule_timezone',
+)
+
+Window = Tuple[int, int]  # (start minute, end minute) from midnight of the start day; end may exceed 24:00
+
+
+class ScheduleError(ValueError):
+    """Invalid schedule configuration or calendar file; errors lists every problem found."""
+
+    def __init__(self, message: str, errors: Optional[List[str]] = None) -> None:
+        super().__init__(message)
+        self.errors = errors or [message]
+
+
+def parse_minutes(value: str) -> int:
+    """Convert 'HH:MM' (00:00-24:00) to minutes after midnight."""
+    try:
+        hours, minutes = value.split(':')
+        total = int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        raise ScheduleError(f"time must be in HH:MM format (e.g., '09:00'), got {value!r}")
+    if not (0 <= int(minutes) < 60 and 0 <= total <= 24 * 60):
+        raise ScheduleError(f"time out of range: {value!r}")
+    return total
+
+
+def _parse_window(spec: dict, where: str, errors: List[str]) -> Optional[Window]:
+    """Parse {"start", "end"}; problems go to errors with their key path and None is returned."""
+    if not isinstance(spec, dict):
+        errors.append(f"{where}: must be an object")
+        return None
+    bounds = []
+    for key in ('start', 'end'):
+        try:
+            bounds.append(parse_minutes(spec.get(key, '')))
+        except ScheduleError as e:
+            errors.append(f"{where}.{key}: {e}")
+    if len(bounds) < 2:
+        return None
+    start, end = bounds
+    if start == 24 * 60:
+        errors.append(f"{where}.start: must be before 24:00")
+        return None
+    if end <= start:
+        end += 24 * 60  # Overnight window (equal start and end means a full 24 hours)
+    return start, end
+
+
+def load_timezone(name: Optional[str]) -> Optional[tzinfo]:
+    """Return the ZoneInfo for an IANA name, or None for system local time."""
+    if not name:
+        return None
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except (ImportError, ValueError, KeyError) as e:
+        raise ScheduleError(f"unknown schedule_timezone {name!r} ({e}); on Windows, pip install tzdata")
+
+
+def _parse_date(value: str, where: str, errors: List[str]) -> Optional[date]:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        errors.append(f"{where}: date must be YYYY-MM-DD, got {value!r}")
+        return None
+
+
+# --- iCalendar import ---------------------------------------------------
+
+def _unfold_ics(text: str) -> Iterable[str]:
+    """Yield logical lines, joining RFC 5545 continuation lines."""
+    current = None
+    for raw in text.splitlines():
+        if raw.startswith((' ', '\t')) and current is not None:
+            current += raw[1:]
+            continue
+        if current is not None:
+            yield current
+        current = raw
+    if current is not None:
+        yield current
+
+
+def _parse_ics_value(params: Dict[str, str], value: str, tz: Optional[tzinfo] = None):
+    """Return a date for all-day values or a Unix timestamp for date-times."""
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value, '%Y%m%d').date()
+    if value.endswith('Z'):
+        return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc).timestamp()
+    moment = datetime.strptime(value, '%Y%m%dT%H%M%S')
+    if 'TZID' in params:
+        from zoneinfo import ZoneInfo
+        moment = moment.replace(tzinfo=ZoneInfo(params['TZID']))
+    elif tz is not None:
+        moment = moment.replace(tzinfo=tz)  # Floating times are in the schedule's zone
+    return moment.timestamp()
+
+
+def _yearly(first, rule: Dict[str, str], until_year: int) -> List:
+    """Expand FREQ=YEARLY occurrences of `first` (a date) up to until_year."""
+    if rule.get('FREQ') != 'YEARLY' or not isinstance(first, date):
+        return [first]
+    interval = int(rule.get('INTERVAL', 1))
+    count = int(rule['COUNT']) if 'COUNT' in rule else None
+    last = datetime.strptime(rule['UNTIL'][:8], '%Y%m%d').date() if 'UNTIL' in rule else None
+    occurrences = []
+    year = first.year
+    while year <= until_year and (count is None or len(occurrences) < count):
+        try:
+            occurrence = first.replace(year=year)
+        except ValueError:
+            occurrence = None  # 29 February in a non-leap year
+        if occurrence is not None:
+            if last is not None and occurrence > last:
+                break
+            occurrences.append(occurrence)
+        year += interval
+    return occurrences
+
+
+def load_ics(path: str, until_year: Optional[int] = None, tz: Optional[tzinfo] = None) -> Tuple[Set[date], List[Tuple[float, float]]]:
+    """Read a local .ics file into (days off, blocked [start, end) timestamps).
+
+    Supports the subset used by holiday calendars: VEVENTs with DATE or
+    DATE-TIME start/end and same-date yearly recurrence of all-day events
+    (RRULE:FREQ=YEARLY with INTERVAL, COUNT or UNTIL). Any other rule, such
+    as "4th Thursday of November" (BYDAY, BYMONTH), or a rule on a timed
+    event is logged and ignored: only its first occurrence is used. Floating
+    date-times are read in `tz` (system local time if None).
+    """
+    until_year = until_year or date.today().year + 2
+    try:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            text = f.read()
+    except OSError as e:
+        raise ScheduleError(f"cannot read calendar {path}: {e}")
+
+    off_days: Set[date] = set()
+    blocked: List[Tuple[float, float]] = []
+    event = None
+    for line in _unfold_ics(text):
+        if line == 'BEGIN:VEVENT':
+            event = {}
+            continue
+        if line == 'END:VEVENT':
+            if event and 'DTSTART' in event:
+                _add_event(event, off_days, blocked, until_year, path)
+            event = None
+            continue
+        if event is None or ':' not in line:
+            continue
+        head, value = line.split(':', 1)
+        name, *raw_params = head.split(';')
+        params = dict(p.split('=', 1) for p in raw_params if '=' in p)
+        try:
+            if name in ('DTSTART', 'DTEND'):
+                event[name] = _parse_ics_value(params, value.strip(), tz)
+            elif name == 'RRULE':
+                event[name] = dict(p.split('=', 1) for p in value.strip().split(';') if '=' in p)
+                event['RRULE_TEXT'] = value.strip()
+            elif name == 'SUMMARY':
+                event[name] = value.strip()
+        except (ValueError, KeyError) as e:
+            raise ScheduleError(f"{path}: cannot parse {name}:{value.strip()} ({e})")
+    return off_days, blocked
+
+
+def _add_event(event: dict, off_days: Set[date], blocked: List[Tuple[float, float]], until_year: int, path: str) -> None:
+    start = event['DTSTART']
+    end = event.get('DTEND')
+    rule = event.get('RRULE', {})
+    if rule and (rule.get('FREQ') != 'YEARLY' or set(rule) - YEARLY_RULE_PARTS or not isinstance(start, date)):
+        logger.warning(f"{path}: {event.get('SUMMARY', 'event')!r} has an unsupported recurrence "
+                       f"(RRULE:{event['RRULE_TEXT']}); only its first occurrence is used")
+        rule = {}
+    if isinstance(start, date):
+        span = (end - start).days if isinstance(end, date) and end > start else 1
+        for first in _yearly(start, rule, until_year):
+            off_days.update(first + timedelta(days=i) for i in range(span))
+    else:
+        blocked.append((start, end if isinstance(end, float) and end > start else start))
+
+
+# --- Compiled schedule ----------------------------------------------------
+
+class Schedule:
+    """Merged activity intervals for [built_from, built_until), indexed by start time."""
+
+    def __init__(
+        self,
+        windows: List[Tuple[Set[int], Window]],
+        exceptions: Optional[Dict[date, List[Window]]] = None,
+        off_days: Iterable[date] = (),
+        blocked: Iterable[Tuple[float, float]] = (),
+        horizon_days: int = HORIZON_DAYS,
+        tz: Optional[tzinfo] = None,
+    ) -> None:
+        self.windows = windows
+        self.exceptions = exceptions or {}
+        self.off_days = set(off_days)
+        self.blocked = sorted(blocked)
+        self.horizon_days = horizon_days
+        self.tz = tz  # None means system local time
+        self.starts = array('d')
+        self.ends = array('d')
+        self.built_from = self.built_until = 0.0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Schedule":
+        """Compile the schedule keys of config; raises one ScheduleError listing every problem."""
+        errors: List[str] = []
+        tz = None
+        try:
+            tz = load_timezone(config.get('schedule_timezone'))
+        except ScheduleError as e:
+            errors.append(f"schedule_timezone: {e}")
+
+        windows = []
+        if 'schedule_windows' in config:
+            for i, spec in enumerate(config['schedule_windows']):
+                where = f"schedule_windows[{i}]"
+                if not isinstance(spec, dict):
+                    errors.append(f"{where}: must be an object")
+                    continue
+                days = spec.get('days', config.get('work_days', [1, 2, 3, 4, 5]))
+                days_ok = isinstance(days, list) and days and all(isinstance(d, int) and 1 <= d <= 7 for d in days)
+                if not days_ok:
+                    errors.append(f"{where}.days: must be a list of numbers 1-7 (1=Monday, 7=Sunday)")
+                window = _parse_window(spec, where, errors)
+                if days_ok and window is not None:
+                    windows.append((set(days), window))
+        else:
+            days = config.get('work_days', [1, 2, 3, 4, 5])
+            window = _parse_window(
+                {'start': config.get('work_hours_start', '09:00'), 'end': config.get('work_hours_end', '17:00')},
+                "work_hours",
+                errors,
+            )
+            if window is not None:
+                windows = [(set(days), window)]
+
+        exceptions: Dict[date, List[Window]] = {}
+        for i, spec in enumerate(config.get('schedule_exceptions', [])):
+            where = f"schedule_exceptions[{i}]"
+            if not isinstance(spec, dict):
+                errors.append(f"{where}: must be an object")
+                continue
+            first = _parse_date(spec.get('date'), f"{where}.date", errors)
+            last = _parse_date(spec['until'], f"{where}.until", errors) if 'until' in spec else first
+            if first is not None and last is not None and last < first:
+                errors.append(f"{where}.until: must not be before date")
+                continue
+            if spec.get('off', False):
+                day_windows = []
+            else:
+                parsed = [_parse_window(w, f"{where}.windows[{j}]", errors) for j, w in enumerate(spec.get('windows', []))]
+                day_windows = [window for window in parsed if window is not None]
+            if first is None or last is None:
+                continue
+            for offset in range((last - first).days + 1):
+                exceptions[first + timedelta(days=offset)] = day_windows
+
+        off_days: Set[date] = set()
+        blocked: List[Tuple[float, float]] = []
+        for path in config.get('holiday_calendars', []):
+            try:
+                calendar_off, calendar_blocked = load_ics(path, tz=tz)
+            except ScheduleError as e:
+                errors.append(str(e))
+                continue
+            off_days |= calendar_off
+            blocked.extend(calendar_blocked)
+
+        if errors:
+            raise ScheduleError("; ".join(errors), errors)
+        return cls(windows, exceptions, off_days, blocked, tz=tz)
+
+    def _windows_on(self, day: date) -> List[Window]:
+        if day in self.exceptions:
+            return self.exceptions[day]  # Explicit exceptions win over calendar holidays
+        if day in self.off_days:
+            return []
+        weekday = day.isoweekday()
+        return [window for days, window in self.windows if weekday in days]
+
+    def _timestamp(self, day: date, minutes: int) -> float:
+        """Unix time of wall-clock `minutes` after midnight of `day` in the schedule's zone."""
+        day += timedelta(days=minutes // (24 * 60))
+        minutes %= 24 * 60
+        return datetime.combine(day, dtime(minutes // 60, minutes % 60), tzinfo=self.tz).timestamp()
+
+    def build(self, now: Optional[float] = None) -> None:
+        """Expand the schedule from the day before `now` to horizon_days ahead."""
+        now = time.time() if now is None else now
+        first_day = datetime.fromtimestamp(now, self.tz).date() - timedelta(days=1)  # Yesterday's overnight window may still run
+        intervals = []
+        for offset in range(self.horizon_days + 1):
+            day = first_day + timedelta(days=offset)
+            for start, end in self._windows_on(day):
+                intervals.append((self._timestamp(day, start), self._timestamp(day, end)))
+        intervals.sort()
+
+        merged: List[List[float]] = []
+        for start, end in intervals:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self.starts = array('d')
+        self.ends = array('d')
+        for start, end in _subtract(merged, self.blocked):
+            self.starts.append(start)
+            self.ends.append(end)
+        self.built_from = self._timestamp(first_day, 0)
+        self.built_until = self._timestamp(first_day + timedelta(days=self.horizon_days + 1), 0)
+
+    def _ensure(self, now: float) -> None:
+        if not (self.built_from <= now < self.built_until - REBUILD_MARGIN):
+            self.build(now)
+
+    def _index(self, now: float) -> int:
+        """Index of the last interval starting at or before now (-1 if none)."""
+        self._ensure(now)
+        return bisect_right(self.starts, now) - 1
+
+    def is_active(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        i = self._index(now)
+        return i >= 0 and now < self.ends[i]
+
+    def current_end(self, now: Optional[float] = None) -> Optional[float]:
+        """End of the interval containing now, or None outside the schedule."""
+        now = time.time() if now is None else now
+        i = self._index(now)
+        if i >= 0 and now < self.ends[i]:
+            return self.ends[i]
+        return None
+
+    def next_start(self, now: Optional[float] = None) -> Optional[float]:
+        """now if inside the schedule, else the next interval start (None if none within the horizon)."""
+        now = time.time() if now is None else now
+        i = self._index(now)
+        if i >= 0 and now < self.ends[i]:
+            return now
+        if i + 1 < len(self.starts):
+            return self.starts[i + 1]
+        return None
+
+
+def _subtract(intervals: List[List[float]], blocked: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Remove sorted blocked ranges from sorted, non-overlapping intervals."""
+    result = []
+    j = 0
+    for start, end in intervals:
+        while j < len(blocked) and blocked[j][1] <= start:
+            j += 1
+        k = j
+        while start < end and k < len(blocked) and blocked[k][0] < end:
+            block_start, block_end = blocked[k]
+            if block_start > start:
+                result.append((start, block_start))
+            start = max(start, block_end)
+            k += 1
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+_cache_key: Optional[str] = None
+_cache: Optional[Schedule] = None
+
+
+def get_schedule(config: dict) -> Schedule:
+    """Return the compiled schedule for config, recompiling only when its schedule keys change."""
+    global _cache_key, _cache
+    key = json.dumps([config.get(k) for k in SCHEDULE_KEYS], sort_keys=True, default=str)
+    if _cache is None or key != _cache_key:
+        _cache = Schedule.from_config(config)
+        _cache_key = key
+    return _cache
+
+
+def invalidate_schedule_cache() -> None:
+    """Force the next get_schedule() to recompile (e.g. calendar files changed)."""
+    global _cache_key, _cache
+    _cache_key = None
+    _cache = None
+
+
+def validate_schedule(config: dict) -> Optional[str]:
+    """Return an error message for an invalid schedule configuration, or None."""
+    try:
+        Schedule.from_config(config)
+    except ScheduleError as e:
+        return "\n".join(f"Error: {error}" for error in e.errors)
+    return None
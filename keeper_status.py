@@ -0,0 +1,165 @@
+"""Fixed-layout keeper status record in a memory-mapped file.
+
+The keeper rewrites the record in place whenever its state changes.
+Readers map the same file and poll it without IPC, parsing or locks; a
+seqlock counter tells them when they raced a write:
+
+    offset  type  field
+    0       4s    magic b"AKST"
+    4       H     layout version
+    6       H     reserved
+    8       Q     seq (odd while a write is in progress)
+    16      B     state (see STATES)
+    17      B     schedule state (see SCHEDULE_STATES)
+    18      H     flags (FLAG_*)
+    20      I     keeper pid
+    24      Q     jiggles since the run started
+    32      d     next heartbeat (Unix time, 0 if none)
+    40      d     last heartbeat (Unix time, 0 if none)
+    48      d     schedule resumes at (Unix time, 0 if not waiting)
+    56      d     record updated at (Unix time)
+
+All fields are little-endian. A reader copies the record, then accepts it
+only if seq was even and unchanged across the copy.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Optional
+
+MAGIC = b"AKST"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sHHQ")
+BODY = struct.Struct("<BBHIQdddd")
+SEQ_OFFSET = 8
+BODY_OFFSET = HEADER.size
+RECORD_SIZE = HEADER.size + BODY.size
+
+STATES = ("stopped", "running", "paused", "waiting")
+SCHEDULE_STATES = ("disabled", "active", "ending", "waiting")
+FLAG_AUTO_PAUSED = 0x1
+FLAG_DRY_RUN = 0x2
+
+
+def default_path() -> str:
+    """Return the per-user default status file path."""
+    if os.name == 'nt':
+        return os.path.join(tempfile.gettempdir(), "activity_keeper.status")
+    return os.path.join(tempfile.gettempdir(), f"activity_keeper-{os.getuid()}.status")
+
+
+class StatusPage:
+    """Writer side of the status record. Only one writer process per file."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or default_path()
+        self._file = open(self.path, 'a+b')
+        self._file.truncate(RECORD_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), RECORD_SIZE)
+        self._seq = 0
+        self._last_body: Optional[tuple] = None
+        self._lock = threading.Lock()  # Keeps the seqlock single-writer across threads
+        self._map[:HEADER.size] = HEADER.pack(MAGIC, LAYOUT_VERSION, 0, self._seq)
+
+    def publish(
+        self,
+        state: str,
+        schedule_state: str = "disabled",
+        jiggles: int = 0,
+        next_heartbeat_at: Optional[float] = None,
+        last_heartbeat_at: Optional[float] = None,
+        resumes_at: Optional[float] = None,
+        auto_paused: bool = False,
+        dry_run: bool = False,
+    ) -> bool:
+        """Write the record if anything changed. Returns True if it was written."""
+        flags = (FLAG_AUTO_PAUSED if auto_paused else 0) | (FLAG_DRY_RUN if dry_run else 0)
+        key = (
+            STATES.index(state),
+            SCHEDULE_STATES.index(schedule_state),
+            flags,
+            jiggles,
+            next_heartbeat_at or 0.0,
+            last_heartbeat_at or 0.0,
+            resumes_at or 0.0,
+        )
+        with self._lock:
+            if key == self._last_body or self._map.closed:
+                return False
+            self._last_body = key
+
+            body = BODY.pack(key[0], key[1], key[2], os.getpid(), *key[3:], time.time())
+            self._seq += 1  # Odd: readers retry
+            struct.pack_into("<Q", self._map, SEQ_OFFSET, self._seq)
+            self._map[BODY_OFFSET:RECORD_SIZE] = body
+            self._seq += 1  # Even: record consistent again
+            struct.pack_into("<Q", self._map, SEQ_OFFSET, self._seq)
+            return True
+
+    def close(self) -> None:
+        """Unmap the file. The last record stays readable on disk."""
+        with self._lock:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+
+
+def read_status(path: Optional[str] = None, retries: int = 100) -> Optional[dict]:
+    """Read a consistent copy of the status record, or None if it is missing or invalid."""
+    path = path or default_path()
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), RECORD_SIZE, access=mmap.ACCESS_READ) as view:
+                return decode_record(view, retries)
+    except (OSError, ValueError):
+        return None
+
+
+def decode_record(view, retries: int = 100) -> Optional[dict]:
+    """Decode a mapped status record using the seqlock protocol."""
+    for _ in range(retries):
+        magic, layout, _, seq_before = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            return None
+        if seq_before & 1:
+            continue
+        fields = BODY.unpack_from(view, BODY_OFFSET)
+        (seq_after,) = struct.unpack_from("<Q", view, SEQ_OFFSET)
+        if seq_after != seq_before:
+            continue
+
+        state, schedule_state, flags, pid, jiggles, next_hb, last_hb, resumes, updated = fields
+        return {
+            "seq": seq_before,
+            "state": STATES[state],
+            "schedule_state": SCHEDULE_STATES[schedule_state],
+            "auto_paused": bool(flags & FLAG_AUTO_PAUSED),
+            "dry_run": bool(flags & FLAG_DRY_RUN),
+            "pid": pid,
+            "jiggles": jiggles,
+            "next_heartbeat_at": next_hb or None,
+            "last_heartbeat_at": last_hb or None,
+            "resumes_at": resumes or None,
+            "updated_at": updated,
+        }
+    return None
+
+
+def main(argv: Optional[list] = None) -> int:
+    """`status` subcommand: print the status record as JSON."""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(prog="activity_keeper.py status", description="Read the keeper status file")
+    parser.add_argument('--file', type=str, help=f'Status file (default: {default_path()})')
+    args = parser.parse_args(argv)
+
+    record = read_status(args.file)
+    if record is None:
+        print(f"Error: no valid status record at {args.file or default_path()}")
+        return 1
+    print(json.dumps(record, indent=2))
+    return 0
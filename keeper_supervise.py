@@ -0,0 +1,279 @@
+"""`supervise` subcommand: run the keeper as a child process and restart it.
+
+A child that exits with status 0 (duration finished, stopped, outside the
+schedule) ends supervision. Any other exit is a crash: the child is
+restarted after an exponential backoff that resets once a run lasts
+`stable_after` seconds, and supervision gives up when `crash_limit`
+crashes happen within `crash_window` seconds.
+
+SIGINT and SIGTERM are forwarded to the child and stop supervision; SIGHUP
+is forwarded as a config reload. The child gets `stop_grace` seconds to shut
+down cleanly (exit stats, checkpoint) before it is terminated. On Windows
+the child runs in its own process group and is stopped with
+CTRL_BREAK_EVENT, which the keeper handles like SIGTERM. On Linux children are forked from a
+multiprocessing fork server that has already imported the keeper modules,
+so a restart does not pay for interpreter startup and imports again.
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+PRELOAD_MODULES = [
+    "activity_keeper",
+    "keeper_checkpoint",
+    "keeper_control",
+    "keeper_history",
+    "keeper_metrics",
+    "keeper_status",
+    "keeper_trace",
+]
+KEEPER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "activity_keeper.py")
+
+
+def _log(message: str) -> None:
+    print(f"[supervise {time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+class SubprocessChild:
+    """Keeper started as a fresh interpreter (`python activity_keeper.py ...`)."""
+
+    def __init__(self, argv: List[str]) -> None:
+        # Own process group on Windows, so CTRL_BREAK_EVENT can reach the child without the supervisor
+        flags = subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0
+        self._process = subprocess.Popen([sys.executable, KEEPER_SCRIPT, *argv], creationflags=flags)
+        self.pid = self._process.pid
+
+    def poll(self) -> Optional[int]:
+        return self._process.poll()
+
+    def wait(self, timeout: float) -> Optional[int]:
+        try:
+            return self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def send_signal(self, signum: int) -> None:
+        if os.name == 'nt':
+            if signum not in (signal.SIGINT, signal.SIGTERM):
+                return  # No console event for SIGHUP; use `ctl reload`
+            signum = signal.CTRL_BREAK_EVENT  # Windows delivers only console events to other processes
+        try:
+            self._process.send_signal(signum)
+        except OSError:
+            pass  # Already exited
+
+    def terminate(self) -> None:
+        self._process.terminate()
+
+
+def _run_keeper_child(argv: List[str]) -> None:
+    import activity_keeper
+    activity_keeper.main(argv)
+
+
+class ForkServerChild:
+    """Keeper forked from a fork server with PRELOAD_MODULES already imported."""
+
+    _context = None
+
+    def __init__(self, argv: List[str]) -> None:
+        if ForkServerChild._context is None:
+            import multiprocessing
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(PRELOAD_MODULES)
+            ForkServerChild._context = context
+        self._process = ForkServerChild._context.Process(target=_run_keeper_child, args=(argv,), name="activity-keeper")
+        self._process.start()
+        self.pid = self._process.pid
+
+    def poll(self) -> Optional[int]:
+        return self._process.exitcode
+
+    def wait(self, timeout: float) -> Optional[int]:
+        self._process.join(timeout)
+        return self._process.exitcode
+
+    def send_signal(self, signum: int) -> None:
+        try:
+            os.kill(self.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self) -> None:
+        self._process.kill()
+
+
+def default_launcher() -> Callable[[List[str]], object]:
+    """Fork server where the platform has one (Linux), a fresh interpreter elsewhere."""
+    import multiprocessing
+    if sys.platform.startswith("linux") and "forkserver" in multiprocessing.get_all_start_methods():
+        return ForkServerChild
+    return SubprocessChild
+
+
+class Supervisor:
+    """Restart loop around a child keeper.
+
+    launcher(argv) must return an object with pid, poll(), wait(timeout),
+    send_signal(signum) and terminate(); clock() returns monotonic seconds. Both can be
+    replaced with fakes to exercise the restart policy without processes.
+    """
+
+    def __init__(
+        self,
+        keeper_argv: List[str],
+        *,
+        launcher: Optional[Callable[[List[str]], object]] = None,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+        backoff_factor: float = 2.0,
+        stable_after: float = 30.0,
+        crash_limit: int = 5,
+        crash_window: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        poll_interval: float = 0.5,
+        stop_grace: float = 10.0,
+    ) -> None:
+        self.keeper_argv = list(keeper_argv)
+        self.launcher = launcher or default_launcher()
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.backoff_factor = backoff_factor
+        self.stable_after = stable_after
+        self.crash_limit = crash_limit
+        self.crash_window = crash_window
+        self.clock = clock
+        self.poll_interval = poll_interval
+        self.stop_grace = stop_grace  # Seconds a stopped child gets to shut down before terminate()
+        self.child = None
+        self.starts = 0
+        self.crashes = 0
+        self.exit_codes: List[int] = []
+        self._crash_times: deque = deque()
+        self._consecutive_crashes = 0
+        self._stop = threading.Event()
+        self._stop_requested_at: Optional[float] = None
+
+    def backoff_delay(self) -> float:
+        """Delay before the next restart, given the consecutive crash count."""
+        exponent = max(0, self._consecutive_crashes - 1)
+        return min(self.backoff_max, self.backoff_initial * self.backoff_factor ** exponent)
+
+    def forward_signal(self, signum: int) -> None:
+        """Pass a signal to the child; SIGINT/SIGTERM also end supervision."""
+        if signum in (signal.SIGINT, signal.SIGTERM):
+            if self._stop_requested_at is None:
+                self._stop_requested_at = self.clock()
+            self._stop.set()
+        child = self.child
+        if child is not None and child.poll() is None:
+            child.send_signal(signum)
+
+    def install_signal_handlers(self) -> None:
+        names = ["SIGINT", "SIGTERM", "SIGHUP"]
+        for name in names:
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), lambda signum, frame: self.forward_signal(signum))
+
+    def stop(self) -> None:
+        self.forward_signal(signal.SIGTERM)
+
+    def _wait_for_child(self, child) -> int:
+        terminated = False
+        while True:
+            code = child.wait(self.poll_interval)
+            if code is not None:
+                return code
+            stopping = self._stop_requested_at
+            if not terminated and stopping is not None and self.clock() - stopping >= self.stop_grace:
+                _log(f"Keeper did not stop within {self.stop_grace:g}s, terminating it")
+                child.terminate()
+                terminated = True
+
+    def run(self) -> int:
+        """Supervise until a clean child exit, a stop signal or a crash loop.
+
+        Returns 0 for a clean exit or a stop, 1 when a crash loop was detected.
+        """
+        while not self._stop.is_set():
+            launched_at = self.clock()
+            self.child = self.launcher(self.keeper_argv)
+            self.starts += 1
+            _log(f"Keeper started (pid {self.child.pid}, start #{self.starts})")
+
+            code = self._wait_for_child(self.child)
+            runtime = self.clock() - launched_at
+            self.child = None
+            self.exit_codes.append(code)
+
+            if self._stop.is_set():
+                _log(f"Keeper stopped (exit code {code})")
+                return 0
+            if code == 0:
+                _log("Keeper exited normally, supervision finished")
+                return 0
+
+            self.crashes += 1
+            now = self.clock()
+            self._crash_times.append(now)
+            while self._crash_times and now - self._crash_times[0] > self.crash_window:
+                self._crash_times.popleft()
+            if len(self._crash_times) >= self.crash_limit:
+                _log(f"Crash loop detected ({len(self._crash_times)} crashes within {self.crash_window:g}s), giving up")
+                return 1
+
+            if runtime >= self.stable_after:
+                self._consecutive_crashes = 0
+            self._consecutive_crashes += 1
+            delay = self.backoff_delay()
+            _log(f"Keeper exited with code {code} after {runtime:.1f}s, restarting in {delay:.1f}s")
+            if self._stop.wait(delay):
+                break
+        return 0
+
+
+def main(argv: Optional[list] = None) -> int:
+    """`supervise` subcommand entry point. Arguments after `--` go to the keeper."""
+    import argparse
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if "--" in argv:
+        split = argv.index("--")
+        own_args, keeper_args = argv[:split], argv[split + 1:]
+    else:
+        own_args, keeper_args = argv, []
+
+    parser = argparse.ArgumentParser(
+        prog="activity_keeper.py supervise",
+        description="Run the keeper as a child process and restart it when it crashes",
+        epilog="Keeper options follow '--', e.g.: supervise --crash-limit 3 -- --quiet --auto-restart",
+    )
+    parser.add_argument('--backoff-initial', type=float, default=1.0, metavar='SECONDS', help='Delay before the first restart (default: 1)')
+    parser.add_argument('--backoff-max', type=float, default=60.0, metavar='SECONDS', help='Upper bound for the restart delay (default: 60)')
+    parser.add_argument('--backoff-factor', type=float, default=2.0, help='Delay multiplier per consecutive crash (default: 2)')
+    parser.add_argument('--stable-after', type=float, default=30.0, metavar='SECONDS', help='A run this long resets the backoff (default: 30)')
+    parser.add_argument('--crash-limit', type=int, default=5, metavar='N', help='Give up after N crashes within --crash-window (default: 5)')
+    parser.add_argument('--crash-window', type=float, default=60.0, metavar='SECONDS', help='Window for crash-loop detection (default: 60)')
+    parser.add_argument('--stop-grace', type=float, default=10.0, metavar='SECONDS', help='Time a stopped keeper gets to shut down cleanly before it is terminated (default: 10)')
+    parser.add_argument('--mode', choices=['auto', 'forkserver', 'subprocess'], default='auto', help='How children are started (default: forkserver on Linux, subprocess elsewhere)')
+    args = parser.parse_args(own_args)
+
+    launchers = {"forkserver": ForkServerChild, "subprocess": SubprocessChild}
+    supervisor = Supervisor(
+        keeper_args,
+        launcher=launchers.get(args.mode),
+        backoff_initial=args.backoff_initial,
+        backoff_max=args.backoff_max,
+        backoff_factor=args.backoff_factor,
+        stable_after=args.stable_after,
+        crash_limit=args.crash_limit,
+        crash_window=args.crash_window,
+        stop_grace=args.stop_grace,
+    )
+    supervisor.install_signal_handlers()
+    return supervisor.run()
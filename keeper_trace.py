@@ -0,0 +1,126 @@
+"""Opt-in timeline tracer that writes Chrome trace-event JSON.
+
+Spans are kept as compact tuples in a fixed-size ring buffer, so a tracer
+left running for days only holds the most recent events. dump() writes
+them in the Chrome trace-event format, which Perfetto (ui.perfetto.dev)
+and chrome://tracing open directly.
+
+While tracing is disabled, span() returns a shared no-op context manager
+and @traced functions cost one extra call and a global check.
+"""
+import contextlib
+import functools
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+DEFAULT_CAPACITY = 100_000
+
+_tracer: Optional['Tracer'] = None
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """Ring buffer of completed spans and instant events."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        # (name, start_us, duration_us or None for instants, native thread id)
+        self._events = deque(maxlen=capacity)
+        self._threads = {}
+        self._origin = time.perf_counter()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _thread_id(self) -> int:
+        tid = threading.get_native_id()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        return tid
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            self._events.append((name, start, self._now_us() - start, self._thread_id()))
+
+    def instant(self, name: str) -> None:
+        self._events.append((name, self._now_us(), None, self._thread_id()))
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def to_chrome_trace(self) -> dict:
+        """Return the buffered events as a Chrome trace-event document."""
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self._threads.items())
+        ]
+        for name, start, duration, tid in list(self._events):
+            event = {"name": name, "cat": "keeper", "ts": round(start, 1), "pid": pid, "tid": tid}
+            if duration is None:
+                event.update(ph="i", s="t")
+            else:
+                event.update(ph="X", dur=round(duration, 1))
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str) -> int:
+        """Write the buffer to `path` as Chrome trace JSON. Returns the event count."""
+        import json
+
+        document = self.to_chrome_trace()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+        os.replace(tmp_path, path)
+        return len(document["traceEvents"])
+
+
+def enable(capacity: int = DEFAULT_CAPACITY) -> Tracer:
+    """Start recording into a new ring buffer."""
+    global _tracer
+    _tracer = Tracer(capacity)
+    return _tracer
+
+
+def disable() -> None:
+    global _tracer
+    _tracer = None
+
+
+def active() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str):
+    """Context manager timing a block; a shared no-op when tracing is off."""
+    tracer = _tracer  # Read once: disable() may clear the global from another thread
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name)
+
+
+def instant(name: str) -> None:
+    tracer = _tracer
+    if tracer is not None:
+        tracer.instant(name)
+
+
+def traced(func):
+    """Decorator recording every call of `func` as a span."""
+    name = func.__qualname__.replace(".<locals>", "")
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tracer = _tracer
+        if tracer is None:
+            return func(*args, **kwargs)
+        with tracer.span(name):
+            return func(*args, **kwargs)
+    return wrapper
@@ -1,22 +1,39 @@
-import pyautogui as pag
 import time
-import random
 import argparse
 import json
 import os
 import signal
 import sys
+from collections import namedtuple
+from contextlib import nullcontext
 
-# Enable pyautogui failsafe
-pag.FAILSAFE = True
+import keeper_random
 
-def randomize_position(x, y, jitter=3):
-    """Slightly randomize x and y coordinates to simulate human movement."""
-    return x + random.randint(-jitter, jitter), y + random.randint(-jitter, jitter)
+pag = None  # pyautogui module, loaded on first use by load_pyautogui()
 
-def randomize_duration(base_duration, variation=0.5):
+CLICK_TYPES = ('left', 'right', 'middle', 'double')
+
+def load_pyautogui():
+    """Import pyautogui on first use and enable its failsafe."""
+    global pag
+    if pag is None:
+        import pyautogui
+        pyautogui.FAILSAFE = True
+        pag = pyautogui
+    return pag
+
+def randomize_position(x, y, jitter=3, rng=None):
+    """Slightly randomize x and y coordinates to simulate human movement.
+
+    rng defaults to the shared keeper_random stream, like every rng argument here.
+    """
+    rng = rng or keeper_random.get_stream()
+    return x + rng.randint(-jitter, jitter), y + rng.randint(-jitter, jitter)
+
+def randomize_duration(base_duration, variation=0.5, rng=None):
     """Randomize duration to simulate human timing."""
-    return base_duration * random.uniform(1 - variation, 1 + variation)
+    rng = rng or keeper_random.get_stream()
+    return base_duration * rng.uniform(1 - variation, 1 + variation)
 
 def log(message, log_file=None):
     """Prints a timestamped message and optionally writes to file."""
@@ -50,36 +67,456 @@ def save_config(config, config_file='config.json'):
     with open(config_file, 'w') as f:
         json.dump(config, f, indent=4)
 
-def perform_click(x, y, click_type='left', duration=2.0, jitter=3, duration_variation=0.5, dry_run=False):
-    """Perform a mouse click with randomization."""
-    rx, ry = randomize_position(x, y, jitter)
-    rd = randomize_duration(duration, duration_variation)
-    if not dry_run:
-        pag.moveTo(rx, ry, duration=rd)
-        if click_type == 'left':
+# --- Input backends -------------------------------------------------------
+#
+# A backend has move_to(x, y, duration) and click(button).
+
+class PyAutoGuiBackend:
+    """Real mouse input through pyautogui; moves follow precomputed trajectories."""
+
+    def __init__(self, engine=None):
+        self.engine = engine  # mouse_trajectory.TrajectoryEngine; the shared one by default
+
+    def move_to(self, x, y, duration):
+        import mouse_trajectory
+        engine = self.engine or mouse_trajectory.get_engine()
+        self.move_path(engine.path(tuple(load_pyautogui().position()), (x, y), duration))
+
+    def move_path(self, path):
+        """Play a whole mouse_trajectory.Path in one call."""
+        import mouse_trajectory
+        pag = load_pyautogui()
+        mouse_trajectory.play_path(lambda x, y: pag.moveTo(x, y, _pause=False), path)
+
+    def click(self, button):
+        pag = load_pyautogui()
+        if button == 'left':
             pag.click()
-        elif click_type == 'right':
+        elif button == 'right':
             pag.rightClick()
-    else:
-        time.sleep(rd)  # Simulate the duration
+        elif button == 'middle':
+            pag.middleClick()
+        elif button == 'double':
+            pag.doubleClick()
+
+class DryRunBackend:
+    """No input; a move still takes its duration so timing stays realistic."""
+
+    def __init__(self, sleep=time.sleep):
+        self.sleep = sleep
+
+    def move_to(self, x, y, duration):
+        self.sleep(duration)
+
+    def click(self, button):
+        pass
+
+class VirtualClock:
+    """Monotonic clock for simulations: sleep() advances time and returns at once."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+class FakeBackend:
+    """Records calls instead of moving the mouse; moves advance the given clock."""
+
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.calls = []
+
+    def move_to(self, x, y, duration):
+        self.calls.append(("move", x, y, duration))
+        if self.clock is not None:
+            self.clock.sleep(duration)
+
+    def click(self, button):
+        self.calls.append(("click", button))
+
+def click_decision(x, y, duration=2.0, jitter=3, duration_variation=0.5, rng=None):
+    """Pick the randomized target and move duration for one click: (rx, ry, rd)."""
+    rx, ry = randomize_position(x, y, jitter, rng)
+    rd = randomize_duration(duration, duration_variation, rng)
+    return rx, ry, rd
+
+def perform_click(x, y, click_type='left', duration=2.0, jitter=3, duration_variation=0.5, dry_run=False, backend=None, rng=None):
+    """Perform a mouse click with randomization."""
+    rx, ry, rd = click_decision(x, y, duration, jitter, duration_variation, rng)
+    if backend is None:
+        backend = DryRunBackend() if dry_run else PyAutoGuiBackend()
+    backend.move_to(rx, ry, rd)
+    backend.click(click_type)
     return rx, ry
 
+# --- Action plans ---------------------------------------------------------
+#
+# A plan is a list of steps in the "plan" config key:
+#   {"click": "left", "coords": [x, y]}   optional "duration", "jitter", "label"
+#   {"click": "left", "image": "button.png", "region": [left, top, width, height]}
+#                                         optional "tolerance", "offset" (see mouse_target)
+#   {"wait": 100.0}
+#   {"repeat": 3, "steps": [...]}
+# The whole plan runs "total_moves" times. Without a "plan" key the classic
+# left click / long sleep / right click / short sleep loop is used.
+
+TimelineStep = namedtuple('TimelineStep', 'at button x y duration jitter label target', defaults=(None,))
+
+def default_plan(config):
+    """The classic two-click loop built from the legacy config keys."""
+    return [
+        {"click": "left", "coords": config['left_click_coords']},
+        {"wait": config['long_sleep_duration']},
+        {"click": "right", "coords": config['right_click_coords']},
+        {"wait": config['sleep_between_clicks']},
+    ]
+
+class Timeline:
+    """One pass of a plan compiled to click steps at offsets from the pass start.
+
+    period is the length of one pass; pass i starts at i * period, so
+    late steps never push later deadlines back.
+    """
+
+    def __init__(self, steps, period):
+        self.steps = steps
+        self.period = period
+
+    def __len__(self):
+        return len(self.steps)
+
+def _number(value, path, minimum=0):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < minimum:
+        raise ValueError(f"{path}: expected a number >= {minimum}, got {value!r}")
+    return value
+
+def _image_target(item, where, load_image):
+    import mouse_target
+    region = item.get("region")
+    if region is not None and (not isinstance(region, (list, tuple)) or len(region) != 4):
+        raise ValueError(f"{where}.region: expected [left, top, width, height]")
+    offset = item.get("offset", [0, 0])
+    if not isinstance(offset, (list, tuple)) or len(offset) != 2:
+        raise ValueError(f"{where}.offset: expected [dx, dy]")
+    tolerance = _number(item.get("tolerance", mouse_target.DEFAULT_TOLERANCE), f"{where}.tolerance")
+    try:
+        template = load_image(item["image"])
+    except (OSError, ImportError) as e:
+        raise ValueError(f"{where}.image: cannot load {item['image']!r}: {e}")
+    return mouse_target.ImageTarget(template, region, tolerance, offset, name=item["image"])
+
+def compile_plan(plan, config, load_image=None):
+    """Compile a plan into a Timeline. Raises ValueError naming the bad step.
+
+    load_image(path) returns a template array for image steps (default:
+    mouse_target.load_template).
+    """
+    steps = []
+    targets = {}  # id(step dict) -> ImageTarget, shared by the repetitions of a step
+    defaults = {
+        "duration": config.get('move_duration', 2.0),
+        "jitter": config.get('jitter_range', 3),
+    }
+
+    def walk(items, path, offset):
+        if not isinstance(items, list) or not items:
+            raise ValueError(f"{path}: expected a non-empty list of steps")
+        for i, item in enumerate(items):
+            where = f"{path}[{i}]"
+            if not isinstance(item, dict):
+                raise ValueError(f"{where}: expected an object")
+            if "click" in item:
+                button = item["click"]
+                if button not in CLICK_TYPES:
+                    raise ValueError(f"{where}.click: expected one of {', '.join(CLICK_TYPES)}, got {button!r}")
+                target = None
+                if "image" in item:
+                    if id(item) not in targets:
+                        if load_image is None:
+                            import mouse_target
+                            loader = mouse_target.load_template
+                        else:
+                            loader = load_image
+                        targets[id(item)] = _image_target(item, where, loader)
+                    target = targets[id(item)]
+                    x = y = None
+                else:
+                    coords = item.get("coords")
+                    if not isinstance(coords, (list, tuple)) or len(coords) != 2:
+                        raise ValueError(f"{where}.coords: expected [x, y] or an image")
+                    x, y = (int(_number(c, f"{where}.coords")) for c in coords)
+                duration = _number(item.get("duration", defaults["duration"]), f"{where}.duration")
+                jitter = int(_number(item.get("jitter", defaults["jitter"]), f"{where}.jitter"))
+                label = item.get("label") or f"{button.capitalize()} click {len(steps) + 1}"
+                steps.append(TimelineStep(offset, button, x, y, duration, jitter, label, target))
+                offset += duration  # The nominal move time; the actual one varies with duration_variation
+            elif "wait" in item:
+                offset += _number(item["wait"], f"{where}.wait")
+            elif "repeat" in item:
+                count = int(_number(item["repeat"], f"{where}.repeat", minimum=1))
+                for _ in range(count):
+                    offset = walk(item.get("steps"), f"{where}.steps", offset)
+            else:
+                raise ValueError(f"{where}: expected a 'click', 'wait' or 'repeat' step")
+        return offset
+
+    period = walk(plan, "plan", 0.0)
+    if not steps:
+        raise ValueError("plan: contains no click steps")
+    if period <= 0:
+        raise ValueError("plan: total duration must be positive")
+    return Timeline(steps, period)
+
+class LatenessReport:
+    """Per-step lateness statistics collected by run_timeline()."""
+
+    def __init__(self):
+        self.steps = {}  # label -> [count, total, max]
+
+    def record(self, label, lateness):
+        entry = self.steps.setdefault(label, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += lateness
+        entry[2] = max(entry[2], lateness)
+
+    def lines(self):
+        for label, (count, total, worst) in self.steps.items():
+            yield f"{label}: {count} runs, lateness mean {total / count * 1000:.1f} ms, max {worst * 1000:.1f} ms"
+
+def run_timeline(timeline, passes, execute, clock=time.monotonic, sleep=time.sleep, report=None):
+    """Run `passes` passes of the timeline against absolute deadlines.
+
+    execute(pass_index, step, lateness) performs one step. Returns
+    (passes_completed, LatenessReport).
+    """
+    report = report if report is not None else LatenessReport()
+    start = clock()
+    completed = 0
+    for index in range(passes):
+        pass_start = start + index * timeline.period
+        for step in timeline.steps:
+            deadline = pass_start + step.at
+            delay = deadline - clock()
+            if delay > 0:
+                sleep(delay)
+            lateness = max(0.0, clock() - deadline)
+            execute(index, step, lateness)
+            report.record(step.label, lateness)
+        completed = index + 1
+        delay = pass_start + timeline.period - clock()
+        if delay > 0:
+            sleep(delay)  # Trailing wait of the pass
+    return completed, report
+
+# --- Traces ---------------------------------------------------------------
+#
+# JSONL: a header with the seed and config, one record per click decision,
+# and an end record when the run finished. Replaying a trace re-runs the
+# plan with the same seed on a FakeBackend and a VirtualClock.
+
+TRACE_VERSION = 2  # 2: decisions drawn from keeper_random streams
+DECISION_FIELDS = ("pass", "step", "button", "target", "pos", "duration", "deadline")
+
+class PlanRunner:
+    """Run a timeline's clicks on a backend and report each click decision."""
+
+    def __init__(self, timeline, backend, rng=None, duration_variation=0.5, clock=time.monotonic, sleep=time.sleep, on_click=None, locate=None, lock=None, gate=None):
+        self.timeline = timeline
+        self.backend = backend
+        self.rng = rng or keeper_random.get_stream()
+        self.duration_variation = duration_variation
+        self.clock = clock
+        self.sleep = sleep
+        self.on_click = on_click  # on_click(record, step, lateness)
+        self.locate = locate  # locate(step) -> (x, y) or None for image steps
+        self.lock = lock if lock is not None else nullcontext()  # Held while a click injects input
+        self.gate = gate  # gate(step) -> False skips the click (e.g. while a host is paused)
+        self.completed = 0
+        self.report = LatenessReport()
+        self._started = None
+
+    def _locate(self, step):
+        if self.locate is None:
+            import mouse_target
+            locator = mouse_target.TargetLocator()
+            self.locate = lambda step: locator.locate(step.target)
+        return self.locate(step)
+
+    def _execute(self, index, step, lateness):
+        self.completed = index + 1
+        x = y = rx = ry = rd = None
+        at = self.clock() - self._started
+        skipped = self.gate is not None and not self.gate(step)
+        if not skipped:
+            with self.lock:
+                x, y = step.x, step.y
+                if step.target is not None:
+                    found = self._locate(step)
+                    x, y = found if found is not None else (None, None)
+                if x is not None:  # None: image target not visible, skip this click
+                    rx, ry, rd = click_decision(x, y, step.duration, step.jitter, self.duration_variation, self.rng)
+                    self.backend.move_to(rx, ry, rd)
+                    self.backend.click(step.button)
+        if self.on_click is not None:
+            record = {
+                "pass": index,
+                "step": step.label,
+                "button": step.button,
+                "target": [x, y] if x is not None else None,
+                "pos": [rx, ry] if rx is not None else None,
+                "duration": rd,
+                "deadline": round(index * self.timeline.period + step.at, 6),
+                "at": round(at, 6),
+                "late": round(lateness, 6),
+            }
+            if step.target is not None:
+                record["image"] = step.target.name
+            if skipped:
+                record["skipped"] = True
+            self.on_click(record, step, lateness)
+
+    def run(self, passes):
+        self._started = self.clock()
+        return run_timeline(self.timeline, passes, self._execute, self.clock, self.sleep, self.report)
+
+class TraceWriter:
+    """Append click records to a JSONL trace file."""
+
+    def __init__(self, path, seed, config):
+        self.file = open(path, 'w')
+        self._write({"type": "header", "version": TRACE_VERSION, "seed": seed, "started_at": time.time(), "config": config})
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def click(self, record):
+        self._write(dict(record, type="click"))
+
+    def close(self, completed=None):
+        if completed is not None:
+            self._write({"type": "end", "completed": completed})
+        self.file.close()
+
+def read_trace(path):
+    """Return (header, click records, end record or None) from a trace file."""
+    header, clicks, end = None, [], None
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # Torn last line of an interrupted run
+            kind = record.get("type")
+            if kind == "header":
+                header = record
+            elif kind == "click":
+                clicks.append(record)
+            elif kind == "end":
+                end = record
+    if header is None or header.get("version") != TRACE_VERSION:
+        raise ValueError(f"{path}: not a mouse_automation trace")
+    return header, clicks, end
+
+def simulate(config, seed, passes=None, targets=None):
+    """Run a config's plan instantly on a FakeBackend; returns (click records, LatenessReport).
+
+    targets, when given, supplies the resolved [x, y] (or None) for each
+    image step in order, as recorded in a trace; otherwise the screen is searched.
+    """
+    timeline = compile_plan(config.get('plan') or default_plan(config), config)
+    locate = None
+    if targets is not None:
+        remaining = iter(targets)
+        locate = lambda step: next(remaining, None)
+    clock = VirtualClock()
+    records = []
+    runner = PlanRunner(
+        timeline,
+        FakeBackend(clock),
+        keeper_random.RandomStream(seed),
+        config.get('duration_variation', 0.5),
+        clock,
+        clock.sleep,
+        on_click=lambda record, step, lateness: records.append(record),
+        locate=locate,
+    )
+    runner.run(config['total_moves'] if passes is None else passes)
+    return records, runner.report
+
+def verify_trace(path, config=None):
+    """Replay a trace and return a list of differences (empty when it matches).
+
+    config defaults to the one stored in the trace; pass the current config
+    to check that a changed plan still produces the recorded clicks.
+    """
+    header, recorded, end = read_trace(path)
+    targets = [record["target"] for record in recorded if record.get("image")]
+    replayed, _ = simulate(config if config is not None else header["config"], header["seed"], targets=targets)
+    if end is None:
+        replayed = replayed[:len(recorded)]  # Interrupted run: compare what was recorded
+    problems = []
+    for i, (old, new) in enumerate(zip(recorded, replayed)):
+        changed = [field for field in DECISION_FIELDS if old.get(field) != new.get(field)]
+        if changed:
+            problems.append(f"click {i + 1} ({old.get('step')}): " + ", ".join(f"{field} {old.get(field)!r} -> {new.get(field)!r}" for field in changed))
+    if len(recorded) != len(replayed):
+        problems.append(f"trace has {len(recorded)} clicks, replay produced {len(replayed)}")
+    return problems
+
 def main():
     parser = argparse.ArgumentParser(description="Mouse automation script")
-    parser.add_argument('--config', type=str, default='config.json', help='Configuration file')
+    parser.add_argument('--config', type=str, help='Configuration file (default: config.json)')
     parser.add_argument('--log', type=str, help='Log file')
     parser.add_argument('--dry-run', action='store_true', help='Simulate actions without moving the mouse')
+    parser.add_argument('--simulate', action='store_true', help='Run the plan instantly against a fake backend (no input, no waiting)')
+    parser.add_argument('--seed', type=int, help='Seed for position and duration jitter (logged and recorded in traces)')
+    parser.add_argument('--record-trace', type=str, metavar='PATH', help='Write every click decision to PATH (JSONL)')
+    parser.add_argument('--replay', type=str, metavar='PATH', help='Replay a trace instantly and verify it; with --config, verify the current plan against it')
     args = parser.parse_args()
 
-    config = load_config(args.config)
-
     log_file = args.log
+
+    if args.replay:
+        try:
+            problems = verify_trace(args.replay, load_config(args.config) if args.config else None)
+        except (OSError, KeyError, ValueError) as e:
+            log(f"Replay failed: {e}", log_file)
+            sys.exit(1)
+        for problem in problems:
+            log(f"Mismatch: {problem}", log_file)
+        log(f"Replay of {args.replay}: {'OK' if not problems else f'{len(problems)} mismatches'}", log_file)
+        sys.exit(1 if problems else 0)
+
+    config = load_config(args.config or 'config.json')
     dry_run = args.dry_run
 
-    if dry_run:
+    try:
+        timeline = compile_plan(config.get('plan') or default_plan(config), config)
+    except (KeyError, ValueError) as e:
+        log(f"Invalid plan: {e}", log_file)
+        sys.exit(1)
+
+    rng = keeper_random.configure(args.seed)  # Always seeded, so any run can be replayed
+    seed = rng.seed
+    log(f"Random seed: {seed}", log_file)
+
+    clock, sleep = time.monotonic, time.sleep
+    if args.simulate:
+        clock = VirtualClock()
+        sleep = clock.sleep
+        backend = FakeBackend(clock)
+        log("SIMULATION: running the plan instantly against a fake backend", log_file)
+    elif dry_run:
+        backend = DryRunBackend()
         log("DRY RUN MODE: Simulating actions without actual mouse movement", log_file)
+    else:
+        backend = PyAutoGuiBackend()
 
-    log(f"Script started. Total planned moves: {config['total_moves']}", log_file)
+    log(f"Script started. Total planned moves: {config['total_moves']} ({len(timeline)} clicks every {timeline.period:.1f}s)", log_file)
 
     # Handle keyboard interrupt
     def signal_handler(sig, frame):
@@ -88,42 +525,36 @@ def main():
 
     signal.signal(signal.SIGINT, signal_handler)
 
-    counter = 0
+    trace = TraceWriter(args.record_trace, seed, config) if args.record_trace else None
+
+    def on_click(record, step, lateness):
+        if trace is not None:
+            trace.click(record)
+        if record["pos"] is None:
+            log(f"Move {record['pass'] + 1}: {step.label} skipped, {step.target.name} not found on screen", log_file)
+            return
+        x, y = record["pos"]
+        log(f"Move {record['pass'] + 1}: {step.button.capitalize()} clicked at ({x}, {y}), {lateness * 1000:.0f} ms late", log_file)
+
+    runner = PlanRunner(timeline, backend, rng, config.get('duration_variation', 0.5), clock, sleep, on_click)
+    finished = False
 
     try:
-        for counter in range(config['total_moves']):
-            # Left click action
-            x1, y1 = perform_click(
-                *config['left_click_coords'],
-                'left',
-                config['move_duration'],
-                config['jitter_range'],
-                config['duration_variation'],
-                dry_run
-            )
-            log(f"Move {counter + 1}: Left clicked at ({x1}, {y1})", log_file)
-            time.sleep(config['long_sleep_duration'])
-
-            # Right click action
-            x2, y2 = perform_click(
-                *config['right_click_coords'],
-                'right',
-                config['move_duration'],
-                config['jitter_range'],
-                config['duration_variation'],
-                dry_run
-            )
-            log(f"Move {counter + 1}: Right clicked at ({x2}, {y2})", log_file)
-
-            time.sleep(config['sleep_between_clicks'])
-
-    except pag.FailSafeException:
-        log("Failsafe triggered: Mouse moved to corner", log_file)
+        runner.run(config['total_moves'])
+        finished = True
+
     except Exception as e:
-        log(f"An error occurred: {e}", log_file)
+        if type(e).__name__ == 'FailSafeException':
+            log("Failsafe triggered: Mouse moved to corner", log_file)
+        else:
+            log(f"An error occurred: {e}", log_file)
 
     finally:
-        log(f"Script finished. Total moves completed: {counter + 1}", log_file)
+        if trace is not None:
+            trace.close(runner.completed if finished else None)
+        for line in runner.report.lines():
+            log(line, log_file)
+        log(f"Script finished. Total moves completed: {runner.completed}", log_file)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,181 @@
+"""Find click targets on screen by image for mouse_automation plans.
+
+A plan step can name an image instead of fixed coordinates:
+
+    {"click": "left", "image": "send_button.png", "region": [1200, 0, 720, 200]}
+
+Each lookup grabs only the configured region, once. If the template still
+matches at the location of the previous hit, that location is reused.
+Otherwise the whole region is searched. The search is a sum-of-squared-
+differences match computed with FFT cross-correlation and an integral
+image, at half resolution first and refined around the coarse hit. A
+region a few hundred pixels wide takes milliseconds instead of the
+seconds pyautogui.locateOnScreen needs. It requires NumPy. Images are
+compared in grayscale.
+"""
+import time
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+DEFAULT_TOLERANCE = 12.0  # RMS difference per pixel (0-255) still counted as a match
+
+
+def to_gray(pixels):
+    """Return a float32 grayscale array from an (h, w), (h, w, 3) or (h, w, 4) array."""
+    array = np.asarray(pixels, dtype=np.float32)
+    if array.ndim == 3:
+        array = array[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return array
+
+
+def _match_fft(image, template):
+    """Exhaustive SSD match: (row, col, ssd) of the best window."""
+    h, w = image.shape
+    th, tw = template.shape
+
+    # Sum of image^2 over every template-sized window, from an integral image
+    integral = np.zeros((h + 1, w + 1))
+    integral[1:, 1:] = np.cumsum(np.cumsum(image * image, axis=0), axis=1)
+    window_sq = integral[th:, tw:] - integral[:-th, tw:] - integral[th:, :-tw] + integral[:-th, :-tw]
+
+    # Cross-correlation of image and template for every window via FFT
+    spectrum = np.fft.rfft2(image) * np.fft.rfft2(template[::-1, ::-1], s=(h, w))
+    correlation = np.fft.irfft2(spectrum, s=(h, w))[th - 1:, tw - 1:]
+
+    ssd = window_sq - 2.0 * correlation + np.sum(template * template)
+    row, col = np.unravel_index(np.argmin(ssd), ssd.shape)
+    return int(row), int(col), max(float(ssd[row, col]), 0.0)
+
+
+def _refine(image, template, row, col, radius):
+    """Exact SSD search in a (2 * radius + 1)^2 neighbourhood of (row, col)."""
+    h, w = image.shape
+    th, tw = template.shape
+    top, left = max(0, row - radius), max(0, col - radius)
+    bottom, right = min(h - th, row + radius), min(w - tw, col + radius)
+    area = image[top:bottom + th, left:right + tw]
+    windows = np.lib.stride_tricks.sliding_window_view(area, template.shape)
+    ssd = np.sum((windows - template) ** 2, axis=(2, 3))
+    r, c = np.unravel_index(np.argmin(ssd), ssd.shape)
+    return top + int(r), left + int(c), float(ssd[r, c])
+
+
+def _downsample(array):
+    h, w = array.shape[0] // 2 * 2, array.shape[1] // 2 * 2
+    return array[:h, :w].reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3))
+
+
+def match_template(image, template, tolerance=None):
+    """Best match of template in image: (row, col, rms) with rms the per-pixel RMS difference.
+
+    Both arguments are grayscale arrays; image must be at least as large as
+    template in both dimensions. Templates of 16 pixels and more per side are
+    first matched at half resolution and refined at full resolution around
+    the coarse hit. If that refined hit is worse than tolerance, the full
+    resolution search runs as well.
+    """
+    image = np.asarray(image, dtype=np.float64)
+    template = np.asarray(template, dtype=np.float64)
+    h, w = image.shape
+    th, tw = template.shape
+    if th > h or tw > w:
+        raise ValueError(f"template {tw}x{th} is larger than the search region {w}x{h}")
+    pixels = th * tw
+
+    if min(th, tw) >= 16:
+        row, col, _ = _match_fft(_downsample(image), _downsample(template))
+        row, col, ssd = _refine(image, template, row * 2, col * 2, radius=2)
+        rms = float(np.sqrt(ssd / pixels))
+        if tolerance is None or rms <= tolerance:
+            return row, col, rms
+
+    row, col, ssd = _match_fft(image, template)
+    return row, col, float(np.sqrt(ssd / pixels))
+
+
+def patch_rms(image, template, row, col):
+    """Per-pixel RMS difference between template and the image patch at (row, col)."""
+    th, tw = template.shape
+    patch = image[row:row + th, col:col + tw]
+    if patch.shape != template.shape:
+        return float("inf")
+    diff = patch.astype(np.float64) - template
+    return float(np.sqrt(np.mean(diff * diff)))
+
+
+def grab_region(region):
+    """Screenshot of region (left, top, width, height) as an array, via pyautogui."""
+    import mouse_automation
+    return np.asarray(mouse_automation.load_pyautogui().screenshot(region=tuple(region) if region else None))
+
+
+def load_template(path):
+    """Load an image file as a grayscale template array (needs Pillow)."""
+    from PIL import Image
+    with Image.open(path) as image:
+        return to_gray(np.asarray(image.convert("RGB")))
+
+
+class ImageTarget:
+    """One image target: template, search region, tolerance and click offset.
+
+    region is (left, top, width, height) in screen pixels, or None for the
+    whole screen. The click point is the centre of the match plus offset.
+    """
+
+    def __init__(self, template, region=None, tolerance=DEFAULT_TOLERANCE, offset=(0, 0), name="image"):
+        self.template = to_gray(template)
+        self.region = tuple(region) if region is not None else None
+        self.tolerance = tolerance
+        self.offset = tuple(offset)
+        self.name = name
+        self.last_hit = None  # (row, col) of the previous match within the region
+
+
+class TargetLocator:
+    """Locate ImageTargets with one grab per lookup and a last-hit cache.
+
+    grab(region) returns the screen pixels of region (the whole screen for
+    None); pass a fake for tests or headless use.
+    """
+
+    def __init__(self, grab=grab_region, clock=time.perf_counter):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("image targets require numpy (pip install numpy)")
+        self.grab = grab
+        self.clock = clock
+        self.lookups = 0
+        self.cache_hits = 0
+        self.searches = 0
+        self.last_lookup_seconds = 0.0
+
+    def locate(self, target):
+        """Return the screen (x, y) to click for target, or None when it is not visible."""
+        started = self.clock()
+        self.lookups += 1
+        image = to_gray(self.grab(target.region))
+        template = target.template
+        hit = None
+        if target.last_hit is not None and patch_rms(image, template, *target.last_hit) <= target.tolerance:
+            hit = target.last_hit
+            self.cache_hits += 1
+        elif image.shape[0] >= template.shape[0] and image.shape[1] >= template.shape[1]:
+            self.searches += 1
+            row, col, rms = match_template(image, template, target.tolerance)
+            if rms <= target.tolerance:
+                hit = (row, col)
+        target.last_hit = hit
+        self.last_lookup_seconds = self.clock() - started
+        if hit is None:
+            return None
+        left, top = (target.region[0], target.region[1]) if target.region is not None else (0, 0)
+        th, tw = template.shape
+        return (
+            left + hit[1] + tw // 2 + target.offset[0],
+            top + hit[0] + th // 2 + target.offset[1],
+        )
@@ -0,0 +1,184 @@
+"""Precomputed mouse trajectories shared by activity_keeper and mouse_automation.
+
+pyautogui's tweening computes every intermediate point one call at a time
+and sleeps between them with relative sleeps. Here a path is built from a
+unit shape taken from a pool:
+
+- progress along the line, following a smoothstep-like easing curve with a random steepness
+- a sideways bow, as a fraction of the distance
+- a small random wobble in pixels, pinned to zero at both ends
+
+Shapes are generated BATCH_SIZE at a time for each distance bucket (powers
+of two of the distance). Longer moves get more points. A move is one
+vectorized transform of a pooled shape onto the actual start and end.
+Points that repeat the previous one are dropped. play_path() replays the
+whole path in one call against absolute deadlines, so timing errors do
+not accumulate.
+
+NumPy is used when installed; otherwise the same shapes are built with
+plain Python lists.
+"""
+import math
+import random
+import time
+
+import keeper_random
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+BATCH_SIZE = 32
+MAX_BUCKET = 12  # Distances of 4096 px and more share one bucket
+BOW_RANGE = 0.08  # Maximum sideways bow as a fraction of the distance
+WOBBLE_PIXELS = 0.4  # Standard deviation of one wobble step
+EASING_RANGE = (1.5, 2.5)  # Steepness of the easing curve
+
+
+def distance_bucket(distance):
+    """Bucket index for a move of `distance` pixels."""
+    return min(MAX_BUCKET, int(math.log2(max(distance, 1.0))))
+
+
+def points_for_bucket(bucket):
+    """Number of points on a path in this bucket (the start point included)."""
+    return 8 + 4 * bucket
+
+
+class Path:
+    """A concrete move: integer points (start excluded) and their offsets in seconds."""
+
+    __slots__ = ("points", "times")
+
+    def __init__(self, points, times):
+        self.points = points
+        self.times = times
+
+    def __len__(self):
+        return len(self.times)
+
+
+class TrajectoryEngine:
+    """Pool of unit path shapes per distance bucket, refilled in batches.
+
+    rng (random.Random or the random module) drives everything, so a seeded
+    rng gives reproducible paths.
+    """
+
+    def __init__(self, rng=random, batch_size=BATCH_SIZE):
+        self.rng = rng
+        self.batch_size = batch_size
+        self._pools = {}  # bucket -> list of (progress, bow, wobble)
+        self.batches_generated = 0
+        self.paths_built = 0
+
+    def _generate_numpy(self, n):
+        generator = np.random.default_rng(self.rng.getrandbits(64))
+        batch = self.batch_size
+        t = np.linspace(0.0, 1.0, n)
+        steepness = generator.uniform(*EASING_RANGE, size=(batch, 1))
+        rising = t ** steepness
+        progress = rising / (rising + (1.0 - t) ** steepness)
+        bow = generator.uniform(-BOW_RANGE, BOW_RANGE, size=(batch, 1)) * np.sin(np.pi * t)
+        walk = np.cumsum(generator.normal(0.0, WOBBLE_PIXELS, size=(batch, n)), axis=1)
+        wobble = walk - t * walk[:, -1:]  # Brownian bridge: zero at both ends
+        wobble[:, 0] = 0.0
+        return [(progress[i], bow[i], wobble[i]) for i in range(batch)]
+
+    def _generate_python(self, n):
+        rng = self.rng
+        t = [i / (n - 1) for i in range(n)]
+        shapes = []
+        for _ in range(self.batch_size):
+            steepness = rng.uniform(*EASING_RANGE)
+            progress = [x ** steepness / (x ** steepness + (1.0 - x) ** steepness) for x in t]
+            amplitude = rng.uniform(-BOW_RANGE, BOW_RANGE)
+            bow = [amplitude * math.sin(math.pi * x) for x in t]
+            walk, total = [], 0.0
+            for _ in t:
+                total += rng.gauss(0.0, WOBBLE_PIXELS)
+                walk.append(total)
+            wobble = [w - x * walk[-1] for w, x in zip(walk, t)]
+            wobble[0] = 0.0
+            shapes.append((progress, bow, wobble))
+        return shapes
+
+    def _next_shape(self, bucket):
+        pool = self._pools.get(bucket)
+        if not pool:
+            n = points_for_bucket(bucket)
+            pool = self._generate_numpy(n) if NUMPY_AVAILABLE else self._generate_python(n)
+            pool.reverse()  # pop() from the end keeps generation order
+            self._pools[bucket] = pool
+            self.batches_generated += 1
+        return pool.pop()
+
+    def path(self, start, end, duration):
+        """Build the Path from start to end (pixel tuples) lasting `duration` seconds."""
+        x0, y0 = start
+        dx, dy = end[0] - x0, end[1] - y0
+        distance = math.hypot(dx, dy)
+        self.paths_built += 1
+        if distance < 1.0:
+            return Path([tuple(end)], [max(0.0, duration)])
+        progress, bow, wobble = self._next_shape(distance_bucket(distance))
+        n = len(progress)
+        px, py = -dy / distance, dx / distance  # Unit vector perpendicular to the move
+        if NUMPY_AVAILABLE:
+            lateral = bow * distance + wobble
+            xs = np.rint(x0 + progress * dx + lateral * px).astype(int)
+            ys = np.rint(y0 + progress * dy + lateral * py).astype(int)
+            xs[-1], ys[-1] = end
+            times = np.linspace(0.0, duration, n)
+            moved = (xs[1:] != xs[:-1]) | (ys[1:] != ys[:-1])  # Skip points that repeat the previous one
+            moved[-1] = True
+            return Path(np.column_stack((xs[1:][moved], ys[1:][moved])), times[1:][moved])
+        points, times = [], []
+        previous = (x0, y0)
+        for i in range(1, n):
+            lateral = bow[i] * distance + wobble[i]
+            point = (round(x0 + progress[i] * dx + lateral * px), round(y0 + progress[i] * dy + lateral * py))
+            if i == n - 1:
+                point = tuple(end)
+            elif point == previous:
+                continue  # Skip points that repeat the previous one
+            points.append(point)
+            times.append(duration * i / (n - 1))
+            previous = point
+        return Path(points, times)
+
+
+def play_path(move, path, clock=time.perf_counter, sleep=time.sleep):
+    """Send each point of path to move(x, y) at its absolute deadline; returns the max lateness."""
+    started = clock()
+    worst = 0.0
+    for (x, y), offset in zip(path.points, path.times):
+        delay = started + offset - clock()
+        if delay > 0:
+            sleep(delay)
+        else:
+            worst = max(worst, -delay)
+        move(int(x), int(y))
+    return worst
+
+
+_DEFAULT_ENGINE = None
+_DEFAULT_ENGINE_PARENT = None  # keeper_random stream the default engine's stream was spawned from
+
+
+def get_engine():
+    """Process-wide engine on a "trajectory" stream spawned from the shared keeper_random stream.
+
+    Pool refills never draw from the shared stream, so they cannot shift the
+    decisions made from it. The engine is rebuilt (with empty pools) when
+    keeper_random.configure() installs a new stream.
+    """
+    global _DEFAULT_ENGINE, _DEFAULT_ENGINE_PARENT
+    stream = keeper_random.get_stream()
+    if _DEFAULT_ENGINE is None or _DEFAULT_ENGINE_PARENT is not stream:
+        _DEFAULT_ENGINE = TrajectoryEngine(stream.spawn("trajectory"))
+        _DEFAULT_ENGINE_PARENT = stream
+    return _DEFAULT_ENGINE
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The keeper modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def keeper(monkeypatch, tmp_path):
+    """KeeperHarness with activity_keeper patched onto fake clock, input, idle and pyautogui."""
+    from keeper_harness import KeeperHarness
+    harness = KeeperHarness(monkeypatch, tmp_path)
+    yield harness
+    harness.close()
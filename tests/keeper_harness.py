@@ -0,0 +1,270 @@
+"""Deterministic harness for driving activity_keeper end to end.
+
+Everything the keeper reads from the outside world is replaced:
+
+- FakeClock: time.time/perf_counter/monotonic/sleep and datetime.now. The
+  keeper's idle_wait() advances it instantly.
+- FakeConsole: msvcrt.kbhit/getch, fed with scripted key presses.
+- FakeIdle: get_idle_time_seconds(), driven by scripted user activity.
+- FakePyAutoGUI: records key presses and pointer moves.
+
+Scripted actions run at their virtual time from inside the keeper's own
+waits, so a scenario runs on the test thread without threads or real
+sleeps. Every console line and injected key press is recorded in
+KeeperHarness.events with its offset from the start of the scenario.
+"""
+import collections
+import heapq
+import json
+import logging
+import signal
+import time as real_time
+from datetime import datetime
+
+import activity_keeper
+import keeper_history
+import keeper_random
+import keeper_schedule
+
+# A Monday, local time: schedules in scenarios are relative to it
+START = datetime(2026, 3, 2, 9, 0, 0)
+
+SIGNALS = [sig for sig in (signal.SIGINT, signal.SIGTERM, getattr(signal, "SIGHUP", None)) if sig is not None]
+
+
+class FakeClock:
+    """Virtual wall/monotonic clock with actions scheduled at absolute times."""
+
+    def __init__(self, start):
+        self.start = start
+        self.now = start
+        self._actions = []
+        self._seq = 0
+
+    # time module interface used by the keeper modules
+    def time(self):
+        return self.now
+
+    perf_counter = monotonic = time
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def strftime(self, fmt, t=None):
+        return real_time.strftime(fmt, t if t is not None else real_time.localtime(self.now))
+
+    def localtime(self, seconds=None):
+        return real_time.localtime(self.now if seconds is None else seconds)
+
+    def at(self, offset, action):
+        """Run action() once the clock reaches start + offset seconds."""
+        heapq.heappush(self._actions, (self.start + offset, self._seq, action))
+        self._seq += 1
+
+    def advance(self, seconds):
+        target = self.now + max(0.0, seconds)
+        while self._actions and self._actions[0][0] <= target:
+            due, _, action = heapq.heappop(self._actions)
+            self.now = max(self.now, due)
+            action()
+        self.now = target
+
+    @property
+    def elapsed(self):
+        return self.now - self.start
+
+
+class FakeConsole:
+    """msvcrt stand-in: kbhit()/getch() over a queue of typed keys."""
+
+    def __init__(self):
+        self.keys = collections.deque()
+
+    def type(self, keys):
+        self.keys.extend(key.encode() for key in keys)
+
+    def kbhit(self):
+        return bool(self.keys)
+
+    def getch(self):
+        return self.keys.popleft()
+
+
+class FakeIdle:
+    """Idle time derived from scripted periods of user activity."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.periods = []  # (start, end) in absolute virtual time
+        self.last_input = clock.start - 10 ** 6  # Nobody at the keyboard before the scenario
+
+    def active(self, start, end):
+        """The user is typing from start to end seconds into the scenario."""
+        self.periods.append((self.clock.start + start, self.clock.start + end))
+
+    def input(self):
+        self.last_input = self.clock.now
+
+    def __call__(self):
+        now = self.clock.now
+        last = self.last_input
+        for start, end in self.periods:
+            if start <= now:
+                last = max(last, min(now, end))
+        return now - last
+
+
+class FakePyAutoGUI:
+    """Records injected key presses and tracks the pointer position.
+
+    Injected input does not reset FakeIdle, like a real idle source that
+    ignores injected events; call harness.idle.input() to model one that does not.
+    """
+
+    FAILSAFE = True
+
+    def __init__(self, harness):
+        self.harness = harness
+        self.x, self.y = 800, 450
+        self.moves = 0
+
+    def position(self):
+        return self.x, self.y
+
+    def moveTo(self, x, y, duration=0.0, _pause=True):
+        self.x, self.y = x, y
+        self.moves += 1
+
+    def press(self, key):
+        self.harness.record("press", key)
+
+
+class KeeperHarness:
+    """Patch activity_keeper onto fakes for one test and run scripted sessions."""
+
+    def __init__(self, monkeypatch, tmp_path, start=START):
+        self.monkeypatch = monkeypatch
+        self.tmp_path = tmp_path
+        self.clock = FakeClock(start.timestamp())
+        self.console = FakeConsole()
+        self.idle = FakeIdle(self.clock)
+        self.pyautogui = FakePyAutoGUI(self)
+        self.events = []  # (seconds since start, kind, text)
+        self.config_file = str(tmp_path / "activity_config.json")
+        self._patch()
+
+    def _patch(self):
+        ak, mp, clock = activity_keeper, self.monkeypatch, self.clock
+
+        class FakeDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(clock.now, tz)
+
+        for module in (ak, keeper_schedule, keeper_history):
+            mp.setattr(module, "time", clock)
+        mp.setattr(ak, "datetime", FakeDatetime)
+        mp.setattr(ak, "idle_wait", clock.advance)
+        mp.setattr(ak, "msvcrt", self.console)
+        mp.setattr(ak, "get_idle_time_seconds", self.idle)
+        mp.setattr(ak, "pag", self.pyautogui)
+        mp.setattr(ak, "load_pyautogui", lambda: self.pyautogui)
+        mp.setattr(ak, "console_log", lambda message: self.record("log", message))
+        mp.setattr(ak, "prevent_sleep", lambda: self.record("power", "stay awake"))
+        mp.setattr(ak, "allow_sleep", lambda: self.record("power", "allow sleep"))
+        mp.setattr(ak, "play_sound", lambda frequency=1000, duration=200: self.record("sound", str(frequency)))
+        mp.setattr(ak, "update_title", lambda text: None)
+
+        # Module state the keeper and main() mutate; monkeypatch restores it afterwards
+        for name in ("VERBOSE", "QUIET", "DRY_RUN", "AUTO_RESTART", "DETECT_INACTIVITY", "RANDOM_PATTERN",
+                     "CONSOLE_KEYS", "OUTPUT_MODE", "PROFILE", "LOG_FILE", "TRAY_ENABLED", "current_config_file",
+                     "logger", "_LAST_EVENT_STATE", "STATUS", "SCHEDULE_STATE", "TOTAL_JIGGLES", "LAST_HEARTBEAT_AT",
+                     "NEXT_HEARTBEAT_AT", "WAITING_UNTIL", "SESSION_STARTED_AT", "SESSION_ENDS_AT",
+                     "_RELOADED_CONFIG", "_ACTIVE_SESSION"):
+            mp.setattr(ak, name, getattr(ak, name))
+        mp.setattr(keeper_random, "_STREAM", keeper_random._STREAM)
+        for name in ("PAUSED", "AUTO_PAUSED", "STOP_REQUESTED", "CONFIG_RELOAD_REQUESTED"):
+            mp.setattr(ak, name, False)
+        root = logging.getLogger()
+        mp.setattr(root, "handlers", list(root.handlers))  # main() installs a FileHandler
+        keeper_schedule.invalidate_schedule_cache()
+        self._signal_handlers = {sig: signal.getsignal(sig) for sig in SIGNALS}  # main() installs its own
+
+    def close(self):
+        for sig, handler in self._signal_handlers.items():
+            signal.signal(sig, handler)
+        activity_keeper._WAKE.clear()  # Set by stop()/reload(); the patched idle_wait never consumes it
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, logging.FileHandler):
+                handler.close()
+        keeper_schedule.invalidate_schedule_cache()
+
+    # --- scripting --------------------------------------------------------
+
+    def record(self, kind, text):
+        self.events.append((round(self.clock.elapsed, 3), kind, text))
+
+    def at(self, seconds, action):
+        self.clock.at(seconds, action)
+
+    def press_key(self, seconds, keys):
+        self.at(seconds, lambda: self.console.type(keys))
+
+    def user_active(self, start, end):
+        self.idle.active(start, end)
+
+    def write_config(self, **values):
+        config = {
+            "activity_interval": 60,
+            "total_duration": 600,
+            "method": "keyboard",
+            "keyboard_key": "scrolllock",
+            "mouse_move_distance": 10,
+        }
+        config.update(values)
+        with open(self.config_file, "w") as f:
+            json.dump(config, f)
+        return config
+
+    def session(self, config, **options):
+        options.setdefault("seed", 1)
+        options.setdefault("output_mode", "lines")
+        options.setdefault("console_keys", True)
+        return activity_keeper.KeeperSession(config, config_file=self.config_file, **options)
+
+    def session_stop(self):
+        """Call stop() on the running session, as a control client or embedding program would."""
+        activity_keeper._ACTIVE_SESSION.stop()
+
+    def session_reload(self):
+        activity_keeper._ACTIVE_SESSION.reload()
+
+    # --- results ----------------------------------------------------------
+
+    def heartbeats(self):
+        """Offsets of the heartbeat key presses (mouse heartbeats end with the F15 ghost key)."""
+        return [t for t, kind, text in self.events if kind == "press"]
+
+    def messages(self):
+        return [text for _, kind, text in self.events if kind == "log"]
+
+    def timeline(self):
+        return "\n".join(f"{t:>9.1f}s  {kind:<6} {text}" for t, kind, text in self.events)
+
+    def assert_sequence(self, *expected):
+        """Each expected fragment appears in an event, in this order (other events may come between)."""
+        position = 0
+        for fragment in expected:
+            for index in range(position, len(self.events)):
+                if fragment in self.events[index][2]:
+                    position = index + 1
+                    break
+            else:
+                raise AssertionError(f"{fragment!r} not found in order in:\n{self.timeline()}")
+
+    def first(self, fragment):
+        """Offset of the first event containing fragment."""
+        for t, _, text in self.events:
+            if fragment in text:
+                return t
+        raise AssertionError(f"{fragment!r} not found in:\n{self.timeline()}")
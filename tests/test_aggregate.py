@@ -0,0 +1,81 @@
+"""aggregate against live ControlServers: replies merge into one table, a silent keeper costs one timeout."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import keeper_aggregate
+import keeper_control
+
+TIMEOUT = 0.05
+
+
+@pytest.fixture
+def silent():
+    """Released at teardown so the handler threads of silent keepers can exit."""
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+@pytest.fixture
+def servers(silent):
+    started = []
+
+    def serve(stats=None):
+        def handler(cmd, request):
+            if stats is None:
+                silent.wait()  # Accepts the connection, never answers within the timeout
+            return stats
+
+        server = keeper_control.ControlServer("tcp:127.0.0.1:0", handler)
+        server.start()
+        started.append(server)
+        return server.address
+
+    yield serve
+    for server in started:
+        server.close()
+
+
+def poll(endpoints):
+    aggregator = keeper_aggregate.Aggregator(endpoints, concurrency=8, timeout=TIMEOUT)
+    started = time.monotonic()
+    rows = asyncio.run(aggregator.poll())
+    return rows, time.monotonic() - started
+
+
+def test_silent_keeper_times_out_and_the_rest_merge(servers):
+    now = time.time()
+    endpoints = [
+        keeper_aggregate.Endpoint("kiosk-01", servers({"state": "running", "total_jiggles": 12, "last_heartbeat_at": now - 30})),
+        keeper_aggregate.Endpoint("kiosk-02", servers()),
+        keeper_aggregate.Endpoint("kiosk-03", servers({"state": "paused", "total_jiggles": 3, "uptime_seconds": 4000})),
+    ]
+
+    rows, elapsed = poll(endpoints)
+
+    assert [row["name"] for row in rows] == ["kiosk-01", "kiosk-02", "kiosk-03"]
+    assert [row["state"] for row in rows] == ["running", "unreachable", "paused"]
+    assert rows[1]["error"] == f"no reply within {TIMEOUT:g}s"
+    assert elapsed < 3 * TIMEOUT  # Polled in parallel: the silent keeper costs one timeout
+    table = keeper_aggregate.format_table(rows, now=now).splitlines()
+    assert table[1].split()[:7] == ["kiosk-01", "running", "-", "12", "30s", "ago", "-"]
+    assert table[2].split()[:4] == ["kiosk-02", "unreachable", "-", "-"]
+    assert table[2].endswith(f"no reply within {TIMEOUT:g}s")
+    assert table[3].split()[:4] == ["kiosk-03", "paused", "-", "3"] and "1h06m" in table[3]
+    assert table[-1] == "3 keepers: 1 paused, 1 running, 1 unreachable"
+
+
+def test_blocked_named_pipe_times_out(monkeypatch, silent):
+    def send_command(cmd, address, timeout):
+        silent.wait()  # A busy pipe blocks in open() no matter the client timeout
+        return {"ok": True, "result": {"state": "running"}}
+
+    monkeypatch.setattr(keeper_control, "send_command", send_command)
+
+    rows, elapsed = poll([keeper_aggregate.Endpoint("desk", keeper_control.PIPE_PREFIX + "activity_keeper")])
+
+    assert rows[0]["error"] == f"no reply within {TIMEOUT:g}s"
+    assert elapsed < 3 * TIMEOUT
@@ -0,0 +1,64 @@
+"""Checkpoint journal: writer failures, concurrent updates and crash journaling."""
+import threading
+import time
+import types
+
+import pytest
+
+import keeper_checkpoint
+
+
+def test_failed_writer_stops_queueing(tmp_path):
+    writer = keeper_checkpoint.CheckpointWriter(str(tmp_path / "missing" / "keeper.checkpoint"))
+    writer.start()
+    writer._thread.join(timeout=2.0)
+
+    for i in range(1000):
+        writer.update({"total_jiggles": i})
+
+    assert writer.error is not None
+    assert writer._queue.qsize() == 0
+    writer.close(clean_exit=True)
+
+
+def test_concurrent_updates_queue_in_seq_order(tmp_path, monkeypatch):
+    def yielding_time():  # Hands the GIL to another publisher between the seq and the put
+        time.sleep(0.0001)
+        return time.monotonic()
+
+    monkeypatch.setattr(keeper_checkpoint, "time", types.SimpleNamespace(time=yielding_time, monotonic=time.monotonic))
+    writer = keeper_checkpoint.CheckpointWriter(str(tmp_path / "keeper.checkpoint"))  # Not started: the queue fills
+
+    def publish(name):  # Like publish_status() from the keeper, control and tray threads
+        for i in range(50):
+            writer.update({name: i, "paused": i % 2 == 0})
+
+    threads = [threading.Thread(target=publish, args=(f"thread{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    seqs = []
+    while not writer._queue.empty():
+        seqs.append(writer._queue.get_nowait()[0])
+    assert seqs == list(range(1, 201))  # load_checkpoint drops a record queued after a higher seq
+
+
+def test_crash_in_keep_active_is_journaled_as_unclean(keeper, tmp_path):
+    checkpoint = str(tmp_path / "keeper.checkpoint")
+    config = keeper.write_config(activity_interval=60, total_duration=600)
+
+    def broken_press(key):
+        if keeper.clock.elapsed > 100:
+            raise RuntimeError("display went away")
+        keeper.record("press", key)
+
+    keeper.pyautogui.press = broken_press
+
+    with pytest.raises(RuntimeError):
+        keeper.session(config, checkpoint_file=checkpoint).run()
+
+    state = keeper_checkpoint.load_checkpoint(checkpoint)["state"]
+    assert state["clean_exit"] is False  # The next start resumes this session
+    assert state["total_jiggles"] == 2
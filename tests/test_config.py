@@ -0,0 +1,40 @@
+"""Config validation reports every schedule error with its key path."""
+import keeper_config
+
+BASE = {"activity_interval": 120, "total_duration": 3600, "mouse_move_distance": 10, "schedule_enabled": True}
+
+
+def messages(config):
+    return [str(error) for error in keeper_config.validate(dict(BASE, **config))]
+
+
+def test_every_schedule_error_is_reported():
+    errors = messages({
+        "schedule_windows": [
+            {"days": [1, 2], "start": "9am", "end": "25:00"},
+            {"days": [0, 8], "start": "09:00", "end": "17:00"},
+            "weekdays",
+        ],
+        "schedule_exceptions": [
+            {"date": "2026-13-01", "off": True},
+            {"date": "2026-12-24", "until": "2026-12-20"},
+            {"date": "2026-12-31", "windows": [{"start": "10:00", "end": "noon"}]},
+        ],
+    })
+
+    assert errors == [
+        "schedule_windows[0].start: time must be in HH:MM format (e.g., '09:00'), got '9am'",
+        "schedule_windows[0].end: time out of range: '25:00'",
+        "schedule_windows[1].days: must be a list of numbers 1-7 (1=Monday, 7=Sunday)",
+        "schedule_windows[2]: must be an object",
+        "schedule_exceptions[0].date: date must be YYYY-MM-DD, got '2026-13-01'",
+        "schedule_exceptions[1].until: must not be before date",
+        "schedule_exceptions[2].windows[0].end: time must be in HH:MM format (e.g., '09:00'), got 'noon'",
+    ]
+
+
+def test_valid_schedule_has_no_errors():
+    assert messages({
+        "schedule_windows": [{"days": [1, 2, 3, 4, 5], "start": "22:00", "end": "06:00"}],
+        "schedule_exceptions": [{"date": "2026-12-24", "until": "2026-12-26", "off": True}],
+    }) == []
@@ -0,0 +1,114 @@
+"""Named-pipe control channel, exercised on any platform with a fake _winapi."""
+import threading
+import time
+import types
+
+import pytest
+
+import keeper_control
+
+ADDRESS = keeper_control.PIPE_PREFIX + "activity_keeper_test"
+
+
+class FakeWinapi(types.SimpleNamespace):
+    """Records CreateNamedPipe calls; ConnectNamedPipe blocks until the server is closed."""
+
+    def __init__(self, existing=False):
+        super().__init__(
+            PIPE_ACCESS_DUPLEX=0x3, PIPE_TYPE_BYTE=0, PIPE_READMODE_BYTE=0, PIPE_WAIT=0,
+            PIPE_UNLIMITED_INSTANCES=255, NMPWAIT_WAIT_FOREVER=-1, NULL=0, ERROR_PIPE_CONNECTED=535,
+        )
+        self.existing = existing  # Another process already created the pipe name
+        self.created = []
+        self.waits = []
+        self.released = threading.Event()
+
+    def CreateNamedPipe(self, name, open_mode, pipe_mode, *args):
+        if self.existing and open_mode & keeper_control.FILE_FLAG_FIRST_PIPE_INSTANCE:
+            error = OSError("Access is denied")
+            error.winerror = keeper_control.ERROR_ACCESS_DENIED
+            raise error
+        self.created.append((open_mode, pipe_mode))
+        return len(self.created)
+
+    def ConnectNamedPipe(self, handle, overlapped):
+        self.released.wait()
+
+    def CloseHandle(self, handle):
+        pass
+
+    def WaitNamedPipe(self, name, milliseconds):
+        self.waits.append(milliseconds)
+
+
+@pytest.fixture
+def winapi(monkeypatch):
+    fake = FakeWinapi()
+    monkeypatch.setitem(__import__("sys").modules, "_winapi", fake)
+    yield fake
+    fake.released.set()
+
+
+def test_pipe_rejects_remote_clients_and_owns_the_name(winapi, monkeypatch):
+    monkeypatch.setattr(keeper_control, "open", lambda *args, **kwargs: winapi.released.set() or BlockingPipe(), raising=False)
+    server = keeper_control.ControlServer(ADDRESS, lambda cmd, request: None)
+
+    server.start()
+    server.close()
+
+    (first_open, first_mode), *rest = winapi.created
+    assert first_open & keeper_control.FILE_FLAG_FIRST_PIPE_INSTANCE
+    assert first_mode & keeper_control.PIPE_REJECT_REMOTE_CLIENTS
+    assert all(mode & keeper_control.PIPE_REJECT_REMOTE_CLIENTS for _, mode in rest)
+    assert not any(open_mode & keeper_control.FILE_FLAG_FIRST_PIPE_INSTANCE for open_mode, _ in rest)
+
+
+def test_pipe_name_taken_by_another_process_fails_start(winapi):
+    winapi.existing = True
+
+    with pytest.raises(OSError, match="already in use"):
+        keeper_control.ControlServer(ADDRESS, lambda cmd, request: None).start()
+
+
+class BlockingPipe:
+    """Pipe whose keeper accepted the connection but never answers."""
+
+    def __init__(self, release=None):
+        self.release = release or threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+    def write(self, data):
+        pass
+
+    def read(self, size):
+        self.release.wait()
+        return b""
+
+
+def test_send_command_times_out_on_a_pipe(winapi, monkeypatch):
+    attempts = []
+
+    def busy_then_silent(path, mode, buffering):
+        attempts.append(path)
+        if len(attempts) == 1:
+            error = OSError("All pipe instances are busy")
+            error.winerror = keeper_control.ERROR_PIPE_BUSY
+            raise error
+        return BlockingPipe(winapi.released)
+
+    monkeypatch.setattr(keeper_control, "open", busy_then_silent, raising=False)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError, match="within 0.1s"):
+        keeper_control.send_command("stats", ADDRESS, timeout=0.1)
+
+    assert time.monotonic() - started < 0.5
+    assert len(attempts) == 2 and 0 < winapi.waits[0] <= 100  # Waited for a free instance within the timeout
@@ -0,0 +1,73 @@
+"""Idle trace recording and the `tune` replay."""
+import pytest
+
+import keeper_idle
+
+
+def record(path, start, samples, idle=2.0, max_bytes=keeper_idle.DEFAULT_MAX_BYTES):
+    recorder = keeper_idle.IdleRecorder(str(path), lambda: idle, 1.0, max_bytes)
+    for i in range(samples):
+        recorder.sample(start + i)
+    recorder.close()
+    return recorder
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "python"])
+def engine(request, monkeypatch):
+    if request.param and not keeper_idle.NUMPY_AVAILABLE:
+        pytest.skip("NumPy not installed")
+    monkeypatch.setattr(keeper_idle, "NUMPY_AVAILABLE", request.param)
+
+
+def test_every_heartbeat_skipped(tmp_path, engine, capsys):
+    path = tmp_path / "idle.akit"
+    record(path, 1_000_000.0, 600, idle=2.0)  # User active for the whole trace
+
+    assert keeper_idle.main([str(path), "--thresholds", "60", "--interval", "120"]) == 0
+
+    times, idle = keeper_idle.load_traces([str(path)])
+    result = keeper_idle.evaluate_threshold(times, idle, 60, 120, 300)
+    assert result["heartbeats_sent"] == 0
+    assert result["heartbeats_skipped"] == 5
+    assert result["max_uncovered_gap_seconds"] == 2.0
+    assert "60s" in capsys.readouterr().out
+
+
+def test_rotated_traces_load_in_time_order_whatever_the_argument_order(tmp_path, engine):
+    path = tmp_path / "idle.akit"
+    max_bytes = keeper_idle.HEADER.size + keeper_idle.RECORD.size * keeper_idle.FLUSH_EVERY * 2
+    record(path, 1_000_000.0, keeper_idle.FLUSH_EVERY * 3, max_bytes=max_bytes)
+
+    forward = keeper_idle.load_traces([str(path) + ".1", str(path)])
+    backward = keeper_idle.load_traces([str(path), str(path) + ".1"])
+
+    assert list(forward[0]) == list(backward[0])
+    assert list(forward[0]) == sorted(forward[0])
+    assert len(forward[0]) == keeper_idle.FLUSH_EVERY * 3
+
+
+def test_restarted_recorder_appends(tmp_path):
+    path = tmp_path / "idle.akit"
+    record(path, 1_000_000.0, 100)
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")  # Torn record from a killed keeper
+    record(path, 1_000_500.0, 100, idle=7.0)
+
+    start, _, times, idle = keeper_idle.read_trace(str(path))
+    assert start == 1_000_000.0
+    assert len(times) == 200
+    assert times[100] == 1_000_500.0 and idle[100] == 7.0
+
+
+def test_offline_gap_between_sessions_is_not_replayed(tmp_path, engine):
+    monday, tuesday = tmp_path / "monday.akit", tmp_path / "tuesday.akit"
+    record(monday, 1_000_000.0, 600, idle=600.0)  # User away: every heartbeat is sent
+    record(tuesday, 1_000_000.0 + 86400, 600, idle=2.0)  # User active: every heartbeat is skipped
+
+    times, idle = keeper_idle.load_traces([str(monday), str(tuesday)])
+    result = keeper_idle.evaluate_threshold(times, idle, 60, 120, 300)
+
+    assert result["heartbeats_sent"] == 5  # Not one per interval through the night
+    assert result["heartbeats_skipped"] == 5
+    assert result["paused_percent"] == 50.0
+    assert result["max_uncovered_gap_seconds"] == 119.0  # Within Monday; the night itself is not a gap
@@ -0,0 +1,122 @@
+"""main() end to end: argument parsing, config loading, signals and exit output on the fake backends."""
+import signal
+
+import pytest
+
+import activity_keeper
+
+
+def run_main(keeper, *args):
+    log_file = keeper.tmp_path / "activity_keeper.log"
+    activity_keeper.main(["--config", keeper.config_file, "--log", str(log_file), "--output", "lines", *args])
+    return log_file.read_text()
+
+
+def test_cli_overrides_config_and_injects_through_pyautogui(keeper, capsys):
+    keeper.write_config(activity_interval=120, total_duration=7200, method="mouse")
+
+    log = run_main(keeper, "--interval", "30", "--duration", "120", "--method", "keyboard", "--seed", "7")
+
+    beats = keeper.heartbeats()
+    assert beats[0] == 0.0 and beats[-1] < 120
+    assert all(t2 - t1 <= 34 for t1, t2 in zip(beats, beats[1:])), keeper.timeline()
+    assert keeper.pyautogui.moves == 0  # --method keyboard wins over the config file
+    keeper.assert_sequence("starting...", "Heartbeat #1 sent (keyboard", "State: stopped")
+    assert "Random seed: 7 (replay with --seed 7)" in log
+    assert "Activity keeper finished." in capsys.readouterr().out
+
+
+def test_mouse_heartbeats_move_and_return_pointer(keeper):
+    keeper.write_config(activity_interval=60, total_duration=200, method="mouse")
+
+    run_main(keeper, "--seed", "3")
+
+    assert keeper.pyautogui.moves > 0
+    assert keeper.pyautogui.position() == (800, 450)  # Every jiggle returns to where it started
+    assert all("(mouse " in m for m in keeper.messages() if m.startswith("Heartbeat"))
+
+
+def test_detect_inactivity_flag_auto_pauses(keeper):
+    keeper.write_config(activity_interval=60, total_duration=600)
+    keeper.user_active(100, 200)
+
+    run_main(keeper, "--detect-inactivity")
+
+    paused, resumed = keeper.first("automatically pausing"), keeper.first("automatically resuming")
+    assert 100 <= paused < 101 and 260 <= resumed < 261
+    assert not [t for t in keeper.heartbeats() if paused <= t < resumed]
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="SIGHUP reload is POSIX only")
+def test_sighup_reloads_config_mid_session(keeper):
+    keeper.write_config(activity_interval=120, total_duration=900)
+    keeper.at(200, lambda: keeper.write_config(activity_interval=30, total_duration=900))
+    keeper.at(200, lambda: signal.raise_signal(signal.SIGHUP))
+
+    run_main(keeper)
+
+    keeper.assert_sequence("Heartbeat #2", "Configuration reloaded successfully!", "Heartbeat #3")
+    after = [t for t in keeper.heartbeats() if t > 200]
+    assert len(after) >= 15
+
+
+def test_auto_restart_waits_for_schedule_until_exit_key(keeper, capsys):
+    keeper.write_config(activity_interval=60, total_duration=7200, schedule_enabled=True,
+                        schedule_windows=[{"days": [1], "start": "09:00", "end": "09:02"},
+                                          {"days": [1], "start": "09:05", "end": "09:07"}])
+    keeper.press_key(900, "q")
+
+    run_main(keeper, "--auto-restart")
+
+    keeper.assert_sequence(
+        "Entering waiting mode",
+        "resumes at 09:05 on Monday",
+        "Schedule started, resuming activity",
+        "Entering waiting mode",
+        "resumes at 09:00 on Monday",
+        "State: stopped",
+    )
+    assert keeper.clock.elapsed == pytest.approx(900, abs=1.1)
+    assert "Activity keeper finished." in capsys.readouterr().out
+
+
+def test_outside_schedule_exits_with_message(keeper, capsys):
+    keeper.write_config(schedule_enabled=True, work_hours_start="13:00", work_hours_end="17:00", work_days=[1, 2, 3, 4, 5])
+
+    run_main(keeper)
+
+    out = capsys.readouterr().out
+    assert "Outside scheduled hours. Exiting." in out
+    assert "Schedule: 13:00 - 17:00" in out
+    assert keeper.heartbeats() == []
+
+
+def test_invalid_config_exits_before_starting(keeper, capsys):
+    keeper.write_config(activity_interval=-5)
+
+    with pytest.raises(SystemExit) as excinfo:
+        run_main(keeper)
+
+    assert excinfo.value.code == 1
+    assert "Please check your configuration file" in capsys.readouterr().out
+    assert keeper.heartbeats() == []
+
+
+def test_crash_in_keep_active_exits_non_zero(keeper, capsys):
+    keeper.write_config(activity_interval=60, total_duration=600)
+
+    def broken_press(key):
+        if keeper.clock.elapsed > 100:
+            raise RuntimeError("display went away")
+        keeper.record("press", key)
+
+    keeper.pyautogui.press = broken_press
+
+    with pytest.raises(SystemExit) as excinfo:
+        run_main(keeper)
+
+    assert excinfo.value.code == 1  # The supervise subcommand restarts on a non-zero exit
+    assert "Details: display went away" in capsys.readouterr().out
+    log = (keeper.tmp_path / "activity_keeper.log").read_text()
+    assert "Traceback" in log and "Keeper crashed: RuntimeError('display went away')" in log
+    assert len(keeper.heartbeats()) == 2
@@ -0,0 +1,41 @@
+"""Stopping the minimal keeper: SIGTERM ends the run without waiting for the next heartbeat."""
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import keeper_minimal
+
+
+@pytest.fixture
+def restore_sigterm():
+    previous = signal.getsignal(signal.SIGTERM)
+    yield
+    signal.signal(signal.SIGTERM, previous)
+
+
+def test_stop_interrupts_the_wait():
+    keeper = keeper_minimal.MinimalKeeper({"activity_interval": 60, "total_duration": 2},
+                                          keeper_minimal.DryRunInjector())
+    threading.Timer(0.02, keeper.stop).start()
+
+    started = time.monotonic()
+    stats = keeper.run()
+
+    assert time.monotonic() - started < 1.0
+    assert stats["heartbeats"] == 0
+
+
+@pytest.mark.skipif(os.name != "posix", reason="delivers SIGTERM with os.kill")
+def test_sigterm_exits_promptly(restore_sigterm, tmp_path, capsys):
+    threading.Timer(0.02, os.kill, (os.getpid(), signal.SIGTERM)).start()
+
+    started = time.monotonic()
+    status = keeper_minimal.main(["--config", str(tmp_path / "missing.json"), "--dry-run",
+                                  "--interval", "60", "--duration", "2"])
+
+    assert status == 0
+    assert time.monotonic() - started < 1.0  # time.sleep() would resume after the handler and run to the end
+    assert "Minimal keeper finished: 0 heartbeats" in capsys.readouterr().out
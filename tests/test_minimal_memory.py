@@ -0,0 +1,80 @@
+"""Memory budget of the minimal headless keeper over a simulated week."""
+import os
+import subprocess
+import sys
+import tracemalloc
+
+import keeper_minimal
+import keeper_random
+
+DAY = 86400
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class DayMarks:
+    """Sleep hook that records traced memory at the end of every simulated day."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.marks = []
+
+    def sleep(self, seconds):
+        self.clock.sleep(seconds)
+        day = int(self.clock() // DAY)
+        while len(self.marks) < day:
+            self.marks.append(tracemalloc.get_traced_memory()[0])
+
+
+def test_simulated_week_stays_within_steady_state_budget():
+    clock = keeper_minimal.VirtualClock()
+    marks = DayMarks(clock)
+    idle = iter(range(10 ** 9))
+    config = {
+        "activity_interval": 120,
+        "total_duration": 7 * DAY,
+        "inactivity_detection_enabled": True,
+        "inactivity_threshold_seconds": 60,
+    }
+    keeper = keeper_minimal.MinimalKeeper(
+        config,
+        keeper_minimal.DryRunInjector(),
+        idle_source=lambda: 0.0 if next(idle) % 3 == 0 else 600.0,  # User active at every third heartbeat
+        clock=clock,
+        sleep=marks.sleep,
+        rng=keeper_random.RandomStream(7, block_size=64, use_numpy=False),
+    )
+
+    tracemalloc.start()
+    try:
+        stats = keeper.run()
+    finally:
+        tracemalloc.stop()
+
+    assert stats["heartbeats"] + stats["skipped_user_active"] > 4900
+    assert stats["skipped_user_active"] > 1000
+    assert len(marks.marks) == 7
+    growth = marks.marks[-1] - marks.marks[0]  # Day 1 to day 7: steady state must not grow
+    assert growth <= keeper_minimal.STEADY_STATE_BUDGET_BYTES, f"grew {growth} bytes over six simulated days"
+
+
+def test_simulated_week_peak_rss_within_budget():
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "keeper_minimal.py"), "--simulate", "7", "--seed", "1"],
+        capture_output=True, text=True, cwd=ROOT, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "peak RSS" in result.stdout
+    peak = result.stdout.rsplit("peak RSS ", 1)[1].split()[0]
+    if peak != "unknown":
+        assert float(peak) * 1024 * 1024 <= keeper_minimal.RSS_BUDGET_BYTES
+
+
+def test_minimal_keeper_does_not_load_the_full_keeper():
+    code = (
+        "import sys, keeper_minimal; keeper_minimal.main(['--simulate', '1'])\n"
+        "heavy = [m for m in ('activity_keeper', 'pyautogui', 'PIL', 'numpy', 'asyncio', 'logging') if m in sys.modules]\n"
+        "print('LOADED', heavy)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "LOADED []" in result.stdout
@@ -0,0 +1,74 @@
+"""Seeded runs replay: trajectory pools must not draw from the stream the decisions come from."""
+import pytest
+
+import keeper_random
+import mouse_automation
+import mouse_trajectory
+
+CONFIG = {
+    "total_moves": 6,
+    "move_duration": 2.0,
+    "sleep_between_clicks": 5.0,
+    "long_sleep_duration": 100.0,
+    "left_click_coords": [1450, 80],
+    "right_click_coords": [1450, 950],
+    "jitter_range": 3,
+    "duration_variation": 0.5,
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_streams(monkeypatch):
+    monkeypatch.setattr(keeper_random, "_STREAM", None)
+    monkeypatch.setattr(mouse_trajectory, "_DEFAULT_ENGINE", None)
+    monkeypatch.setattr(mouse_trajectory, "_DEFAULT_ENGINE_PARENT", None)
+
+
+class TrajectoryBackend(mouse_automation.FakeBackend):
+    """Like PyAutoGuiBackend: every move builds a path from the shared trajectory engine."""
+
+    def __init__(self, clock):
+        super().__init__(clock)
+        self.position = (800, 450)
+        self.points = 0
+
+    def move_to(self, x, y, duration):
+        path = mouse_trajectory.get_engine().path(self.position, (x, y), duration)
+
+        def move(px, py):
+            self.points += 1
+
+        mouse_trajectory.play_path(move, path, self.clock, self.clock.sleep)
+        self.position = (x, y)
+        super().move_to(x, y, 0.0)
+
+
+def test_trace_recorded_with_trajectory_moves_replays(tmp_path):
+    trace_path = str(tmp_path / "run.trace")
+    rng = keeper_random.configure(1234)
+    clock = mouse_automation.VirtualClock()
+    backend = TrajectoryBackend(clock)
+    timeline = mouse_automation.compile_plan(mouse_automation.default_plan(CONFIG), CONFIG)
+    trace = mouse_automation.TraceWriter(trace_path, rng.seed, CONFIG)
+    runner = mouse_automation.PlanRunner(timeline, backend, rng, CONFIG["duration_variation"], clock, clock.sleep,
+                                         on_click=lambda record, step, lateness: trace.click(record))
+    runner.run(CONFIG["total_moves"])
+    trace.close(completed=True)
+
+    assert backend.points > 0
+    assert mouse_automation.verify_trace(trace_path) == []
+
+
+def test_trajectory_engine_does_not_draw_from_the_shared_stream():
+    stream = keeper_random.configure(99)
+    engine = mouse_trajectory.get_engine()
+
+    for distance in (3, 40, 700, 1500):
+        engine.path((0, 0), (distance, 0), 0.2)
+
+    assert engine.rng is not stream
+    assert stream.drawn == 0
+    assert mouse_trajectory.get_engine() is engine
+
+    keeper_random.configure(99)
+    assert mouse_trajectory.get_engine() is not engine  # A new session seed starts new pools
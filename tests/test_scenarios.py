@@ -0,0 +1,246 @@
+"""Scripted end-to-end scenarios for the sync engine (keep_active / wait_for_next_activity).
+
+Times are seconds of virtual time since 09:00 on Monday 2026-03-02 (see
+keeper_harness.START).
+"""
+import pytest
+
+import activity_keeper
+
+
+def window(start, end, days=(1,)):
+    return {"days": list(days), "start": start, "end": end}
+
+
+def gaps(times):
+    return [round(b - a, 1) for a, b in zip(times, times[1:])]
+
+
+def test_heartbeats_follow_interval_with_jitter(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=600)
+
+    stats = keeper.session(config).run()
+
+    beats = keeper.heartbeats()
+    assert stats["exit_reason"] == "finished"
+    assert stats["total_jiggles"] == len(beats)
+    assert beats[0] == 0.0 and beats[-1] < 600
+    assert all(54 <= gap <= 67 for gap in gaps(beats)), keeper.timeline()
+    keeper.assert_sequence("stay awake", "Heartbeat #1", f"Heartbeat #{len(beats)}", "allow sleep", "State: stopped")
+
+
+def test_lines_output_without_console_keys_sleeps_until_the_heartbeat(keeper, monkeypatch):
+    config = keeper.write_config(activity_interval=60, total_duration=600,
+                                 inactivity_detection_enabled=True, inactivity_check_interval=20)
+    keeper.user_active(130, 150)
+    waits = []  # While running; the paused loop keeps its own poll
+
+    def idle_wait(seconds):
+        if not activity_keeper.PAUSED:
+            waits.append(seconds)
+        keeper.clock.advance(seconds)
+
+    monkeypatch.setattr(activity_keeper, "idle_wait", idle_wait)
+
+    keeper.session(config, console_keys=False).run()
+
+    assert len(waits) < 40, waits  # One wait per idle sample, not one per 0.1 s
+    assert max(waits) == pytest.approx(20)
+    assert 130 <= keeper.first("automatically pausing") <= 150  # Noticed at the next idle sample
+    assert all(54 <= gap <= 67 for gap in gaps(keeper.heartbeats()[:2])), keeper.timeline()
+
+
+def test_same_seed_replays_same_timeline(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=900, method="mouse")
+    keeper.session(dict(config), seed=42).run()
+    first = list(keeper.events)
+
+    keeper.events.clear()
+    keeper.clock.start = keeper.clock.now
+    keeper.session(dict(config), seed=42).run()
+
+    assert keeper.events == first
+
+
+def test_auto_pause_while_user_is_active(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=600,
+                                 inactivity_detection_enabled=True, inactivity_threshold_seconds=60)
+    keeper.user_active(130, 310)  # 3 minutes at the keyboard
+
+    keeper.session(config).run()
+
+    paused, resumed = keeper.first("automatically pausing"), keeper.first("automatically resuming")
+    assert 130 <= paused < 131
+    assert 370 <= resumed < 371  # idle for a full threshold after the user stopped
+    beats = keeper.heartbeats()
+    assert not [t for t in beats if paused <= t < resumed], keeper.timeline()
+    assert resumed in beats  # First heartbeat goes out as soon as the keeper resumes
+    keeper.assert_sequence("Heartbeat #3", "automatically pausing", "automatically resuming", "Heartbeat #4")
+
+
+def test_auto_pause_at_start(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=300,
+                                 inactivity_detection_enabled=True, inactivity_threshold_seconds=60)
+    keeper.user_active(0, 100)
+
+    keeper.session(config).run()
+
+    assert keeper.first("automatically pausing") == 0
+    assert keeper.heartbeats()[0] == keeper.first("automatically resuming") >= 160
+
+
+def test_user_active_then_reload_then_schedule_ends(keeper):
+    config = keeper.write_config(activity_interval=120, total_duration=7200, schedule_enabled=True,
+                                 schedule_windows=[window("09:00", "09:20")],
+                                 inactivity_detection_enabled=True, inactivity_threshold_seconds=60)
+    keeper.user_active(0, 180)
+    keeper.at(300, lambda: keeper.write_config(
+        activity_interval=30, total_duration=7200, schedule_enabled=True,
+        schedule_windows=[window("09:00", "09:20")],
+        inactivity_detection_enabled=True, inactivity_threshold_seconds=60))
+    keeper.at(300, keeper.session_reload)
+
+    stats = keeper.session(config).run()
+
+    keeper.assert_sequence(
+        "automatically pausing",
+        "automatically resuming",
+        "Heartbeat #1",
+        "Reloading from",
+        "Configuration reloaded successfully!",
+        "Outside scheduled hours. Stopping.",
+        "State: stopped",
+    )
+    assert stats["exit_reason"] == "finished"
+    # The schedule is checked between heartbeats, so the stop comes at most one interval after 09:20
+    assert 1200 <= keeper.first("Outside scheduled hours") <= 1234
+    reloaded = keeper.first("Configuration reloaded")
+    after = [t for t in keeper.heartbeats() if t > reloaded]
+    assert all(gap <= 34 for gap in gaps(after)), keeper.timeline()
+    assert len(after) >= 25
+
+
+def test_invalid_reload_keeps_running_config(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=600)
+    keeper.at(200, lambda: open(keeper.config_file, "w").write("{not json"))
+    keeper.press_key(200, "c")
+
+    stats = keeper.session(config).run()
+
+    keeper.assert_sequence("Config reload requested...", "Config reload failed: Invalid JSON", "Heartbeat")
+    assert stats["total_jiggles"] == len(keeper.heartbeats()) >= 10
+    assert config["activity_interval"] == 60
+
+
+def test_schedule_end_enters_waiting_and_restarts(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=7200, schedule_enabled=True,
+                                 schedule_windows=[window("09:00", "09:05"), window("09:10", "09:15")])
+    keeper.at(1000, keeper.session_stop)
+
+    stats = keeper.session(config, auto_restart=True).run()
+
+    keeper.assert_sequence(
+        "Heartbeat #1",
+        "Outside scheduled hours. Entering waiting mode.",
+        "waiting for next schedule (resumes at 09:10 on Monday)",
+        "Schedule started, resuming activity",
+        "Heartbeat",
+        "Outside scheduled hours. Entering waiting mode.",
+        "State: stopped",
+    )
+    assert stats["exit_reason"] == "stopped"
+    assert keeper.first("Entering waiting mode") == pytest.approx(300, abs=1)
+    assert keeper.first("Schedule started") == pytest.approx(600, abs=1)
+    assert not [t for t in keeper.heartbeats() if 301 <= t < 600]
+
+
+def test_reload_while_waiting_moves_schedule_start(keeper):
+    windows = [window("09:00", "09:05"), window("10:00", "10:05")]
+    config = keeper.write_config(activity_interval=60, total_duration=7200, schedule_enabled=True,
+                                 schedule_windows=windows)
+    keeper.at(400, lambda: keeper.write_config(
+        activity_interval=60, total_duration=7200, schedule_enabled=True,
+        schedule_windows=[window("09:00", "09:05"), window("09:08", "09:10")]))
+    keeper.press_key(400, "c")
+    keeper.at(700, keeper.session_stop)
+
+    keeper.session(config, auto_restart=True).run()
+
+    keeper.assert_sequence(
+        "resumes at 10:00 on Monday",
+        "Config reload requested...",
+        "Configuration reloaded successfully!",
+        "Schedule started, resuming activity",
+        "Outside scheduled hours. Entering waiting mode.",
+        "resumes at 09:00 on Monday",
+    )
+    assert keeper.first("Schedule started") == pytest.approx(480, abs=1)
+
+
+def test_outside_schedule_without_auto_restart_exits(keeper):
+    config = keeper.write_config(schedule_enabled=True, schedule_windows=[window("08:00", "08:30")])
+
+    stats = keeper.session(config).run()
+
+    assert stats["exit_reason"] == "outside_schedule"
+    assert keeper.heartbeats() == []
+
+
+def test_randomized_pattern_records_the_method_actually_used(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=1200, method="keyboard",
+                                 pattern_randomization_enabled=True, randomization_mouse_probability=0.5)
+    session = keeper.session(config)
+
+    session.run()
+
+    sent = ["mouse" if text == "f15" else "keyboard" for _, kind, text in keeper.events if kind == "press"]
+    assert set(sent) == {"mouse", "keyboard"}
+    assert [record.method for record in session.history.records()] == sent
+    lines = [m.split("(")[1].split(" ")[0].rstrip(",") for m in keeper.messages() if m.startswith("Heartbeat #")]
+    assert lines == sent
+
+
+def test_console_keys_pause_resume_and_exit(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=3600)
+    keeper.press_key(90, "p")
+    keeper.press_key(400, "r")
+    keeper.press_key(500, "q")
+
+    stats = keeper.session(config).run()
+
+    beats = keeper.heartbeats()
+    assert not [t for t in beats if 90 <= t < 400], keeper.timeline()
+    assert any(400 <= t < 401 for t in beats)  # Resuming sends a heartbeat at once
+    assert beats[-1] < 500
+    assert stats["exit_reason"] == "stopped"  # Same reason as the async engine and stop()
+    assert stats["state"] == "stopped"
+
+
+def test_exit_key_reason_is_the_same_in_the_async_engine(keeper):
+    import asyncio
+
+    engine = activity_keeper.AsyncEngine(keeper.session(keeper.write_config()))
+
+    async def press_q():
+        engine._changed = asyncio.Event()
+        engine._keys = asyncio.Queue()
+        engine._keys.put_nowait(ord("q"))
+        task = asyncio.create_task(engine._input_task())
+        await engine._changed.wait()
+        task.cancel()
+
+    asyncio.run(press_q())
+
+    assert engine.exit_reason == "stopped"
+    assert not hasattr(activity_keeper, "asyncio")  # Imported by the async engine only
+
+
+def test_stop_request_from_another_caller(keeper):
+    config = keeper.write_config(activity_interval=60, total_duration=3600)
+    keeper.at(250, keeper.session_stop)
+
+    stats = keeper.session(config).run()
+
+    assert stats["exit_reason"] == "stopped"
+    assert max(keeper.heartbeats()) < 250
+    assert keeper.clock.elapsed == pytest.approx(250, abs=0.2)
@@ -0,0 +1,44 @@
+"""Holiday calendar import: which recurrence rules are expanded."""
+import logging
+from datetime import date
+
+import keeper_schedule
+
+CALENDAR = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+SUMMARY:New Year
+DTSTART;VALUE=DATE:20260101
+DTEND;VALUE=DATE:20260102
+RRULE:FREQ=YEARLY
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Thanksgiving
+DTSTART;VALUE=DATE:20261126
+DTEND;VALUE=DATE:20261127
+RRULE:FREQ=YEARLY;BYMONTH=11;BYDAY=4TH
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Standup
+DTSTART:20260302T090000Z
+DTEND:20260302T091500Z
+RRULE:FREQ=WEEKLY;BYDAY=MO
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def test_only_plain_yearly_rules_are_expanded(tmp_path, caplog):
+    path = tmp_path / "holidays.ics"
+    path.write_text(CALENDAR)
+
+    with caplog.at_level(logging.WARNING, logger="keeper_schedule"):
+        off_days, blocked = keeper_schedule.load_ics(str(path), until_year=2028)
+
+    assert {date(2026, 1, 1), date(2027, 1, 1), date(2028, 1, 1)} <= off_days
+    thanksgiving = sorted(day for day in off_days if day.month == 11)
+    assert thanksgiving == [date(2026, 11, 26)]  # Not 26 November 2027 (a Friday) or 2028 (a Sunday)
+    assert len(blocked) == 1
+    warnings = [record.getMessage() for record in caplog.records]
+    assert len(warnings) == 2
+    assert "'Thanksgiving' has an unsupported recurrence (RRULE:FREQ=YEARLY;BYMONTH=11;BYDAY=4TH)" in warnings[0]
+    assert "'Standup' has an unsupported recurrence (RRULE:FREQ=WEEKLY;BYDAY=MO)" in warnings[1]
@@ -0,0 +1,71 @@
+"""KeeperSession start-up failures and teardown leave nothing running."""
+import socket
+import threading
+
+import pytest
+
+import activity_keeper
+import keeper_checkpoint
+
+
+def keeper_threads():
+    return [thread.name for thread in threading.enumerate() if thread.name.startswith("keeper-")]
+
+
+def test_failed_start_stops_what_already_started(keeper, tmp_path):
+    config = keeper.write_config(activity_interval=60, total_duration=120)
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        session = keeper.session(config, checkpoint_file=str(tmp_path / "keeper.checkpoint"),
+                                 status_file=str(tmp_path / "status.bin"), metrics_port=busy.getsockname()[1])
+        with pytest.raises(OSError):
+            session.run()
+
+    assert activity_keeper._ACTIVE_SESSION is None
+    assert activity_keeper.CHECKPOINT is None and activity_keeper.STATUS_PAGE is None
+    assert keeper_threads() == []
+    assert keeper.session(config).run()["exit_reason"] == "finished"  # The next run is not locked out
+
+
+def test_failing_teardown_step_does_not_skip_the_rest(keeper, tmp_path):
+    config = keeper.write_config(activity_interval=60, total_duration=120)
+    checkpoint = str(tmp_path / "keeper.checkpoint")
+    session = keeper.session(config, checkpoint_file=checkpoint, status_file=str(tmp_path / "status.bin"),
+                             trace_file=str(tmp_path / "missing" / "trace.json"))
+
+    assert session.run()["exit_reason"] == "finished"  # The trace dump fails on the missing directory
+
+    assert activity_keeper._ACTIVE_SESSION is None
+    assert activity_keeper.STATUS_PAGE is None
+    assert keeper_checkpoint.load_checkpoint(checkpoint)["state"]["clean_exit"]
+    assert keeper_threads() == []
+
+
+def test_plan_clicks_stay_out_of_the_heartbeat_history(keeper, monkeypatch):
+    import keeper_clickplan
+    import keeper_random
+
+    plan = keeper_clickplan.load_plan_config({
+        "total_moves": 3, "move_duration": 0.0, "sleep_between_clicks": 0.001, "long_sleep_duration": 0.001,
+        "left_click_coords": [100, 100], "right_click_coords": [200, 200]})
+    session = keeper.session(keeper.write_config(), history_capacity=4)
+    for dx in range(4):  # A full ring: any click stored in it would evict a heartbeat
+        session.history.append("mouse", dx, 0, 0.001)
+    session.rng = keeper_random.configure(1)
+    monkeypatch.setattr(activity_keeper, "DRY_RUN", True)
+    monkeypatch.setattr(activity_keeper, "STATUS", "RUNNING")
+
+    job = session._start_click_job(plan, keeper_clickplan.compile_plan_config(plan))
+    job._thread.join(timeout=5.0)
+
+    assert job.stats()["clicks"] == 6
+    assert [record.dx for record in session.history.records()] == [0, 1, 2, 3]  # Clicks never push heartbeats out of the ring
+
+
+def test_exit_stats_without_heartbeats(capsys):
+    activity_keeper.display_exit_stats(0.0, 0, activity_keeper.ActivityHistory())
+
+    out = capsys.readouterr().out
+    assert "Last Hour:        0 heartbeats" in out
+    assert "Avg Latency" not in out
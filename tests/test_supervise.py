@@ -0,0 +1,161 @@
+"""Restart policy of the supervise subcommand, with fake children and a fake clock."""
+import threading
+
+import keeper_supervise
+
+
+class FakeChild:
+    """Child that exits with a scripted code after a scripted runtime."""
+
+    def __init__(self, clock, code, runtime):
+        self.clock = clock
+        self.code = code
+        self.runtime = runtime
+        self.pid = 1000 + len(clock.children)
+        self.signals = []
+
+    def poll(self):
+        return None
+
+    def wait(self, timeout):
+        self.clock.now += self.runtime
+        return self.code
+
+    def send_signal(self, signum):
+        self.signals.append(signum)
+
+    def terminate(self):
+        self.signals.append("terminate")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.children = []
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingStop(threading.Event):
+    """Stop event whose wait() records the backoff delay and lets fake time pass instead of sleeping."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        self.delays = []
+
+    def wait(self, timeout=None):
+        self.delays.append(timeout)
+        self.clock.now += timeout
+        return self.is_set()
+
+
+def make_supervisor(runs, **options):
+    """Supervisor whose nth child exits with runs[n] = (code, runtime)."""
+    clock = FakeClock()
+    script = iter(runs)
+
+    def launcher(argv):
+        code, runtime = next(script)
+        child = FakeChild(clock, code, runtime)
+        clock.children.append(child)
+        return child
+
+    supervisor = keeper_supervise.Supervisor(["--quiet"], launcher=launcher, clock=clock, **options)
+    supervisor._stop = RecordingStop(clock)
+    return supervisor
+
+
+def test_crashed_child_is_restarted_with_backoff(capsys):
+    supervisor = make_supervisor([(1, 2.0), (1, 2.0), (1, 2.0), (0, 100.0)],
+                                 backoff_initial=1.0, backoff_factor=2.0, crash_limit=5, crash_window=60.0)
+
+    assert supervisor.run() == 0
+
+    assert supervisor.starts == 4
+    assert supervisor.crashes == 3
+    assert supervisor.exit_codes == [1, 1, 1, 0]
+    assert supervisor._stop.delays == [1.0, 2.0, 4.0]
+    out = capsys.readouterr().out
+    assert "Keeper exited with code 1 after 2.0s, restarting in 4.0s" in out
+    assert "Keeper exited normally, supervision finished" in out
+
+
+def test_stable_run_resets_backoff():
+    supervisor = make_supervisor([(1, 2.0), (1, 2.0), (1, 45.0), (1, 2.0), (0, 1.0)],
+                                 backoff_initial=1.0, stable_after=30.0, crash_limit=10)
+
+    supervisor.run()
+
+    assert supervisor._stop.delays == [1.0, 2.0, 1.0, 2.0]
+
+
+def test_crash_loop_gives_up(capsys):
+    supervisor = make_supervisor([(1, 0.5)] * 10, backoff_initial=0.5, backoff_max=1.0,
+                                 crash_limit=3, crash_window=60.0)
+
+    assert supervisor.run() == 1
+
+    assert supervisor.starts == 3
+    assert len(supervisor._stop.delays) == 2
+    assert "Crash loop detected (3 crashes within 60s), giving up" in capsys.readouterr().out
+
+
+def test_crashes_outside_the_window_do_not_count():
+    supervisor = make_supervisor([(1, 40.0)] * 4 + [(0, 1.0)], backoff_initial=1.0,
+                                 crash_limit=2, crash_window=30.0)
+
+    assert supervisor.run() == 0
+    assert supervisor.crashes == 4
+
+
+
+class HangingChild(FakeChild):
+    """Child that ignores the forwarded signal and only exits when terminated."""
+
+    def __init__(self, clock, supervisor):
+        super().__init__(clock, None, 0.0)
+        self.supervisor = supervisor
+
+    def wait(self, timeout):
+        if not self.signals:
+            self.supervisor.stop()  # Ctrl+C arrives while the keeper runs
+        self.clock.now += timeout
+        return -15 if "terminate" in self.signals else None
+
+
+def test_stop_gives_the_child_a_grace_period_then_terminates(capsys):
+    clock = FakeClock()
+    children = []
+
+    def launcher(argv):
+        children.append(HangingChild(clock, supervisor))
+        return children[-1]
+
+    supervisor = keeper_supervise.Supervisor([], launcher=launcher, clock=clock, poll_interval=0.5, stop_grace=3.0)
+
+    assert supervisor.run() == 0
+
+    assert children[0].signals == [keeper_supervise.signal.SIGTERM, "terminate"]
+    assert clock.now == 3.5  # Terminated at the first poll after the grace period, not before
+    assert "Keeper did not stop within 3s, terminating it" in capsys.readouterr().out
+
+
+def test_windows_child_is_stopped_with_ctrl_break(monkeypatch):
+    sent = []
+
+    class Process:
+        def send_signal(self, signum):
+            sent.append(signum)
+
+    monkeypatch.setattr(keeper_supervise.os, "name", "nt")
+    monkeypatch.setattr(keeper_supervise.signal, "CTRL_BREAK_EVENT", 1, raising=False)
+    child = keeper_supervise.SubprocessChild.__new__(keeper_supervise.SubprocessChild)
+    child._process = Process()
+
+    child.send_signal(keeper_supervise.signal.SIGINT)
+    child.send_signal(keeper_supervise.signal.SIGTERM)
+    child.send_signal(keeper_supervise.signal.SIGHUP)
+
+    assert sent == [1, 1]  # A console event the keeper handles, never a hard kill; SIGHUP has no equivalent
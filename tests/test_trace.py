@@ -0,0 +1,48 @@
+"""Timeline tracer toggled while instrumented code is running."""
+import sys
+
+import pytest
+
+import keeper_trace
+
+
+@pytest.fixture
+def disable_mid_call():
+    """Call keeper_trace.disable() right after the first statement of span/instant/@traced.
+
+    That is the window in which another thread (the control server handling
+    `trace stop`) can clear the tracer between the check and the use.
+    """
+    targets = {keeper_trace.span.__code__, keeper_trace.instant.__code__}
+
+    def local(frame, event, arg):
+        if event == 'line':
+            local.lines += 1
+            if local.lines == 2:
+                keeper_trace.disable()
+        return local
+
+    def global_trace(frame, event, arg):
+        if frame.f_code in targets or frame.f_code.co_name == 'wrapper' and frame.f_globals is vars(keeper_trace):
+            local.lines = 0
+            return local
+        return None
+
+    keeper_trace.enable()
+    sys.settrace(global_trace)
+    yield
+    sys.settrace(None)
+    keeper_trace.disable()
+
+
+def test_span_survives_a_concurrent_disable(disable_mid_call):
+    with keeper_trace.span("tick"):
+        pass
+
+
+def test_instant_survives_a_concurrent_disable(disable_mid_call):
+    keeper_trace.instant("reload")
+
+
+def test_traced_call_survives_a_concurrent_disable(disable_mid_call):
+    assert keeper_trace.traced(lambda: 42)() == 42